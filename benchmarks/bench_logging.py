@@ -0,0 +1,47 @@
+"""Compare formatting speed of DebugFormatter, standard logging.Formatter and JSONFormatter.
+
+Run: python -m benchmarks.bench_logging [records]
+"""
+import logging
+import sys
+import time
+
+from fastapi_mongodb.logging import DebugFormatter, JSONFormatter
+
+
+def make_record(number: int) -> logging.LogRecord:
+    record = logging.LogRecord(
+        name="benchmark",
+        level=logging.DEBUG,
+        pathname=__file__,
+        lineno=number,
+        msg="Command '%s' with request id %s succeeded in %s microseconds",
+        args=("find", number, 1200),
+        exc_info=None,
+    )
+    record.request_id = f"request-{number}"
+    return record
+
+
+def run(formatter: logging.Formatter, records: list[logging.LogRecord]) -> float:
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def main(count: int):
+    formatters = {
+        "DebugFormatter": DebugFormatter(),
+        "logging.Formatter": logging.Formatter(fmt="{levelname} {message} {asctime}", style="{"),
+        "JSONFormatter": JSONFormatter(extra_fields=("request_id",)),
+    }
+    for name, formatter in formatters.items():
+        run(formatter=formatter, records=[make_record(number) for number in range(count // 10)])  # warm up
+        # records cache rendered message, so every formatter gets fresh ones
+        records_per_second = run(formatter=formatter, records=[make_record(number) for number in range(count)])
+        print(f"{name:<20} {records_per_second:>12.0f} records/s")
+
+
+if __name__ == "__main__":
+    main(count=int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
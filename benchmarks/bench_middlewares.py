@@ -0,0 +1,115 @@
+"""Compare requests per second of BaseHTTPMiddleware based and pure ASGI DBSessionMiddleware.
+
+Run: python -m benchmarks.bench_middlewares [requests]
+
+MongoDB isn't required: client is replaced with in-process stub, so numbers show middleware overhead only.
+"""
+import asyncio
+import sys
+import time
+
+import fastapi
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from fastapi_mongodb.middlewares import DBSessionMiddleware
+
+
+class StubSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class StubClient:
+    async def start_session(self, **kwargs):
+        await asyncio.sleep(0)  # motor starts session on executor thread
+        return StubSession()
+
+
+class StubDBManager:
+    client = StubClient()
+
+    def retrieve_client(self):
+        return self.client
+
+
+class LegacyDBSessionMiddleware(BaseHTTPMiddleware):
+    """DBSessionMiddleware before rewriting to pure ASGI."""
+
+    def __init__(self, app, db_manager):
+        super().__init__(app=app)
+        self.db_manager = db_manager
+
+    async def dispatch(self, request, call_next):
+        db_client = self.db_manager.retrieve_client()
+        async with await db_client.start_session() as session:
+            request.state.db_session = session
+            return await call_next(request)
+
+
+def create_app(middleware_class) -> fastapi.FastAPI:
+    app = fastapi.FastAPI()
+    app.add_middleware(middleware_class, db_manager=StubDBManager())
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/db")
+    async def db(request: fastapi.Request):
+        session = request.state.db_session
+        if not isinstance(session, StubSession):
+            await session
+        return {"status": "ok"}
+
+    return app
+
+
+async def run_requests(app: fastapi.FastAPI, path: str, count: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 123),
+        "server": ("testserver", 80),
+    }
+
+    def make_receive():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()  # client never disconnects, streaming responses cancel this wait
+
+        return receive
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), make_receive(), send)
+    return count / (time.perf_counter() - start)
+
+
+async def main(count: int):
+    apps = {"BaseHTTPMiddleware": create_app(LegacyDBSessionMiddleware), "pure ASGI": create_app(DBSessionMiddleware)}
+    for path in ("/health", "/db"):
+        for name, app in apps.items():
+            await run_requests(app=app, path=path, count=count // 10)  # warm up
+            rps = await run_requests(app=app, path=path, count=count)
+            print(f"{path:<8} {name:<20} {rps:>10.0f} requests/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(count=int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
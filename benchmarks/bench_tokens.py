@@ -0,0 +1,71 @@
+"""Compare TokensManager.read_code with and without verified-token cache, single and batch token issuance.
+
+Run: python -m benchmarks.bench_tokens [reads]
+"""
+import copy
+import datetime
+import sys
+import time
+
+import jwt
+
+import fastapi_mongodb.helpers
+import fastapi_mongodb.schemas
+from fastapi_mongodb.managers import TokenCache, TokensManager
+
+
+class Payload(fastapi_mongodb.schemas.BaseSchema):
+    user_id: str
+    scopes: list[str]
+
+
+def run(manager: TokensManager, codes: list[str], count: int, convert_to=None) -> float:
+    start = time.perf_counter()
+    for number in range(count):
+        manager.read_code(code=codes[number % len(codes)], convert_to=convert_to)
+    return count / (time.perf_counter() - start)
+
+
+def legacy_create_code(data: dict) -> str:
+    """TokensManager.create_code before batch issuance."""
+    now = fastapi_mongodb.helpers.utc_now()
+    payload = copy.deepcopy(data)
+    payload |= {"iat": now, "aud": "access", "exp": now + datetime.timedelta(minutes=30), "nbf": now, "iss": ""}
+    return jwt.encode(payload=payload, key="benchmark", algorithm="HS256")
+
+
+def issue(count: int):
+    manager = TokensManager(secret_key="benchmark")
+    data = [{"user_id": str(user), "scopes": ["read", "write"]} for user in range(count)]
+    variants = {
+        "jwt.encode + deepcopy": lambda: [legacy_create_code(data=item) for item in data],
+        "create_code": lambda: [manager.create_code(data=item) for item in data],
+        "create_codes": lambda: manager.create_codes(data=data),
+    }
+    for name, variant in variants.items():
+        start = time.perf_counter()
+        variant()
+        print(f"{name:<28} {count / (time.perf_counter() - start):>10.0f} tokens/s")
+
+
+def main(count: int):
+    managers = {
+        "no cache": TokensManager(secret_key="benchmark"),
+        "TokenCache": TokensManager(secret_key="benchmark", token_cache=TokenCache()),
+    }
+    for convert_to in (None, Payload):
+        for name, manager in managers.items():
+            # 100 active users send requests with their tokens
+            codes = [
+                manager.create_code(data={"user_id": str(user), "scopes": ["read", "write"]}) for user in range(100)
+            ]
+            run(manager=manager, codes=codes, count=count // 10, convert_to=convert_to)  # warm up
+            reads_per_second = run(manager=manager, codes=codes, count=count, convert_to=convert_to)
+            label = f"{name} ({convert_to.__name__ if convert_to else 'dict'})"
+            print(f"{label:<28} {reads_per_second:>10.0f} reads/s")
+        print(f"{'':<28} hit rate {managers['TokenCache'].token_cache.hit_rate:.3f}")
+    issue(count=count)
+
+
+if __name__ == "__main__":
+    main(count=int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
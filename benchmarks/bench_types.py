@@ -0,0 +1,62 @@
+"""Compare OID validation before and after fast paths, OIDs batch with list of OID in pydantic model.
+
+Run: python -m benchmarks.bench_types [count]
+"""
+import sys
+import time
+
+import bson
+import bson.errors
+import pydantic
+
+from fastapi_mongodb.types import OID, OIDs
+
+
+def legacy_validate(v) -> bson.ObjectId:
+    """OID.validate before identity and hex fast paths."""
+    try:
+        return bson.ObjectId(oid=str(v))
+    except bson.errors.InvalidId as error:
+        raise ValueError(error) from error
+
+
+class ListModel(pydantic.BaseModel):
+    ids: list[OID]
+
+
+class BatchModel(pydantic.BaseModel):
+    ids: OIDs
+
+
+def run(validate, values: list, count: int) -> float:
+    start = time.perf_counter()
+    for number in range(count):
+        try:
+            validate(values[number % len(values)])
+        except ValueError:
+            pass
+    return count / (time.perf_counter() - start)
+
+
+def main(count: int):
+    object_ids = [bson.ObjectId() for _ in range(100)]
+    inputs = {
+        "ObjectId": object_ids,
+        "hex": [str(object_id) for object_id in object_ids],
+        "invalid": ["not an object id"] * 100,
+    }
+    for name, values in inputs.items():
+        for label, validate in (("legacy", legacy_validate), ("OID", OID.validate)):
+            run(validate=validate, values=values, count=count // 10)  # warm up
+            print(f"{label + ' ' + name:<28} {run(validate=validate, values=values, count=count):>10.0f} ids/s")
+
+    hex_ids = inputs["hex"]
+    for label, model in (("list[OID]", ListModel), ("OIDs", BatchModel)):
+        start = time.perf_counter()
+        for _ in range(count // len(hex_ids)):
+            model(ids=hex_ids)
+        print(f"{label + ' (100 hex ids)':<28} {count / (time.perf_counter() - start):>10.0f} ids/s")
+
+
+if __name__ == "__main__":
+    main(count=int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
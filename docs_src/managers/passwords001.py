@@ -9,6 +9,9 @@ password_hash = passwords_manager.make_password(password=raw_password)
 if passwords_manager.check_password(
     password=raw_password, password_hash=password_hash
 ):
+    if passwords_manager.needs_rehash(password_hash=password_hash):
+        password_hash = passwords_manager.make_password(password=raw_password)
+        # save new hash
     print("""ALLOW ACCESS!""")
 else:
     print("""ACCESS DENIED!""")
@@ -2,3 +2,4 @@ class PASSWORD_ALGORITHMS(str, enum.Enum):
     SHA256 = "sha256"
     SHA384 = "sha384"
     SHA512 = "sha512"
+    SCRYPT = "scrypt"
@@ -0,0 +1,18 @@
+import fastapi_mongodb
+
+# Issuer service: JWKS file with private keys, new tokens are signed with "2021-09" key
+signing_keys = fastapi_mongodb.TokenKeySet(
+    paths=["/run/secrets/jwks.json"], signing_kid="2021-09", reload_interval=60
+)
+issuer_tokens_manager = fastapi_mongodb.TokensManager(key_set=signing_keys)
+
+jwt_token = issuer_tokens_manager.create_code(data={"user_id": "123"})  # header: {"kid": "2021-09", ...}
+
+# Other services: JWKS file with public keys only, key is chosen by "kid" of token header
+public_keys = fastapi_mongodb.TokenKeySet(paths=["/etc/app/jwks.public.json"], reload_interval=60)
+tokens_manager = fastapi_mongodb.TokensManager(key_set=public_keys)
+
+parsed_token = tokens_manager.read_code(code=jwt_token)
+
+# Rotation: add new key to files (and set new 'signing_kid'), keys are reloaded after file modification
+# (or call 'public_keys.reload()'), remove old key when its tokens expire.
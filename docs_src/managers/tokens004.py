@@ -0,0 +1,41 @@
+import fastapi
+
+import fastapi_mongodb
+
+db_manager = fastapi_mongodb.BaseDBManager(
+    db_url="mongodb://0.0.0.0:27017/", default_db_name="test_db"
+)
+revocation_store = fastapi_mongodb.TokenRevocationStore(
+    repository=fastapi_mongodb.BaseRepository(
+        db_manager=db_manager, db_name="auth", col_name="revoked_tokens"
+    ),
+    change_stream=True,  # replica set is required, use 'change_stream=False' for polling
+)
+tokens_manager = fastapi_mongodb.TokensManager(
+    secret_key="SECRET", revocation_store=revocation_store
+)
+
+
+async def startup():
+    db_manager.create_client()
+    await revocation_store.create_indexes()  # documents are removed after token expiration
+    await revocation_store.start()
+
+
+async def shutdown():
+    await revocation_store.stop()
+    db_manager.delete_client()
+
+
+app = fastapi.FastAPI(on_startup=[startup], on_shutdown=[shutdown])
+
+
+@app.post("/logout")
+async def logout(token: str):
+    await tokens_manager.revoke_code(code=token)
+
+
+@app.get("/me")
+async def me(token: str):
+    # not revoked tokens are checked by in-process Bloom filter, without database query
+    return await tokens_manager.read_code_async(code=token)
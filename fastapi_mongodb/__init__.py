@@ -1,4 +1,5 @@
 """fastapi_mongodb library entrypoint."""
+from .change_streams import *
 from .config import *
 from .db import *
 from .dependencies import *
@@ -8,6 +9,11 @@ from .logging import *
 from .managers import *
 from .middlewares import *
 from .models import *
+from .profiling import *
 from .repositories import *
+from .responses import *
+from .revocations import *
 from .schemas import *
+from .tracing import *
+from .transfer import *
 from .types import *
@@ -0,0 +1,420 @@
+"""Shared change streams with fan-out to many local subscribers."""
+import asyncio
+import enum
+import hashlib
+import typing
+
+import bson
+import pymongo.errors
+
+import fastapi_mongodb.helpers
+from fastapi_mongodb.logging import simple_logger as logger
+from fastapi_mongodb.repositories import BaseRepository
+
+__all__ = [
+    "SLOW_CONSUMER_POLICIES",
+    "BaseResumeTokenStore",
+    "MemoryResumeTokenStore",
+    "RepositoryResumeTokenStore",
+    "ChangeStreamSubscription",
+    "ChangeStreamHub",
+]
+
+# server can't resume change stream from this token anymore (oplog rolled over)
+NOT_RESUMABLE_ERROR_CODES = {280, 286}  # ChangeStreamFatalError, ChangeStreamHistoryLost
+# failover, shutdown and network errors of server (the same as pymongo resumes 'getMore' with), stream reconnects
+RESUMABLE_ERROR_CODES = {
+    6,  # HostUnreachable
+    7,  # HostNotFound
+    63,  # StaleShardVersion
+    89,  # NetworkTimeout
+    91,  # ShutdownInProgress
+    133,  # FailedToSatisfyReadPreference
+    150,  # StaleEpoch
+    189,  # PrimarySteppedDown
+    234,  # RetryChangeStream
+    262,  # ExceededTimeLimit
+    9001,  # SocketException
+    10107,  # NotWritablePrimary
+    11600,  # InterruptedAtShutdown
+    11602,  # InterruptedDueToReplStateChange
+    13388,  # StaleConfig
+    13435,  # NotPrimaryNoSecondaryOk
+    13436,  # NotPrimaryOrSecondary
+}
+
+
+class SLOW_CONSUMER_POLICIES(str, enum.Enum):
+    DROP_NEWEST = "drop_newest"  # skip incoming event for subscriber with full queue
+    DROP_OLDEST = "drop_oldest"  # remove oldest queued event to make room for incoming one
+    DISCONNECT = "disconnect"  # close subscription with full queue
+
+
+class BaseResumeTokenStore:
+    """Interface to persist change stream resume tokens."""
+
+    async def load(self, *, key: str) -> typing.Optional[dict]:
+        """Retrieve last saved resume token."""
+        raise NotImplementedError
+
+    async def save(self, *, key: str, token: dict):
+        """Save resume token."""
+        raise NotImplementedError
+
+
+class MemoryResumeTokenStore(BaseResumeTokenStore):
+    """Keep resume tokens in process memory (restart of process starts streams from 'now')."""
+
+    def __init__(self):
+        self._tokens: dict[str, dict] = {}
+
+    async def load(self, *, key: str) -> typing.Optional[dict]:
+        """Retrieve last saved resume token."""
+        return self._tokens.get(key)
+
+    async def save(self, *, key: str, token: dict):
+        """Save resume token."""
+        self._tokens[key] = token
+
+
+class RepositoryResumeTokenStore(BaseResumeTokenStore):
+    """Keep resume tokens in MongoDB collection (document per stream)."""
+
+    def __init__(self, repository: BaseRepository):
+        self._repository = repository
+
+    async def load(self, *, key: str) -> typing.Optional[dict]:
+        """Retrieve last saved resume token."""
+        document = await self._repository.find_one(query={"_id": key})
+        return dict(document["token"]) if document else None
+
+    async def save(self, *, key: str, token: dict):
+        """Save resume token."""
+        await self._repository.update_one(
+            query={"_id": key},
+            update={"$set": {"token": token, "updated_at": fastapi_mongodb.helpers.utc_now()}},
+            upsert=True,
+        )
+
+
+class ChangeStreamSubscription:
+    """Bounded queue of change events for one local consumer."""
+
+    _CLOSED = object()
+
+    def __init__(
+        self,
+        *,
+        stream: "_SharedChangeStream",
+        max_queue_size: int,
+        policy: SLOW_CONSUMER_POLICIES,
+        event_filter: typing.Callable[[dict], bool] = None,
+    ):
+        self._stream = stream
+        self._max_queue_size = max_queue_size
+        self._policy = policy
+        self._event_filter = event_filter
+        # one extra slot is reserved for close marker, so closing never waits for consumer
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size + 1)
+        self._closed = False
+        self._error: typing.Optional[BaseException] = None
+        self.received = 0
+        self.dropped = 0
+
+    def __repr__(self):
+        """Representation of ChangeStreamSubscription."""
+        return (
+            f"{self.__class__.__name__}(stream={self._stream.key}, received={self.received}, dropped={self.dropped}, "
+            f"closed={self._closed})"
+        )
+
+    def __aiter__(self):
+        """Iterate over events until subscription is closed."""
+        return self
+
+    async def __anext__(self) -> dict:
+        """Retrieve next event."""
+        event = await self._queue.get()
+        if event is self._CLOSED:
+            self._queue.put_nowait(self._CLOSED)  # keep marker for concurrent and following readers
+            if self._error is not None:
+                raise self._error
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self) -> "ChangeStreamSubscription":
+        """Use subscription as async context manager."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Unsubscribe on exit."""
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() - (1 if self._closed else 0)
+
+    async def get(self) -> dict:
+        """Retrieve next event (raises StopAsyncIteration after close)."""
+        return await self.__anext__()
+
+    async def close(self):
+        """Unsubscribe from shared change stream."""
+        await self._stream.unsubscribe(subscription=self)
+
+    def _offer(self, *, event: dict):
+        """Put event to queue according to slow consumer policy (never blocks change stream reader)."""
+        if self._closed:
+            return
+        if self._event_filter is not None:
+            try:
+                if not self._event_filter(event):
+                    return
+            except Exception as error:
+                logger.warning(msg=f"Change stream subscription filter failed: {error!r}")
+                return
+
+        if self._queue.qsize() >= self._max_queue_size:
+            self.dropped += 1
+            if self._policy == SLOW_CONSUMER_POLICIES.DROP_NEWEST:
+                return
+            elif self._policy == SLOW_CONSUMER_POLICIES.DROP_OLDEST:
+                self._queue.get_nowait()
+            else:
+                self._stream.detach(subscription=self)
+                self._close(error=ConnectionAbortedError("Subscription is too slow and was disconnected."))
+                return
+        self._queue.put_nowait(event)
+        self.received += 1
+
+    def _close(self, *, error: BaseException = None):
+        if self._closed:
+            return
+        self._closed = True
+        self._error = error
+        if error is not None:  # pending events are useless after failure
+            while not self._queue.empty():
+                self._queue.get_nowait()
+        self._queue.put_nowait(self._CLOSED)
+
+
+class _SharedChangeStream:
+    """One server side change stream with many subscribers."""
+
+    def __init__(
+        self,
+        *,
+        hub: "ChangeStreamHub",
+        key: str,
+        repository: BaseRepository,
+        pipeline: list[dict],
+        watch_kwargs: dict,
+    ):
+        self.key = key
+        self._hub = hub
+        self._repository = repository
+        self._pipeline = pipeline
+        self._watch_kwargs = watch_kwargs
+        self._subscribers: set[ChangeStreamSubscription] = set()
+        self._task: typing.Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._resume_token: typing.Optional[dict] = None
+        self._unsaved_events = 0
+        self._checkpoint_task: typing.Optional[asyncio.Task] = None
+        self._last_error: typing.Optional[BaseException] = None  # the latest reconnection reason
+
+    @property
+    def subscribers_count(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self, *, subscription: ChangeStreamSubscription) -> ChangeStreamSubscription:
+        self._subscribers.add(subscription)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        ready = asyncio.ensure_future(self._ready.wait())
+        await asyncio.wait({ready, self._task}, timeout=self._hub.open_timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not ready.done():
+            ready.cancel()
+        if not self._ready.is_set():
+            if subscription._error is not None:  # stream failed before it was opened
+                raise subscription._error
+            if not self._task.done():  # still reconnecting (e.g. server is unreachable)
+                await self.unsubscribe(subscription=subscription)
+                raise asyncio.TimeoutError(
+                    f"Change stream '{self.key}' wasn't opened in {self._hub.open_timeout}s."
+                ) from self._last_error
+        return subscription
+
+    def detach(self, *, subscription: ChangeStreamSubscription):
+        self._subscribers.discard(subscription)
+
+    async def unsubscribe(self, *, subscription: ChangeStreamSubscription):
+        self.detach(subscription=subscription)
+        subscription._close()
+        if not self._subscribers:
+            await self.stop()
+
+    async def stop(self):
+        self._hub._forget(stream=self)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._save_token()
+        for subscription in list(self._subscribers):
+            subscription._close()
+        self._subscribers.clear()
+
+    async def _run(self):
+        try:
+            self._resume_token = await self._hub.token_store.load(key=self.key)
+            while self._subscribers:
+                try:
+                    await self._consume()
+                except pymongo.errors.OperationFailure as error:
+                    if error.code in NOT_RESUMABLE_ERROR_CODES and self._resume_token is not None:
+                        logger.warning(
+                            msg=f"Change stream '{self.key}' can't be resumed, restart it from now: {error!r}"
+                        )
+                        self._resume_token = None
+                        continue
+                    if error.code not in RESUMABLE_ERROR_CODES and not error.has_error_label(
+                        "ResumableChangeStreamError"
+                    ):
+                        raise  # e.g. authorization or invalid pipeline, reconnection fails the same way
+                    logger.warning(msg=f"Change stream '{self.key}' failed, reconnecting: {error!r}")
+                    self._last_error = error
+                    await asyncio.sleep(self._hub.retry_delay)
+                except pymongo.errors.PyMongoError as error:
+                    logger.warning(msg=f"Change stream '{self.key}' failed, reconnecting: {error!r}")
+                    self._last_error = error
+                    await asyncio.sleep(self._hub.retry_delay)
+            # all subscribers were disconnected as slow consumers
+            self._hub._forget(stream=self)
+            await self._save_token()
+        except Exception as error:
+            self._fail(error=error)
+
+    async def _consume(self):
+        kwargs = dict(self._watch_kwargs)
+        if self._resume_token is not None:
+            kwargs["start_after"] = self._resume_token  # unlike 'resume_after', works after "invalidate" events
+        async with await self._repository.watch(pipeline=self._pipeline, **kwargs) as change_stream:
+            self._ready.set()
+            async for event in change_stream:
+                for subscription in list(self._subscribers):
+                    subscription._offer(event=event)
+                self._resume_token = change_stream.resume_token
+                self._unsaved_events += 1
+                self._checkpoint()
+                if not self._subscribers:
+                    break
+
+    def _checkpoint(self):
+        """Save resume token in background after 'checkpoint_every' events (fan out doesn't wait for token store)."""
+        if self._unsaved_events < self._hub.checkpoint_every:
+            return
+        if self._checkpoint_task is not None and not self._checkpoint_task.done():
+            return  # previous token is still being saved, the next event retries
+        self._unsaved_events = 0
+        self._checkpoint_task = asyncio.ensure_future(self._save_checkpoint(token=self._resume_token))
+
+    async def _save_checkpoint(self, *, token: dict):
+        try:
+            await self._hub.token_store.save(key=self.key, token=token)
+        except pymongo.errors.PyMongoError as error:
+            logger.warning(msg=f"Resume token of change stream '{self.key}' wasn't saved: {error!r}")
+
+    async def _save_token(self):
+        if self._checkpoint_task is not None:  # older token must not overwrite the latest one
+            await asyncio.wait({self._checkpoint_task})
+        if self._resume_token is None or not self._unsaved_events:
+            return
+        self._unsaved_events = 0
+        await self._hub.token_store.save(key=self.key, token=self._resume_token)
+
+    def _fail(self, *, error: BaseException):
+        logger.error(msg=f"Change stream '{self.key}' stopped: {error!r}")
+        self._hub._forget(stream=self)
+        for subscription in list(self._subscribers):
+            subscription._close(error=error)
+        self._subscribers.clear()
+
+
+class ChangeStreamHub:
+    """Keep one change stream per collection and pipeline, fan out its events to local subscribers."""
+
+    def __init__(
+        self,
+        *,
+        token_store: BaseResumeTokenStore = None,
+        max_queue_size: int = 1000,  # default per subscriber queue size
+        policy: SLOW_CONSUMER_POLICIES = SLOW_CONSUMER_POLICIES.DROP_OLDEST,  # default slow consumer policy
+        checkpoint_every: int = 100,  # save resume token in background after N events (and on stop)
+        retry_delay: float = 1.0,  # seconds between reconnection attempts
+        open_timeout: typing.Optional[float] = 30.0,  # seconds 'subscribe' waits for stream to open (None -> no limit)
+    ):
+        self.token_store = token_store or MemoryResumeTokenStore()
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.checkpoint_every = checkpoint_every
+        self.retry_delay = retry_delay
+        self.open_timeout = open_timeout
+        self._streams: dict[str, _SharedChangeStream] = {}
+
+    def __repr__(self):
+        """Representation of ChangeStreamHub."""
+        return f"{self.__class__.__name__}(streams={len(self._streams)})"
+
+    @staticmethod
+    def make_key(*, repository: BaseRepository, pipeline: list[dict] = None, **kwargs) -> str:
+        """Build stable stream identifier (also used as resume token key)."""
+        digest = hashlib.sha1(bson.encode({"pipeline": pipeline or [], "options": dict(sorted(kwargs.items()))}))
+        return f"{repository.db.name}.{repository.col.name}:{digest.hexdigest()}"
+
+    @property
+    def streams(self) -> dict[str, int]:
+        """Opened streams with count of subscribers."""
+        return {key: stream.subscribers_count for key, stream in self._streams.items()}
+
+    async def subscribe(
+        self,
+        *,
+        repository: BaseRepository,
+        pipeline: list[dict] = None,
+        event_filter: typing.Callable[[dict], bool] = None,  # local filter, doesn't create new server stream
+        max_queue_size: int = None,
+        policy: SLOW_CONSUMER_POLICIES = None,
+        **kwargs,  # options for 'BaseRepository.watch' (e.g. 'full_document')
+    ) -> ChangeStreamSubscription:
+        """Subscribe to shared change stream (opens stream on first subscription)."""
+        pipeline = pipeline or []
+        key = self.make_key(repository=repository, pipeline=pipeline, **kwargs)
+        if (stream := self._streams.get(key)) is None:
+            stream = _SharedChangeStream(
+                hub=self, key=key, repository=repository, pipeline=pipeline, watch_kwargs=kwargs
+            )
+            self._streams[key] = stream
+
+        subscription = ChangeStreamSubscription(
+            stream=stream,
+            max_queue_size=max_queue_size or self.max_queue_size,
+            policy=policy or self.policy,
+            event_filter=event_filter,
+        )
+        return await stream.subscribe(subscription=subscription)
+
+    async def close(self):
+        """Stop all streams and close subscriptions."""
+        for stream in list(self._streams.values()):
+            await stream.stop()
+
+    def _forget(self, *, stream: _SharedChangeStream):
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
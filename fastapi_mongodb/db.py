@@ -1,8 +1,18 @@
 """MongoDB base logic."""
+import asyncio
 import collections.abc
+import contextlib
+import contextvars
 import datetime
 import decimal
+import functools
+import logging
+import os
+import random
 import re
+import sys
+import threading
+import time
 import typing
 
 import bson
@@ -14,12 +24,15 @@ import pymongo.database
 import pymongo.errors
 import pymongo.monitoring
 import pymongo.read_concern
+import pymongo.read_preferences
+import pymongo.write_concern
 from bson import UuidRepresentation
 
 import fastapi_mongodb.helpers
 from fastapi_mongodb.logging import simple_logger as logger
 
 __all__ = [
+    "BaseEventLogger",
     "CommandLogger",
     "ConnectionPoolLogger",
     "BaseDBManager",
@@ -30,6 +43,17 @@ __all__ = [
     "DECIMAL_CODEC",
     "TIMEDELTA_CODEC",
     "CODEC_OPTIONS",
+    "TRANSACTION_PROFILES",
+    "TransactionProfile",
+    "TransactionMetrics",
+    "get_current_session",
+    "get_command_shape",
+    "LazyDBSession",
+    "ReadRouter",
+    "RequestDBStats",
+    "RequestStatsListener",
+    "get_request_db_stats",
+    "track_request_db_stats",
 ]
 
 
@@ -164,98 +188,168 @@ CODEC_OPTIONS = bson.codec_options.CodecOptions(
 )
 
 
-# TODO: Make loggers customizable
-class CommandLogger(pymongo.monitoring.CommandListener):
+class BaseEventLogger:
+    """Options of MongoDB event loggers: nothing is formatted for disabled level, sampling and rate limit."""
+
+    def __init__(
+        self,
+        *,
+        sample_rate: float = 1.0,  # share of events to log (0.01 -> every hundredth event on average)
+        rate_limit: float = None,  # max logged events per second (None -> unlimited)
+    ):
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.suppressed = 0  # events skipped by sampling or rate limit
+        self._allowance = rate_limit or 0.0
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()  # listeners are called from executor and monitor threads
+
+    def _enabled(self) -> bool:
+        """Check if event should be logged (call it before formatting anything)."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.suppressed += 1
+            return False
+        if self.rate_limit is not None:
+            with self._lock:  # token bucket
+                now = time.monotonic()
+                self._allowance = min(self.rate_limit, self._allowance + (now - self._last_check) * self.rate_limit)
+                self._last_check = now
+                if self._allowance < 1.0:
+                    self.suppressed += 1
+                    return False
+                self._allowance -= 1.0
+        return True
+
+
+class CommandLogger(BaseEventLogger, pymongo.monitoring.CommandListener):
     def started(self, event):
-        logger.debug(
-            f"Command '{event.command_name}' with request id {event.request_id} started on server {event.connection_id}"
-        )
+        if self._enabled():
+            logger.debug(
+                "Command '%s' with request id %s started on server %s",
+                event.command_name,
+                event.request_id,
+                event.connection_id,
+            )
 
     def succeeded(self, event):
-        logger.debug(
-            f"Command '{event.command_name}' with request id {event.request_id} on server {event.connection_id} "
-            f"succeeded in {event.duration_micros} microseconds"
-        )
+        if self._enabled():
+            logger.debug(
+                "Command '%s' with request id %s on server %s succeeded in %s microseconds",
+                event.command_name,
+                event.request_id,
+                event.connection_id,
+                event.duration_micros,
+            )
 
     def failed(self, event):
-        logger.debug(
-            f"Command {event.command_name} with request id {event.request_id} on server {event.connection_id} failed "
-            f"in {event.duration_micros} microseconds"
-        )
+        if self._enabled():
+            logger.debug(
+                "Command %s with request id %s on server %s failed in %s microseconds",
+                event.command_name,
+                event.request_id,
+                event.connection_id,
+                event.duration_micros,
+            )
 
 
-class ConnectionPoolLogger(pymongo.monitoring.ConnectionPoolListener):
+class ConnectionPoolLogger(BaseEventLogger, pymongo.monitoring.ConnectionPoolListener):
     def pool_created(self, event):
-        logger.debug(f"[pool {event.address}] pool created")
+        if self._enabled():
+            logger.debug("[pool %s] pool created", event.address)
 
     def pool_cleared(self, event):
-        logger.debug(f"[pool {event.address}] pool cleared")
+        if self._enabled():
+            logger.debug("[pool %s] pool cleared", event.address)
 
     def pool_closed(self, event):
-        logger.debug(f"[pool {event.address}] pool closed")
+        if self._enabled():
+            logger.debug("[pool %s] pool closed", event.address)
 
     def connection_created(self, event):
-        logger.debug(f"[pool {event.address}][conn #{event.connection_id}] connection created")
+        if self._enabled():
+            logger.debug("[pool %s][conn #%s] connection created", event.address, event.connection_id)
 
     def connection_ready(self, event):
-        logger.debug(f"[pool {event.address}][conn #{event.connection_id}] connection setup succeeded")
+        if self._enabled():
+            logger.debug("[pool %s][conn #%s] connection setup succeeded", event.address, event.connection_id)
 
     def connection_closed(self, event):
-        logger.debug(f"[pool {event.address}][conn #{event.connection_id}] connection closed, reason: {event.reason}")
+        if self._enabled():
+            logger.debug(
+                "[pool %s][conn #%s] connection closed, reason: %s", event.address, event.connection_id, event.reason
+            )
 
     def connection_check_out_started(self, event):
-        logger.debug(f"[pool {event.address}] connection check out started")
+        if self._enabled():
+            logger.debug("[pool %s] connection check out started", event.address)
 
     def connection_check_out_failed(self, event):
-        logger.debug(f"[pool {event.address}] connection check out failed, reason: {event.reason}")
+        if self._enabled():
+            logger.debug("[pool %s] connection check out failed, reason: %s", event.address, event.reason)
 
     def connection_checked_out(self, event):
-        logger.debug(f"[pool {event.address}][conn #{event.connection_id}] connection checked out of pool")
+        if self._enabled():
+            logger.debug("[pool %s][conn #%s] connection checked out of pool", event.address, event.connection_id)
 
     def connection_checked_in(self, event):
-        logger.debug(f"[pool {event.address}][conn #{event.connection_id}] connection checked into pool")
+        if self._enabled():
+            logger.debug("[pool %s][conn #%s] connection checked into pool", event.address, event.connection_id)
 
 
-class ServerLogger(pymongo.monitoring.ServerListener):
+class ServerLogger(BaseEventLogger, pymongo.monitoring.ServerListener):
     def opened(self, event):
-        logger.debug(f"Server {event.server_address} added to topology {event.topology_id}")
+        if self._enabled():
+            logger.debug("Server %s added to topology %s", event.server_address, event.topology_id)
 
     def description_changed(self, event):
         previous_server_type = event.previous_description.server_type
         new_server_type = event.new_description.server_type
-        if new_server_type != previous_server_type:
+        if new_server_type != previous_server_type and self._enabled():
             logger.debug(
-                f"Server {event.server_address} changed type from {event.previous_description.server_type_name} to "
-                f"{event.new_description.server_type_name}"
+                "Server %s changed type from %s to %s",
+                event.server_address,
+                event.previous_description.server_type_name,
+                event.new_description.server_type_name,
             )
 
     def closed(self, event):
-        logger.debug(f"Server {event.server_address} removed from topology {event.topology_id}")
+        if self._enabled():
+            logger.debug("Server %s removed from topology %s", event.server_address, event.topology_id)
 
 
-class HeartbeatLogger(pymongo.monitoring.ServerHeartbeatListener):
+class HeartbeatLogger(BaseEventLogger, pymongo.monitoring.ServerHeartbeatListener):
     def started(self, event):
-        logger.debug(f"Heartbeat sent to server {event.connection_id}")
+        if self._enabled():
+            logger.debug("Heartbeat sent to server %s", event.connection_id)
 
     def succeeded(self, event):
-        logger.debug(f"Heartbeat to server {event.connection_id} succeeded with reply {event.reply.document}")
+        if self._enabled():  # reply is rendered only when record is emitted
+            logger.debug("Heartbeat to server %s succeeded with reply %s", event.connection_id, event.reply.document)
 
     def failed(self, event):
-        logger.debug(f"Heartbeat to server {event.connection_id} failed with error {event.reply}")
+        if self._enabled():
+            logger.debug("Heartbeat to server %s failed with error %s", event.connection_id, event.reply)
 
 
-class TopologyLogger(pymongo.monitoring.TopologyListener):
+class TopologyLogger(BaseEventLogger, pymongo.monitoring.TopologyListener):
     def opened(self, event):
-        logger.debug(f"Topology with id {event.topology_id} opened")
+        if self._enabled():
+            logger.debug("Topology with id %s opened", event.topology_id)
 
     def description_changed(self, event):
-        logger.debug(f"Topology description updated for topology id {event.topology_id}")
+        if not self._enabled():
+            return
+        logger.debug("Topology description updated for topology id %s", event.topology_id)
         previous_topology_type = event.previous_description.topology_type
         new_topology_type = event.new_description.topology_type
         if new_topology_type != previous_topology_type:
             logger.debug(
-                f"Topology {event.topology_id} changed type from {event.previous_description.topology_type_name} to "
-                f"{event.new_description.topology_type_name}"
+                "Topology %s changed type from %s to %s",
+                event.topology_id,
+                event.previous_description.topology_type_name,
+                event.new_description.topology_type_name,
             )
         if not event.new_description.has_writable_server():
             logger.debug("No writable servers available.")
@@ -263,7 +357,441 @@ class TopologyLogger(pymongo.monitoring.TopologyListener):
             logger.debug("No readable servers available.")
 
     def closed(self, event):
-        logger.debug(f"Topology with id {event.topology_id} closed")
+        if self._enabled():
+            logger.debug("Topology with id %s closed", event.topology_id)
+
+
+# fields with filter of commands that can be repeated in N+1 pattern (None -> command has no filter)
+_SHAPE_FIELDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+    "insert": None,
+}
+_LIBRARY_PATH = os.path.dirname(os.path.abspath(__file__)) + os.sep  # separator excludes "fastapi_mongodb_*" siblings
+
+_request_db_stats: contextvars.ContextVar[typing.Optional["RequestDBStats"]] = contextvars.ContextVar(
+    "fastapi_mongodb_request_db_stats", default=None
+)
+_db_call_site: contextvars.ContextVar[typing.Optional[str]] = contextvars.ContextVar(
+    "fastapi_mongodb_db_call_site", default=None
+)
+
+
+def _query_shape(value) -> str:
+    """Query without values, e.g. '{user_id: ?, status: {$in: [?]}}'."""
+    if isinstance(value, collections.abc.Mapping):
+        return "{" + ", ".join(f"{key}: {_query_shape(item)}" for key, item in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(dict.fromkeys(_query_shape(item) for item in value)) + "]"
+    return "?"
+
+
+def get_command_shape(*, command_name: str, command: typing.Mapping) -> typing.Optional[str]:
+    """Filter of command without values (None for commands without filter), e.g. '{user_id: ?}'."""
+    if field := _SHAPE_FIELDS.get(command_name):
+        return _query_shape(command.get(field))
+    return None
+
+
+def _mark_call_site():
+    """Remember first caller outside of library, commands of current context are attributed to it."""
+    if (stats := _request_db_stats.get()) is None or not stats.track_call_sites:
+        return
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename.startswith(_LIBRARY_PATH):
+        frame = frame.f_back
+    if frame is not None:
+        _db_call_site.set(f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+
+
+class RequestDBStats:
+    """Database usage of one request (filled by RequestStatsListener)."""
+
+    def __init__(self, *, track_call_sites: bool = True):
+        self.track_call_sites = track_call_sites
+        self.commands = 0
+        self.failed = 0
+        self.duration_micros = 0
+        self.request_bytes = 0
+        self.reply_bytes = 0
+        self.shapes: collections.Counter[tuple[str, str, str]] = collections.Counter()
+        self.call_sites: dict[tuple[str, str, str], set[str]] = collections.defaultdict(set)
+        # motor runs commands (and listeners) on executor threads
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Representation of RequestDBStats."""
+        return (
+            f"{self.__class__.__name__}(commands={self.commands}, duration_micros={self.duration_micros}, "
+            f"bytes={self.request_bytes + self.reply_bytes})"
+        )
+
+    @property
+    def db_time(self) -> float:
+        """Seconds spent in database commands."""
+        return self.duration_micros / 1_000_000
+
+    def repeated_queries(self, *, threshold: int = 5) -> list[dict[str, typing.Any]]:
+        """Same shape queries executed at least 'threshold' times (N+1 pattern candidates)."""
+        return [
+            {
+                "command": command_name,
+                "namespace": namespace,
+                "shape": shape,
+                "count": count,
+                "call_sites": sorted(self.call_sites.get((command_name, namespace, shape), ())),
+            }
+            for (command_name, namespace, shape), count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        """Value for 'Server-Timing' response header."""
+        return (
+            f'db;dur={self.duration_micros / 1000:.3f};desc="{self.commands} commands, '
+            f'{self.request_bytes + self.reply_bytes} bytes"'
+        )
+
+    def as_dict(self) -> dict[str, typing.Union[int, float]]:
+        return {
+            "commands": self.commands,
+            "failed": self.failed,
+            "db_time": self.db_time,
+            "request_bytes": self.request_bytes,
+            "reply_bytes": self.reply_bytes,
+        }
+
+    def _record_started(self, *, command_name: str, database_name: str, command: dict, size: int):
+        shape = None
+        if command_name in _SHAPE_FIELDS:
+            field = _SHAPE_FIELDS[command_name]
+            shape = (
+                command_name,
+                f"{database_name}.{command.get(command_name)}",
+                _query_shape(command.get(field)) if field else "",
+            )
+        call_site = _db_call_site.get() if self.track_call_sites else None
+        with self._lock:
+            self.commands += 1
+            self.request_bytes += size
+            if shape is not None:
+                self.shapes[shape] += 1
+                if call_site is not None:
+                    self.call_sites[shape].add(call_site)
+
+    def _record_finished(self, *, duration_micros: int, size: int, failed: bool = False):
+        with self._lock:
+            self.duration_micros += duration_micros
+            self.reply_bytes += size
+            self.failed += failed
+
+
+def get_request_db_stats() -> typing.Optional[RequestDBStats]:
+    """Return database usage of current request (None -> request isn't tracked)."""
+    return _request_db_stats.get()
+
+
+@contextlib.contextmanager
+def track_request_db_stats(*, track_call_sites: bool = True) -> typing.Iterator[RequestDBStats]:
+    """Collect database usage of commands executed inside block (requires RequestStatsListener)."""
+    stats = RequestDBStats(track_call_sites=track_call_sites)
+    token = _request_db_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_db_stats.reset(token)
+
+
+class RequestStatsListener(pymongo.monitoring.CommandListener):
+    """Feed RequestDBStats of context, where command was executed (register it in MongoDB client 'event_listeners')."""
+
+    def __init__(
+        self,
+        *,
+        measure_bytes: bool = True,  # BSON size of commands and replies (encodes them once more)
+        codec_options: bson.codec_options.CodecOptions = CODEC_OPTIONS,  # to encode custom types of commands
+    ):
+        self.measure_bytes = measure_bytes
+        self.codec_options = codec_options
+
+    def started(self, event):
+        if (stats := _request_db_stats.get()) is None:
+            return
+        stats._record_started(
+            command_name=event.command_name,
+            database_name=event.database_name,
+            command=event.command,
+            size=self._size(document=event.command),
+        )
+
+    def succeeded(self, event):
+        if (stats := _request_db_stats.get()) is None:
+            return
+        stats._record_finished(duration_micros=event.duration_micros, size=self._size(document=event.reply))
+
+    def failed(self, event):
+        if (stats := _request_db_stats.get()) is None:
+            return
+        stats._record_finished(duration_micros=event.duration_micros, size=0, failed=True)
+
+    def _size(self, *, document: typing.Mapping) -> int:
+        if not self.measure_bytes:
+            return 0
+        try:
+            return len(bson.encode(document, codec_options=self.codec_options))
+        except (bson.errors.InvalidDocument, TypeError):
+            return 0
+
+
+_current_session: contextvars.ContextVar[
+    typing.Optional[pymongo.client_session.ClientSession]
+] = contextvars.ContextVar("fastapi_mongodb_current_session", default=None)
+
+
+def get_current_session() -> typing.Optional[pymongo.client_session.ClientSession]:
+    """Return session of running transaction (repositories use it when no session passed explicitly)."""
+    return _current_session.get()
+
+
+class LazyDBSession:
+    """Proxy that starts MongoDB session on first use ('await lazy_session' or pass it to repository)."""
+
+    def __init__(self, *, db_manager: "BaseDBManager", **session_options):
+        self._db_manager = db_manager
+        self._session_options = session_options
+        self._session: typing.Optional[pymongo.client_session.ClientSession] = None
+        self._exit_stack: typing.Optional[contextlib.AsyncExitStack] = None
+        self._lock: typing.Optional[asyncio.Lock] = None
+        self._ended = False
+
+    def __repr__(self):
+        """Representation of LazyDBSession."""
+        return f"{self.__class__.__name__}(started={self.started}, ended={self._ended})"
+
+    def __await__(self):
+        """Start session (if it's not started yet) and return it."""
+        return self.get().__await__()
+
+    def __getattr__(self, item):
+        """Proxy attributes of started session."""
+        session = self.__dict__.get("_session")
+        if session is None:
+            raise AttributeError(
+                f"'{item}' is unavailable until session started, use 'await {self!r}' first "
+                "(or 'lazy=False' of DBSessionMiddleware and DBSession for started ClientSession)."
+            )
+        return getattr(session, item)
+
+    @property
+    def session(self) -> typing.Optional[pymongo.client_session.ClientSession]:
+        """Started session or None."""
+        return self._session
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    @property
+    def ended(self) -> bool:
+        return self._ended
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._session is not None and self._session.in_transaction
+
+    async def get(self) -> pymongo.client_session.ClientSession:
+        """Start session (if it's not started yet) and return it."""
+        if self._session is not None:
+            return self._session
+        if self._ended:
+            raise RuntimeError("Session already ended.")
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._session is None:
+                exit_stack = contextlib.AsyncExitStack()
+                client = self._db_manager.retrieve_client()
+                self._session = await exit_stack.enter_async_context(
+                    await client.start_session(**self._session_options)
+                )
+                self._exit_stack = exit_stack
+        return self._session
+
+    async def end(self):
+        """End session if it was started."""
+        self._ended = True
+        if self._exit_stack is not None:
+            exit_stack, self._exit_stack, self._session = self._exit_stack, None, None
+            await exit_stack.aclose()
+
+
+class _ReadRoutingState:
+    def __init__(self, *, safe: bool, client_key: typing.Optional[str], pinned_until: float):
+        self.safe = safe
+        self.client_key = client_key
+        self.pinned_until = pinned_until
+        self.causal_session: typing.Optional[pymongo.client_session.ClientSession] = None
+
+
+class ReadRouter:
+    """Route reads of safe requests to secondaries, pin reads to primary for a while after client writes."""
+
+    SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+    def __init__(
+        self,
+        *,
+        # maxStalenessSeconds must be at least 90 seconds
+        safe_read_preference: pymongo.ReadPreference = pymongo.read_preferences.Nearest(max_staleness=90),
+        pin_window: float = 5.0,  # seconds while reads of the same client go to primary after its write
+        max_clients: int = 10000,  # pinned clients limit (oldest pins are dropped first)
+        causal_sessions: bool = True,  # reads through causally consistent session that wrote aren't pinned
+    ):
+        self.safe_read_preference = safe_read_preference
+        self.pin_window = pin_window
+        self.max_clients = max_clients
+        self.causal_sessions = causal_sessions
+        self._pins: collections.OrderedDict[str, float] = collections.OrderedDict()
+        self._state: contextvars.ContextVar[typing.Optional[_ReadRoutingState]] = contextvars.ContextVar(
+            f"fastapi_mongodb_read_routing_{id(self)}", default=None
+        )
+
+    def begin_request(self, *, method: str, client_key: str = None) -> contextvars.Token:
+        """Start routing for request (reads outside of requests use database read preference)."""
+        pinned_until = 0.0
+        if client_key is not None and (client_pin := self._pins.get(client_key)) is not None:
+            if client_pin > time.monotonic():
+                pinned_until = client_pin
+            else:
+                del self._pins[client_key]
+        state = _ReadRoutingState(
+            safe=method.upper() in self.SAFE_METHODS, client_key=client_key, pinned_until=pinned_until
+        )
+        return self._state.set(state)
+
+    def end_request(self, token: contextvars.Token):
+        """Finish request routing."""
+        self._state.reset(token)
+
+    @contextlib.contextmanager
+    def route_request(self, *, method: str, client_key: str = None):
+        """Context manager alternative to 'begin_request' and 'end_request'."""
+        token = self.begin_request(method=method, client_key=client_key)
+        try:
+            yield
+        finally:
+            self.end_request(token)
+
+    def record_write(self, *, session: pymongo.client_session.ClientSession = None):
+        """Pin reads of current request (and following requests of its client) to primary."""
+        if (state := self._state.get()) is None:
+            return
+        state.pinned_until = time.monotonic() + self.pin_window
+        if self.causal_sessions and session is not None and session.options.causal_consistency:
+            state.causal_session = session
+        if state.client_key is not None:
+            self._pins[state.client_key] = state.pinned_until
+            self._pins.move_to_end(state.client_key)
+            while len(self._pins) > self.max_clients:
+                self._pins.popitem(last=False)
+
+    def is_pinned(self) -> bool:
+        return (state := self._state.get()) is not None and state.pinned_until > time.monotonic()
+
+    def read_preference(
+        self, *, session: pymongo.client_session.ClientSession = None
+    ) -> typing.Optional[pymongo.ReadPreference]:
+        """Read preference for current request (None -> use database default)."""
+        if (state := self._state.get()) is None:
+            return None
+        if session is not None and session.in_transaction:
+            return None  # transactions read with their own read preference
+        if not state.safe:
+            return pymongo.ReadPreference.PRIMARY
+        # causally consistent session reads its own majority writes from any member
+        if self.is_pinned() and (session is None or session is not state.causal_session):
+            return pymongo.ReadPreference.PRIMARY
+        return self.safe_read_preference
+
+
+class TransactionProfile:
+    """Read/write concerns and read preference for transaction."""
+
+    def __init__(
+        self,
+        *,
+        read_concern: pymongo.read_concern.ReadConcern = None,
+        write_concern: pymongo.write_concern.WriteConcern = None,
+        read_preference: pymongo.ReadPreference = None,
+        max_commit_time_ms: int = None,
+    ):
+        self.read_concern = read_concern
+        self.write_concern = write_concern
+        self.read_preference = read_preference
+        self.max_commit_time_ms = max_commit_time_ms
+
+    def __repr__(self):
+        """Representation of TransactionProfile."""
+        return (
+            f"{self.__class__.__name__}(read_concern={self.read_concern}, write_concern={self.write_concern}, "
+            f"read_preference={self.read_preference})"
+        )
+
+    def as_options(self) -> dict[str, typing.Any]:
+        """Keyword arguments for 'start_transaction'."""
+        return {
+            "read_concern": self.read_concern,
+            "write_concern": self.write_concern,
+            "read_preference": self.read_preference,
+            "max_commit_time_ms": self.max_commit_time_ms,
+        }
+
+
+TRANSACTION_PROFILES = {
+    # reads see majority committed data, writes survive replica set elections
+    "majority": TransactionProfile(
+        read_concern=pymongo.read_concern.ReadConcern(level="majority"),
+        write_concern=pymongo.write_concern.WriteConcern(w="majority", j=True),
+        read_preference=pymongo.ReadPreference.PRIMARY,
+    ),
+    # all reads use one point in time snapshot
+    "snapshot": TransactionProfile(
+        read_concern=pymongo.read_concern.ReadConcern(level="snapshot"),
+        write_concern=pymongo.write_concern.WriteConcern(w="majority", j=True),
+        read_preference=pymongo.ReadPreference.PRIMARY,
+    ),
+    # fastest, committed data can be rolled back on primary failover
+    "local": TransactionProfile(
+        read_concern=pymongo.read_concern.ReadConcern(level="local"),
+        write_concern=pymongo.write_concern.WriteConcern(w=1),
+        read_preference=pymongo.ReadPreference.PRIMARY,
+    ),
+}
+
+
+class TransactionMetrics:
+    """Counters of transactions executed by BaseDBManager."""
+
+    def __init__(self):
+        self.started = 0  # attempts, including retries
+        self.committed = 0
+        self.aborted = 0
+        self.retries = 0  # whole transaction retries after "TransientTransactionError"
+        self.commit_retries = 0  # commit retries after "UnknownTransactionCommitResult"
+        self.failed = 0  # transactions that raised to caller
+        self.total_time = 0.0  # seconds spent in transactions
+
+    def __repr__(self):
+        """Representation of TransactionMetrics."""
+        return f"{self.__class__.__name__}({', '.join(f'{k}={v}' for k, v in self.as_dict().items())})"
+
+    def as_dict(self) -> dict[str, typing.Union[int, float]]:
+        return dict(self.__dict__)
 
 
 class BaseDBManager:
@@ -277,6 +805,7 @@ class BaseDBManager:
         self.db_url = db_url
         self.default_db_name = default_db_name
         self.codec_options = code_options
+        self.transaction_metrics = TransactionMetrics()
 
     def retrieve_client(self) -> pymongo.MongoClient:
         """Retrieve existing MongoDB client or create it (at first call)."""
@@ -296,6 +825,120 @@ class BaseDBManager:
         self.__class__.client.close()
         self.__class__.client = None  # noqa
 
+    async def run_transaction(
+        self,
+        callback: typing.Callable[[pymongo.client_session.ClientSession], typing.Awaitable],
+        *,
+        profile: typing.Union[str, TransactionProfile] = "majority",
+        max_time: float = 120.0,  # seconds for all attempts (the same limit as in 'ClientSession.with_transaction')
+        backoff_base: float = 0.01,  # seconds, first retry delay upper bound (doubles on each retry)
+        backoff_max: float = 1.0,  # seconds, retry delay upper bound
+        session: pymongo.client_session.ClientSession = None,
+    ):
+        """Run 'callback' in transaction, retry it on transient errors (callback may be called more than once)."""
+        if isinstance(profile, str):
+            profile = TRANSACTION_PROFILES[profile]
+        current_session = session or get_current_session()
+        if current_session is not None and current_session.in_transaction:
+            # MongoDB has no nested transactions, callback becomes part of outer one
+            return await callback(current_session)
+
+        start_time = time.monotonic()
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                if session is None:
+                    session = await stack.enter_async_context(await self.retrieve_client().start_session())
+                return await self._run_transaction(
+                    callback=callback,
+                    session=session,
+                    profile=profile,
+                    deadline=start_time + max_time,
+                    backoff=(backoff_base, backoff_max),
+                )
+        except BaseException:
+            self.transaction_metrics.failed += 1
+            raise
+        finally:
+            self.transaction_metrics.total_time += time.monotonic() - start_time
+
+    def transactional(self, **options):
+        """Decorator to run coroutine function in transaction (repositories use its session automatically)."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await self.run_transaction(lambda session: func(*args, **kwargs), **options)
+
+            return wrapper
+
+        return decorator
+
+    async def _run_transaction(
+        self,
+        *,
+        callback: typing.Callable[[pymongo.client_session.ClientSession], typing.Awaitable],
+        session: pymongo.client_session.ClientSession,
+        profile: TransactionProfile,
+        deadline: float,
+        backoff: tuple[float, float],
+    ):
+        metrics, attempt = self.transaction_metrics, 0
+        while True:
+            attempt += 1
+            metrics.started += 1
+            session.start_transaction(**profile.as_options())
+            token = _current_session.set(session)
+            try:
+                result = await callback(session)
+            except BaseException as error:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                    metrics.aborted += 1
+                if self._has_error_label(error, "TransientTransactionError") and time.monotonic() < deadline:
+                    metrics.retries += 1
+                    await self._backoff(attempt=attempt, deadline=deadline, backoff=backoff)
+                    continue
+                raise
+            finally:
+                _current_session.reset(token)
+
+            if not session.in_transaction:  # callback committed or aborted transaction by itself
+                return result
+
+            commit_attempt = 0
+            while True:
+                commit_attempt += 1
+                try:
+                    await session.commit_transaction()
+                except pymongo.errors.PyMongoError as error:
+                    max_time_expired = isinstance(error, pymongo.errors.OperationFailure) and error.code == 50
+                    if (
+                        error.has_error_label("UnknownTransactionCommitResult")
+                        and not max_time_expired
+                        and time.monotonic() < deadline
+                    ):
+                        metrics.commit_retries += 1
+                        await self._backoff(attempt=commit_attempt, deadline=deadline, backoff=backoff)
+                        continue
+                    if error.has_error_label("TransientTransactionError") and time.monotonic() < deadline:
+                        metrics.retries += 1
+                        await self._backoff(attempt=attempt, deadline=deadline, backoff=backoff)
+                        break  # retry whole transaction
+                    raise
+                metrics.committed += 1
+                return result
+
+    @staticmethod
+    def _has_error_label(error: BaseException, label: str) -> bool:
+        return isinstance(error, pymongo.errors.PyMongoError) and error.has_error_label(label)
+
+    @staticmethod
+    async def _backoff(*, attempt: int, deadline: float, backoff: tuple[float, float]):
+        """Sleep with "full jitter" exponential backoff, never past deadline."""
+        backoff_base, backoff_max = backoff
+        delay = random.uniform(0, min(backoff_max, backoff_base * 2 ** (attempt - 1)))  # nosec (not cryptography)
+        await asyncio.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+
     async def get_server_info(self, *, session: pymongo.client_session.ClientSession = None) -> dict:
         client = self.retrieve_client()
         return await client.server_info(session=session)
@@ -1,4 +1,6 @@
 """Library code for working with FastAPI dependencies."""
+import typing
+
 import fastapi
 import pymongo.client_session
 
@@ -8,17 +10,45 @@ __all__ = ["DBSession"]
 
 
 class DBSession:
-    def __init__(self, db_manager: fastapi_mongodb.db.BaseDBManager = None, state_attr_name: str = "db_manager"):
+    def __init__(
+        self,
+        db_manager: fastapi_mongodb.db.BaseDBManager = None,
+        state_attr_name: str = "db_manager",
+        *,
+        lazy: bool = True,  # yield LazyDBSession that starts on first use (False -> started ClientSession)
+        causal_consistency: bool = None,  # pymongo default is True (False for snapshot sessions)
+        snapshot: bool = False,  # all reads in session use the same snapshot (MongoDB 5.0+)
+    ):
+        if snapshot and causal_consistency:
+            raise ValueError("Snapshot reads don't support causal consistency, use only one of them.")
         self.db_manager = db_manager
         self.state_attr_name = state_attr_name
+        self.lazy = lazy
+        self.session_options = {"snapshot": snapshot}
+        if causal_consistency is not None:
+            self.session_options["causal_consistency"] = causal_consistency
+        self.requests_served = 0
+        self.sessions_created = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Counters to compare sessions created with requests served."""
+        return {"requests_served": self.requests_served, "sessions_created": self.sessions_created}
 
-    async def __call__(self, request: fastapi.Request) -> pymongo.client_session.ClientSession:
+    async def __call__(
+        self, request: fastapi.Request
+    ) -> typing.Union[fastapi_mongodb.db.LazyDBSession, pymongo.client_session.ClientSession]:
         db_manager = self.db_manager or getattr(request.app.state, self.state_attr_name, None)
         if not db_manager:
             raise NotImplementedError(
                 "Provide 'db_manager' parameter to dependency initializer OR set '<FastAPI APP>.state.db_manager' "
                 "to global app state"
             )
-        db_client = db_manager.retrieve_client()
-        async with await db_client.start_session() as session:
-            yield session
+        self.requests_served += 1
+        db_session = fastapi_mongodb.db.LazyDBSession(db_manager=db_manager, **self.session_options)
+        try:
+            yield db_session if self.lazy else await db_session
+        finally:
+            if db_session.started:
+                self.sessions_created += 1
+            await db_session.end()
@@ -1,14 +1,37 @@
 """Classes and functions to provide common timezones, profiling etc."""
+import asyncio
+import collections
+import contextlib
+import contextvars
+import cProfile
 import datetime
+import enum
 import functools
+import logging
+import math
+import pathlib
+import pstats
+import re
+import sys
+import threading
 import time
 import tracemalloc
+import types
 import typing
 import zoneinfo
 
 from fastapi_mongodb.logging import simple_logger
 
-__all__ = ["get_utc_timezone", "utc_now", "as_utc", "BaseProfiler"]
+__all__ = [
+    "get_utc_timezone",
+    "utc_now",
+    "as_utc",
+    "PROFILER_MODES",
+    "ProfileStats",
+    "ProfiledBlock",
+    "AllocationTracker",
+    "BaseProfiler",
+]
 
 
 @functools.lru_cache()
@@ -27,7 +50,314 @@ def as_utc(date_time: datetime.datetime) -> datetime.datetime:
     return date_time.astimezone(tz=get_utc_timezone())
 
 
+class PROFILER_MODES(str, enum.Enum):
+    TIMING = "timing"  # wall time and memory only
+    SAMPLING = "sampling"  # periodic stack samples of profiled thread (collapsed stacks for flamegraphs)
+    CPROFILE = "cprofile"  # deterministic profile of every call (pstats), much higher overhead
+
+
+class ProfileStats:
+    """Aggregated measurements of one profiled function or code block."""
+
+    def __init__(self, *, max_samples: int = 1000):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.max_memory = 0  # bytes, the biggest growth of traced memory during one call
+        self._samples: collections.deque[int] = collections.deque(maxlen=max_samples)  # latest durations
+
+    def __repr__(self):
+        """Representation of ProfileStats."""
+        return f"{self.__class__.__name__}(count={self.count}, mean={self.mean:.6f}, max={self.max_ns / 1e9:.6f})"
+
+    @property
+    def mean(self) -> float:
+        """Mean duration in seconds."""
+        return self.total_ns / self.count / 1e9 if self.count else 0.0
+
+    def add(self, *, duration_ns: int, memory: int = 0):
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+        self.max_memory = max(self.max_memory, memory)
+        self._samples.append(duration_ns)
+
+    def percentile(self, percent: float) -> float:
+        """Duration in seconds (nearest rank of latest samples)."""
+        if not self._samples:
+            return 0.0
+        samples = sorted(self._samples)
+        return samples[max(0, math.ceil(percent / 100 * len(samples)) - 1)] / 1e9
+
+    def as_dict(self) -> dict[str, typing.Union[int, float]]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max_ns / 1e9,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max_memory": self.max_memory,
+        }
+
+
+class ProfiledBlock:
+    """Measurement of one code block (name can be changed until block ends)."""
+
+    __slots__ = ("name", "duration", "memory", "profiled")
+
+    def __init__(self, *, name: str):
+        self.name = name
+        self.duration = 0.0  # seconds
+        self.memory = 0  # bytes, growth of traced memory
+        self.profiled = False  # stacks or profile recorded (only one block of thread at a time is profiled)
+
+    def __repr__(self):
+        """Representation of ProfiledBlock."""
+        return f"{self.__class__.__name__}(name={self.name!r}, duration={self.duration:.6f}, memory={self.memory})"
+
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0  # profiled calls in progress, tracemalloc is stopped after the last one
+_tracemalloc_owned = False  # tracing was started by profiler (tracing started outside of profilers is left as is)
+
+
+def _acquire_tracemalloc(*, number_frames: int):
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if not _tracemalloc_users and not tracemalloc.is_tracing():
+            tracemalloc.start(number_frames) if number_frames else tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if not _tracemalloc_users and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+class AllocationTracker:
+    """Periodic tracemalloc snapshots, that find allocation sites growing through all retained snapshots (leaks)."""
+
+    def __init__(
+        self,
+        *,
+        number_frames: int = 10,  # frames of allocation traceback (sites are grouped by whole traceback)
+        every_calls: int = None,  # take snapshot after every N profiled calls
+        interval: float = None,  # seconds, take snapshot not earlier than after 'interval' since previous one
+        retention: int = 5,  # snapshots kept to compare (only sizes by traceback are kept, not traces)
+        min_growth: int = 1024,  # bytes, ignore smaller growth between the oldest and the newest snapshots
+        include_files: list[str] = None,
+        exclude_files: list[str] = None,
+    ):
+        if every_calls is None and interval is None:
+            raise ValueError("Provide 'every_calls' or 'interval' of snapshots.")
+        self.number_frames = number_frames
+        self.every_calls = every_calls
+        self.interval = interval
+        self.retention = retention
+        self.min_growth = min_growth
+        self.filters = [
+            tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+            tracemalloc.Filter(inclusive=False, filename_pattern="<frozen importlib._bootstrap*>"),
+            *(tracemalloc.Filter(inclusive=True, filename_pattern=file_name) for file_name in include_files or []),
+            *(tracemalloc.Filter(inclusive=False, filename_pattern=file_name) for file_name in exclude_files or []),
+        ]
+        # (monotonic time, {traceback: (size, count)}) of retained snapshots, oldest first
+        self._snapshots: collections.deque[
+            tuple[float, dict[tracemalloc.Traceback, tuple[int, int]]]
+        ] = collections.deque(maxlen=retention)
+        self._calls = 0
+        self._started = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Representation of AllocationTracker."""
+        return f"{self.__class__.__name__}(snapshots={len(self._snapshots)}, retention={self.retention})"
+
+    @property
+    def snapshots_count(self) -> int:
+        return len(self._snapshots)
+
+    def start(self):
+        """Start tracing allocations (until 'stop')."""
+        with self._lock:
+            if not self._started:
+                _acquire_tracemalloc(number_frames=self.number_frames)
+                self._started = True
+
+    def stop(self):
+        """Stop tracing and drop snapshots."""
+        with self._lock:
+            if self._started:
+                _release_tracemalloc()
+                self._started = False
+            self._snapshots.clear()
+            self._calls = 0
+
+    def tick(self):
+        """Count profiled call and take snapshot, if it's due."""
+        with self._lock:
+            self._calls += 1
+            due = self.every_calls is not None and self._calls >= self.every_calls
+            if self.interval is not None:
+                due = due or not self._snapshots or time.monotonic() - self._snapshots[-1][0] >= self.interval
+        if due:
+            self.take_snapshot()
+
+    def take_snapshot(self):
+        """Save sizes of allocations by traceback."""
+        self.start()  # allocations are traced since the first snapshot, if tracker wasn't started before
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters=self.filters)
+        sizes = {stat.traceback: (stat.size, stat.count) for stat in snapshot.statistics(key_type="traceback")}
+        del snapshot
+        with self._lock:
+            self._calls = 0
+            self._snapshots.append((time.monotonic(), sizes))
+
+    def diff(self, *, limit: int = 10) -> list[dict[str, typing.Any]]:
+        """The biggest changes between the last two snapshots."""
+        with self._lock:
+            if len(self._snapshots) < 2:
+                return []
+            (_, previous), (_, current) = self._snapshots[-2], self._snapshots[-1]
+        changes = []
+        for traceback in previous.keys() | current.keys():
+            size, count = current.get(traceback, (0, 0))
+            previous_size, previous_count = previous.get(traceback, (0, 0))
+            if size != previous_size:
+                changes.append(
+                    self._site(traceback=traceback, size=size, count=count)
+                    | {
+                        "size_diff": size - previous_size,
+                        "count_diff": count - previous_count,
+                    }
+                )
+        return sorted(changes, key=lambda change: abs(change["size_diff"]), reverse=True)[:limit]
+
+    def growing(self, *, limit: int = 10, min_snapshots: int = 3) -> list[dict[str, typing.Any]]:
+        """Allocation sites, which size grew between every two consecutive retained snapshots."""
+        with self._lock:
+            if len(self._snapshots) < min_snapshots:
+                return []
+            snapshots = [sizes for _, sizes in self._snapshots]
+        sites = []
+        for traceback, (size, count) in snapshots[-1].items():
+            history = [sizes.get(traceback, (0, 0))[0] for sizes in snapshots]
+            if (
+                all(earlier < later for earlier, later in zip(history, history[1:]))
+                and (growth := history[-1] - history[0]) >= self.min_growth
+            ):
+                sites.append(self._site(traceback=traceback, size=size, count=count) | {"growth": growth})
+        return sorted(sites, key=lambda site: site["growth"], reverse=True)[:limit]
+
+    def report(self, *, limit: int = 10):
+        """Log growing allocation sites."""
+        for site in self.growing(limit=limit):
+            traceback = " <- ".join(reversed(site["traceback"]))  # the most recent frame first
+            simple_logger.warning(
+                msg=f"Possible memory leak: +{site['growth']} bytes over {len(self._snapshots)} snapshots, "
+                f"{site['size']} bytes in {site['count']} blocks allocated at: {traceback}"
+            )
+
+    @staticmethod
+    def _site(*, traceback: tracemalloc.Traceback, size: int, count: int) -> dict[str, typing.Any]:
+        return {"traceback": [f"{frame.filename}:{frame.lineno}" for frame in traceback], "size": size, "count": count}
+
+
+def _collapse_stack(frame: types.FrameType) -> str:
+    """Stack in collapsed format of flamegraph tools (root first, frames separated by ';')."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _StackSampler:
+    """Background thread, that counts stacks of another thread."""
+
+    def __init__(self, *, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: collections.Counter[str] = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-stack-sampler", daemon=True)
+
+    def start(self) -> "_StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> collections.Counter[str]:
+        self._stopped.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if (frame := sys._current_frames().get(self.thread_id)) is None:  # profiled thread has finished
+                return
+            self.counts[_collapse_stack(frame)] += 1
+            del frame
+
+
+class _CollectorState(threading.local):
+    """Profiled blocks of thread (one stack sampler or cProfile.Profile sees frames of all tasks running in it)."""
+
+    def __init__(self):
+        self.blocks = 0  # outermost profiled blocks of tasks in flight
+        self.overlapped = False  # stacks of active collector include frames of other tasks
+
+
+_collector_state = _CollectorState()
+# thread of the outermost profiled block of current task (blocks nested in it are measured by it)
+_outer_block_thread: contextvars.ContextVar[typing.Optional[int]] = contextvars.ContextVar(
+    "fastapi_mongodb_profiler_outer_block_thread", default=None
+)
+
+
+def _start_collector(
+    *, mode: PROFILER_MODES, sample_interval: float
+) -> tuple[bool, typing.Union[_StackSampler, cProfile.Profile, None]]:
+    """Register the outermost block of task, start collector only if no block of other task is in flight."""
+    thread_id = threading.get_ident()
+    if _outer_block_thread.get() == thread_id:
+        return False, None
+    _outer_block_thread.set(thread_id)
+    _collector_state.blocks += 1
+    if _collector_state.blocks > 1:  # every concurrent block is left without stacks, including the running one
+        _collector_state.overlapped = True
+        return True, None
+    if mode == PROFILER_MODES.SAMPLING:
+        collector = _StackSampler(thread_id=thread_id, interval=sample_interval).start()
+    else:
+        collector = cProfile.Profile()
+        collector.enable()
+    _collector_state.overlapped = False
+    return True, collector
+
+
+def _stop_collector(collector: typing.Union[_StackSampler, cProfile.Profile, None]) -> bool:
+    """Unregister the outermost block of task, return False if its stacks weren't collected or are mixed."""
+    _outer_block_thread.set(None)
+    _collector_state.blocks -= 1
+    if collector is None:
+        return False
+    if isinstance(collector, cProfile.Profile):
+        collector.disable()
+    else:
+        collector.stop()
+    return not _collector_state.overlapped
+
+
 class BaseProfiler:
+    """Measure functions and code blocks, aggregate measurements by name (safe for concurrent tasks and threads)."""
+
     def __init__(
         self,
         number_frames: int = 10,
@@ -35,57 +365,186 @@ class BaseProfiler:
         exclude_files: list[str] = None,
         show_timing: bool = True,
         show_memory: bool = True,
+        *,
+        name: str = "CODE BLOCK",  # name of context manager measurements
+        max_samples: int = 1000,  # latest durations kept per name to calculate percentiles
+        mode: PROFILER_MODES = PROFILER_MODES.TIMING,
+        sample_interval: float = 0.005,  # seconds between stack samples in SAMPLING mode
+        allocation_tracker: AllocationTracker = None,  # snapshots of allocations to find leaks (counts profiled calls)
     ):
         self.number_frames = number_frames
         self.include_files = include_files or []
         self.exclude_files = exclude_files or []
         self.show_timing = show_timing
         self.show_memory = show_memory
-        self._start_time = None
-        self._end_time = None
+        self.name = name
+        self.max_samples = max_samples
+        self.mode = PROFILER_MODES(mode)
+        self.sample_interval = sample_interval
+        self.allocation_tracker = allocation_tracker
+        self._stats: dict[str, ProfileStats] = {}
+        self._stacks: dict[str, collections.Counter[str]] = {}
+        self._pstats: dict[str, pstats.Stats] = {}
+        self._lock = threading.Lock()
+        # started context manager blocks of current task or thread: ((start ns, memory, traced, outer, collector), ...)
+        self._blocks: contextvars.ContextVar[tuple] = contextvars.ContextVar(f"profiler_blocks_{id(self)}", default=())
 
     def __call__(self, func):
-        """Call function to work with profiler as decorator."""
+        """Call function to work with profiler as decorator (coroutine functions are measured until return)."""
+        name = func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_decorated(*args, **kwargs):
+                started = self._start()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._stop(name=name, started=started)
+
+            return async_decorated
 
         @functools.wraps(func)
         def decorated(*args, **kwargs):
-            self._start_trace_malloc()
-            self._set_start_time()
-            result = func(*args, **kwargs)
-            self._set_end_time()
-            self._print_timing(name=func.__name__)
-            self._end_trace_malloc()
-            return result
+            started = self._start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._stop(name=name, started=started)
 
         return decorated
 
-    def _set_start_time(self):
-        """Set time start point."""
-        self._start_time = time.time()
-
-    def _set_end_time(self):
-        """Set time end point."""
-        self._end_time = time.time()
-
     def __enter__(self):
         """Start profiling."""
-        self._start_trace_malloc()
-        self._set_start_time()
+        self._blocks.set((*self._blocks.get(), self._start()))
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """End profiling."""
-        self._set_end_time()
-        self._print_timing(name="CODE BLOCK")
-        self._end_trace_malloc()
+        *blocks, started = self._blocks.get()
+        self._blocks.set(tuple(blocks))
+        self._stop(name=self.name, started=started)
 
-    def _start_trace_malloc(self):
-        if not self.show_memory:
-            return
+    async def __aenter__(self):
+        """Start profiling of async code block."""
+        self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """End profiling of async code block."""
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+    @contextlib.contextmanager
+    def block(self, *, name: str) -> typing.Iterator[ProfiledBlock]:
+        """Profile code block under custom name (works across 'await', memory growth without snapshot logging)."""
+        block = ProfiledBlock(name=name)
+        started = self._start()
+        try:
+            yield block
+        finally:
+            duration_ns, block.memory, block.profiled = self._stop(
+                name=block.name, started=started, log_snapshot=False  # blocks are profiled per request
+            )
+            block.duration = duration_ns / 1e9
+
+    @property
+    def stats(self) -> dict[str, dict[str, typing.Union[int, float]]]:
+        """Aggregated measurements by function or block name."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def collapsed_stacks(self, *, name: str) -> dict[str, int]:
+        """Sampled stacks with counts (SAMPLING mode)."""
+        with self._lock:
+            return dict(self._stacks.get(name, {}))
+
+    def profile_stats(self, *, name: str) -> typing.Optional[pstats.Stats]:
+        """Accumulated deterministic profile (CPROFILE mode)."""
+        with self._lock:
+            return self._pstats.get(name)
+
+    def dump(self, *, directory: typing.Union[str, pathlib.Path]) -> list[pathlib.Path]:
+        """Write '<name>.collapsed' (input of flamegraph.pl, speedscope etc.) and '<name>.pstats' files."""
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        with self._lock:
+            for name, counts in self._stacks.items():
+                path = directory / f"{self._file_name(name=name)}.collapsed"
+                path.write_text("".join(f"{stack} {count}\n" for stack, count in counts.items()))
+                paths.append(path)
+            for name, stats in self._pstats.items():
+                path = directory / f"{self._file_name(name=name)}.pstats"
+                stats.dump_stats(path)
+                paths.append(path)
+        return paths
 
-        tracemalloc.start(self.number_frames) if self.number_frames else tracemalloc.start()
+    def reset(self):
+        """Drop aggregated measurements."""
+        with self._lock:
+            self._stats.clear()
+            self._stacks.clear()
+            self._pstats.clear()
+
+    @staticmethod
+    def _file_name(*, name: str) -> str:
+        return re.sub(r"[^\w.-]+", "_", name).strip("_") or "profile"
+
+    def _start(self) -> tuple[int, int, bool, bool, typing.Union[_StackSampler, cProfile.Profile, None]]:
+        memory = 0
+        if self.show_memory:
+            _acquire_tracemalloc(number_frames=self.number_frames)
+            memory = tracemalloc.get_traced_memory()[0]
+        outer, collector = False, None
+        if self.mode != PROFILER_MODES.TIMING:
+            outer, collector = _start_collector(mode=self.mode, sample_interval=self.sample_interval)
+        return time.perf_counter_ns(), memory, self.show_memory, outer, collector
+
+    def _stop(
+        self,
+        *,
+        name: str,
+        started: tuple[int, int, bool, bool, typing.Union[_StackSampler, cProfile.Profile, None]],
+        log_snapshot: bool = True,
+    ) -> tuple[int, int, bool]:
+        end = time.perf_counter_ns()
+        start, start_memory, traced, outer, collector = started
+        if outer and not _stop_collector(collector):
+            collector = None  # stacks of concurrent tasks would be attributed to this name
+        memory = 0
+        if traced:
+            memory = max(0, tracemalloc.get_traced_memory()[0] - start_memory)
+            if log_snapshot:
+                self._end_trace_malloc()
+            _release_tracemalloc()
+        self._record(name=name, duration_ns=end - start, memory=memory, collector=collector)
+        self._print_timing(name=name, duration_ns=end - start)
+        if self.allocation_tracker is not None:
+            self.allocation_tracker.tick()
+        return end - start, memory, collector is not None
+
+    def _record(
+        self,
+        *,
+        name: str,
+        duration_ns: int,
+        memory: int,
+        collector: typing.Union[_StackSampler, cProfile.Profile, None] = None,
+    ):
+        with self._lock:
+            if (stats := self._stats.get(name)) is None:
+                stats = self._stats[name] = ProfileStats(max_samples=self.max_samples)
+            stats.add(duration_ns=duration_ns, memory=memory)
+            if isinstance(collector, _StackSampler):
+                self._stacks.setdefault(name, collections.Counter()).update(collector.counts)
+            elif collector is not None:
+                if (profile_stats := self._pstats.get(name)) is None:
+                    self._pstats[name] = pstats.Stats(collector)
+                else:
+                    profile_stats.add(collector)
 
     def _end_trace_malloc(self):
-        if not self.show_memory:
+        # traces are shared by concurrent calls, so they are not cleared here (tracemalloc stops after the last call)
+        if not simple_logger.isEnabledFor(logging.DEBUG):
             return
 
         simple_logger.debug(msg="=== START SNAPSHOT ===")
@@ -100,7 +559,6 @@ class BaseProfiler:
             f"❗peak={self._bytes_to_megabytes(size=peak)}, "
             f"💾snapshot_size={self._bytes_to_megabytes(size=snapshot_size)}"
         )
-        tracemalloc.clear_traces()
         simple_logger.debug(msg="=== END SNAPSHOT ===")
 
     def _get_trace_malloc_filters(
@@ -116,9 +574,7 @@ class BaseProfiler:
     def _bytes_to_megabytes(size: int, precision: int = 3):
         return f"{size / 1024.0 / 1024.0:.{precision}f} MB"
 
-    def _print_timing(self, name: str, precision: int = 6):
+    def _print_timing(self, name: str, duration_ns: int, precision: int = 6):
         if not self.show_timing:
             return
-        simple_logger.debug(
-            f"📊Execution timing of: '{name}' ⏱: {self._end_time - self._start_time:.{precision}f} seconds"
-        )
+        simple_logger.debug(f"📊Execution timing of: '{name}' ⏱: {duration_ns / 1e9:.{precision}f} seconds")
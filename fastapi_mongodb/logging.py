@@ -3,12 +3,28 @@ import copy
 import enum
 import functools
 import logging
+import logging.handlers
+import queue
+import time
 import typing
 from typing import Union
 
 import click
 
-__all__ = ["logger", "simple_logger", "setup_logging"]
+try:
+    import orjson
+
+    def json_dumps(data: dict) -> str:
+        return orjson.dumps(data, default=str).decode()
+
+except ImportError:
+    import json
+
+    def json_dumps(data: dict) -> str:
+        return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+__all__ = ["logger", "simple_logger", "setup_logging", "BackgroundQueueHandler", "JSONFormatter", "ContextFilter"]
 
 TRACE = 5
 SUCCESS = 25
@@ -280,6 +296,105 @@ class DebugFormatter(logging.Formatter):
         return super().formatMessage(record=record_copy)
 
 
+class JSONFormatter(logging.Formatter):
+    """Structured formatter, renders only configured fields of record as one JSON line."""
+
+    def __init__(
+        self,
+        fields: typing.Sequence[str] = ("time", "level", "logger", "message"),  # record attributes or these aliases
+        extra_fields: typing.Sequence[str] = (),  # attributes from 'extra' or ContextFilter, skipped when missing
+        rename: typing.Mapping[str, str] = None,  # output keys, e.g. {"level": "severity"}
+    ):
+        super().__init__()
+        self.fields = tuple(fields)
+        self.extra_fields = tuple(extra_fields)
+        self.rename = dict(rename or {})
+        self._getters = {
+            "time": self._format_time,
+            "level": self._format_level,
+            "logger": lambda record: record.name,
+            "message": lambda record: record.getMessage(),
+        }
+        self._level_names: dict[int, str] = {}
+        self._cached_second: typing.Optional[int] = None
+        self._cached_time = ""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {}
+        for field in self.fields:
+            getter = self._getters.get(field)
+            data[self.rename.get(field, field)] = getter(record) if getter else getattr(record, field, None)
+        for field in self.extra_fields:
+            if (value := record.__dict__.get(field)) is not None:
+                data[self.rename.get(field, field)] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(ei=record.exc_info)
+        if record.exc_text:
+            data[self.rename.get("exception", "exception")] = record.exc_text
+        if record.stack_info:
+            data[self.rename.get("stack", "stack")] = self.formatStack(stack_info=record.stack_info)
+        return json_dumps(data)
+
+    def _format_time(self, record: logging.LogRecord) -> str:
+        """ISO 8601 UTC time, second part is rendered once per second."""
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_time = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._cached_second = second
+        return f"{self._cached_time}.{int(record.msecs):03d}Z"
+
+    def _format_level(self, record: logging.LogRecord) -> str:
+        if (level_name := self._level_names.get(record.levelno)) is None:
+            level_name = self._level_names[record.levelno] = logging.getLevelName(record.levelno).lower()
+        return level_name
+
+
+class ContextFilter(logging.Filter):
+    """Add context values (e.g. request id from context var) to records, add it to logger to run in caller thread."""
+
+    def __init__(self, **getters: typing.Callable[[], typing.Any]):
+        super().__init__()
+        self.getters = getters
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, getter in self.getters.items():
+            record.__dict__[name] = getter()
+        return True
+
+
+class _BackgroundQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # wait for free slot, 'put_nowait' fails on full queue
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """Put records to bounded queue and write them with 'handlers' on background thread (full queue drops records)."""
+
+    def __init__(self, *handlers: logging.Handler, queue_size: int = 10000):
+        super().__init__(queue=queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        self.listener = _BackgroundQueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # 'handle' calls it under handler lock
+
+    def flush(self):
+        """Wait until queued records are written."""
+        if self.listener._thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """Write queued records and stop background thread ('logging.shutdown' calls it at exit)."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
 class PyCharmDebugLogger(logging.getLoggerClass()):
     def trace(self, msg, *args, **kwargs):
         if self.isEnabledFor(level=TRACE):
@@ -299,9 +414,13 @@ def setup_logging(
     date_format: str = "%Y-%m-%dT%H:%M:%S%z",
     accent_color: Union[tuple[int, int, int], str] = Palette.COLORS.CYAN,
     styler: typing.ClassVar[Styler] = Styler,
+    queue_size: int = None,  # write records on background thread through bounded queue (None -> write in place)
+    json_formatter: bool = False,  # structured JSON lines instead of 'raw_format' (ignores other format options)
 ):
     """Class for logging formatter."""
-    if file_link_formatter and color_formatter:
+    if json_formatter:
+        formatter = JSONFormatter()
+    elif file_link_formatter and color_formatter:
         # make PyCharm available link to file where's log occurs
         # example of link creation: "File {pathname}, line {lineno}"
         file_format = click.style(text='╰───📑File "', fg="bright_white", bold=True)
@@ -320,6 +439,9 @@ def setup_logging(
     handler = logging.StreamHandler()
     handler.setFormatter(fmt=formatter)
     handler.setLevel(level=TRACE)
+    if queue_size:
+        handler = BackgroundQueueHandler(handler, queue_size=queue_size)
+        handler.setLevel(level=TRACE)
 
     main_logger = PyCharmDebugLogger(name=name)
     main_logger.setLevel(level=TRACE)
@@ -1,85 +1,481 @@
 """Manager implementations for common tasks."""
+import base64
 import binascii
-import copy
+import calendar
+import collections
 import datetime
 import enum
+import functools
 import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import os
+import pathlib
 import secrets
+import threading
+import time
 import typing
 
 import jwt
+import jwt.algorithms
+import jwt.utils
 
 import fastapi_mongodb.exceptions
 import fastapi_mongodb.helpers
+import fastapi_mongodb.revocations
 import fastapi_mongodb.schemas
+from fastapi_mongodb.logging import simple_logger as logger
 
-__all__ = ["PASSWORD_ALGORITHMS", "TOKEN_ALGORITHMS", "PasswordsManager", "TokensManager"]
+__all__ = [
+    "PASSWORD_ALGORITHMS",
+    "TOKEN_ALGORITHMS",
+    "PasswordsManager",
+    "TokenCache",
+    "TokenKey",
+    "TokenKeySet",
+    "TokensManager",
+]
 
 
 class PASSWORD_ALGORITHMS(str, enum.Enum):
-    SHA256 = "sha256"
-    SHA384 = "sha384"
-    SHA512 = "sha512"
+    SHA256 = "sha256"  # PBKDF2-HMAC-SHA256
+    SHA384 = "sha384"  # PBKDF2-HMAC-SHA384
+    SHA512 = "sha512"  # PBKDF2-HMAC-SHA512
+    SCRYPT = "scrypt"  # memory-hard
 
 
+# hex salt and hash length of legacy format ('<salt><hash>' without algorithm and iterations)
 ALGORITHMS_LENGTH_MAP = {
     PASSWORD_ALGORITHMS.SHA256: 64,
     PASSWORD_ALGORITHMS.SHA384: 96,
     PASSWORD_ALGORITHMS.SHA512: 128,
 }
-ALGORITHMS_METHODS_MAP = {
-    PASSWORD_ALGORITHMS.SHA256: hashlib.sha256,
-    PASSWORD_ALGORITHMS.SHA384: hashlib.sha384,
-    PASSWORD_ALGORITHMS.SHA512: hashlib.sha512,
-}
 
 
 class TOKEN_ALGORITHMS(str, enum.Enum):
     HS256 = "HS256"
     HS384 = "HS384"
     HS512 = "HS512"
+    # asymmetric algorithms require 'cryptography' package
+    RS256 = "RS256"
+    RS384 = "RS384"
+    RS512 = "RS512"
+    PS256 = "PS256"
+    PS384 = "PS384"
+    PS512 = "PS512"
+    ES256 = "ES256"
+    ES384 = "ES384"
+    ES512 = "ES512"
+    EdDSA = "EdDSA"
+
+
+SYMMETRIC_TOKEN_ALGORITHMS = frozenset({TOKEN_ALGORITHMS.HS256, TOKEN_ALGORITHMS.HS384, TOKEN_ALGORITHMS.HS512})
+# algorithm of JWK without "alg" member (the same defaults as in 'jwt.PyJWK')
+JWK_DEFAULT_ALGORITHMS = {
+    ("oct", None): TOKEN_ALGORITHMS.HS256,
+    ("RSA", None): TOKEN_ALGORITHMS.RS256,
+    ("EC", "P-256"): TOKEN_ALGORITHMS.ES256,
+    ("EC", "P-384"): TOKEN_ALGORITHMS.ES384,
+    ("EC", "P-521"): TOKEN_ALGORITHMS.ES512,
+    ("OKP", "Ed25519"): TOKEN_ALGORITHMS.EdDSA,
+}
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.b64encode(value).decode().rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.b64decode(value + "=" * (-len(value) % 4), validate=True)
 
 
+def _scrypt_maxmem(*, n: int, r: int, p: int) -> int:
+    """Memory limit for 'hashlib.scrypt' (OpenSSL default 32 MiB is less than needed for n >= 2**15)."""
+    return 128 * r * (n + p + 2) + 1024 * 1024
+
+
+# hash format stores parameters, so they can change without breaking stored hashes (base64 without padding):
+# '$pbkdf2-<digest>$i=<iterations>$<salt>$<hash>' or '$scrypt$n=<n>,r=<r>,p=<p>$<salt>$<hash>'
 class PasswordsManager:
     """Manager for generating and checking passwords."""
 
-    def __init__(self, *, algorithm: PASSWORD_ALGORITHMS = PASSWORD_ALGORITHMS.SHA512, iterations: int = 524288):
-        self._algorithm = algorithm
-        self._algorithm_length = ALGORITHMS_LENGTH_MAP[self._algorithm]
+    def __init__(
+        self,
+        *,
+        algorithm: PASSWORD_ALGORITHMS = PASSWORD_ALGORITHMS.SHA512,
+        iterations: int = 524288,  # PBKDF2 iterations (also used to check legacy hashes)
+        scrypt_n: int = 2**15,  # scrypt CPU/memory cost (power of 2), memory is 128 * n * r bytes
+        scrypt_r: int = 8,  # scrypt block size
+        scrypt_p: int = 1,  # scrypt parallelization
+        salt_size: int = 16,  # bytes
+    ):
+        self._algorithm = PASSWORD_ALGORITHMS(algorithm)
         self.iterations = iterations
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.salt_size = salt_size
 
     def __repr__(self):
         """Representation for PasswordsManager."""
-        return f"{self.__class__.__name__}(algorithm={self._algorithm}, iterations={self.iterations})"
-
-    def __hash(self, *, salt: str, password: str, encoding: str = "UTF-8") -> str:
-        """Make hash for password N length string (default length from algorithm)."""
-        password_hash = hashlib.pbkdf2_hmac(
-            hash_name=self._algorithm,
-            password=password.encode(encoding=encoding),
-            salt=salt.encode(encoding=encoding),
-            iterations=self.iterations,
+        return f"{self.__class__.__name__}(algorithm={self._algorithm}, parameters={self._parameters})"
+
+    @property
+    def _parameters(self) -> dict[str, int]:
+        if self._algorithm == PASSWORD_ALGORITHMS.SCRYPT:
+            return {"n": self.scrypt_n, "r": self.scrypt_r, "p": self.scrypt_p}
+        return {"i": self.iterations}
+
+    @staticmethod
+    def _derive(*, algorithm: PASSWORD_ALGORITHMS, parameters: dict[str, int], password: str, salt: bytes, length: int):
+        if algorithm == PASSWORD_ALGORITHMS.SCRYPT:
+            n, r, p = parameters["n"], parameters["r"], parameters["p"]
+            return hashlib.scrypt(
+                password.encode(), salt=salt, n=n, r=r, p=p, maxmem=_scrypt_maxmem(n=n, r=r, p=p), dklen=length
+            )
+        return hashlib.pbkdf2_hmac(
+            hash_name=algorithm.value,
+            password=password.encode(),
+            salt=salt,
+            iterations=parameters["i"],
+            dklen=length,
         )
-        password_hash = binascii.hexlify(password_hash).decode(encoding)
-        return password_hash
 
-    def __generate_salt(self) -> str:
-        """Return N length string (default length from algorithm)."""
-        method = ALGORITHMS_METHODS_MAP[self._algorithm]
-        return method(string=secrets.token_bytes(nbytes=64)).hexdigest()  # noqa
+    @staticmethod
+    def _parse(*, password_hash: str) -> tuple[PASSWORD_ALGORITHMS, dict[str, int], bytes, bytes]:
+        try:
+            _, scheme, parameters, salt, digest = password_hash.split("$")
+            if scheme == PASSWORD_ALGORITHMS.SCRYPT.value:
+                algorithm = PASSWORD_ALGORITHMS.SCRYPT
+            elif scheme.startswith("pbkdf2-") and scheme != "pbkdf2-scrypt":
+                algorithm = PASSWORD_ALGORITHMS(scheme.removeprefix("pbkdf2-"))
+            else:
+                raise ValueError(f"Unknown scheme '{scheme}'.")
+            parameters = {name: int(value) for name, value in (item.split("=") for item in parameters.split(","))}
+            expected = {"n", "r", "p"} if algorithm == PASSWORD_ALGORITHMS.SCRYPT else {"i"}
+            if parameters.keys() != expected:
+                raise ValueError(f"Parameters of '{scheme}' must be {sorted(expected)}.")
+            return algorithm, parameters, _b64decode(salt), _b64decode(digest)
+        except (ValueError, binascii.Error) as error:
+            raise fastapi_mongodb.exceptions.ManagerException("Unknown password hash format.") from error
+
+    def _check_legacy_password(self, *, password: str, password_hash: str) -> bool:
+        """Check '<hex salt><hex hash>' made before versioned format (iterations weren't stored)."""
+        algorithm = next(
+            (algorithm for algorithm, length in ALGORITHMS_LENGTH_MAP.items() if length * 2 == len(password_hash)), None
+        )
+        if algorithm is None:
+            raise fastapi_mongodb.exceptions.ManagerException("Unknown password hash format.")
+        length = ALGORITHMS_LENGTH_MAP[algorithm]
+        salt, stored_password_hash = password_hash[:length], password_hash[length:]
+        check_password_hash = hashlib.pbkdf2_hmac(
+            hash_name=algorithm.value, password=password.encode(), salt=salt.encode(), iterations=self.iterations
+        )
+        return hmac.compare_digest(binascii.hexlify(check_password_hash).decode(), stored_password_hash)
 
     def check_password(self, *, password: str, password_hash: str) -> bool:
         """Check password and hash."""
-        salt = password_hash[: self._algorithm_length]
-        stored_password_hash = password_hash[self._algorithm_length :]
-        check_password_hash = self.__hash(salt=salt, password=password)
-        return check_password_hash == stored_password_hash
+        if not password_hash.startswith("$"):
+            return self._check_legacy_password(password=password, password_hash=password_hash)
+        algorithm, parameters, salt, digest = self._parse(password_hash=password_hash)
+        check_digest = self._derive(
+            algorithm=algorithm, parameters=parameters, password=password, salt=salt, length=len(digest)
+        )
+        return hmac.compare_digest(check_digest, digest)
+
+    def needs_rehash(self, *, password_hash: str) -> bool:
+        """Check if hash was made with other algorithm or cost (make new hash after successful login)."""
+        if not password_hash.startswith("$"):
+            return True
+        algorithm, parameters, salt, _ = self._parse(password_hash=password_hash)
+        return algorithm != self._algorithm or parameters != self._parameters or len(salt) < self.salt_size
 
     def make_password(self, *, password: str) -> str:
         """Make hash from password."""
-        salt: str = self.__generate_salt()
-        new_password_hash: str = self.__hash(salt=salt, password=password)
-        return salt + new_password_hash
+        salt = secrets.token_bytes(nbytes=self.salt_size)
+        if self._algorithm == PASSWORD_ALGORITHMS.SCRYPT:
+            scheme, length = self._algorithm.value, 64
+        else:
+            scheme, length = f"pbkdf2-{self._algorithm.value}", hashlib.new(self._algorithm.value).digest_size
+        digest = self._derive(
+            algorithm=self._algorithm, parameters=self._parameters, password=password, salt=salt, length=length
+        )
+        parameters = ",".join(f"{name}={value}" for name, value in self._parameters.items())
+        return f"${scheme}${parameters}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @classmethod
+    def calibrate(
+        cls,
+        *,
+        algorithm: PASSWORD_ALGORITHMS = PASSWORD_ALGORITHMS.SHA512,
+        target_time: float = 0.25,  # seconds to hash one password on current hardware
+        max_memory: int = 256 * 1024 * 1024,  # bytes, scrypt memory limit
+        **kwargs,  # other PasswordsManager options
+    ) -> "PasswordsManager":
+        """Create manager with the highest cost, that hashes password in 'target_time'."""
+        algorithm = PASSWORD_ALGORITHMS(algorithm)
+        if algorithm == PASSWORD_ALGORITHMS.SCRYPT:
+            scrypt_n, scrypt_r = 2**10, kwargs.get("scrypt_r", 8)
+            # time grows linearly with n, so the next power of 2 takes about twice as long
+            while 128 * scrypt_r * scrypt_n * 2 <= max_memory:
+                elapsed = cls._measure(manager=cls(algorithm=algorithm, **kwargs | {"scrypt_n": scrypt_n}))
+                if elapsed * 2 > target_time:
+                    break
+                scrypt_n *= 2
+            return cls(algorithm=algorithm, **kwargs | {"scrypt_n": scrypt_n})
+
+        sample_iterations = 10000
+        elapsed = min(
+            cls._measure(manager=cls(algorithm=algorithm, **kwargs | {"iterations": sample_iterations}))
+            for _ in range(3)
+        )
+        iterations = max(1000, int(sample_iterations * target_time / elapsed) // 1000 * 1000)
+        return cls(algorithm=algorithm, **kwargs | {"iterations": iterations})
+
+    @staticmethod
+    def _measure(*, manager: "PasswordsManager") -> float:
+        start = time.perf_counter()
+        manager.make_password(password="calibration")
+        return time.perf_counter() - start
+
+
+class TokenCache:
+    """Bounded cache of verified JWT payloads, entries are evicted at token expiration."""
+
+    def __init__(self, *, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (payload, exp, nbf)
+        self._entries: collections.OrderedDict[tuple, tuple[typing.Any, float, float]] = collections.OrderedDict()
+        self._expirations: list[tuple[float, int, tuple]] = []  # heap of (exp, insertion number, key)
+        self._insertions = itertools.count()  # keys aren't comparable, equal 'exp' are ordered by insertion
+        self._lock = threading.Lock()  # sync dependencies are called from thread pool
+
+    def __repr__(self):
+        """Representation of TokenCache."""
+        return f"{self.__class__.__name__}(size={len(self._entries)}, hits={self.hits}, misses={self.misses})"
+
+    def __len__(self):
+        """Count of cached tokens."""
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def stats(self) -> dict[str, typing.Union[int, float]]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    @staticmethod
+    def make_key(*, code: str, aud: str, iss: str, convert_to: typing.Optional[type]) -> tuple:
+        """Token digest with validation options (the same token can be read for different audiences)."""
+        return hashlib.sha256(code.encode()).digest(), aud, iss, convert_to
+
+    def get(self, *, key: tuple, leeway: int = 0) -> typing.Any:
+        """Return copy of cached payload (None on miss), 'exp' and 'nbf' are checked on every hit."""
+        now = time.time()
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return None
+            payload, exp, nbf = entry
+            if exp <= now:
+                self._delete(key=key)
+            else:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        if exp <= now - leeway:
+            raise fastapi_mongodb.exceptions.ManagerException("Expired JWT token.")
+        if nbf > now + leeway:
+            raise fastapi_mongodb.exceptions.ManagerException("The token is not valid yet.")
+        return payload.copy()  # shallow copy of dict or pydantic model
+
+    def set(self, *, key: tuple, payload: typing.Any, exp: float = None, nbf: float = None):
+        """Cache verified payload until token expiration (tokens without 'exp' stay until LRU eviction)."""
+        exp = float("inf") if exp is None else float(exp)
+        nbf = float("-inf") if nbf is None else float(nbf)
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now=now)
+            if exp <= now:
+                return  # verified with leeway, following reads will verify it again
+            self._entries[key] = (payload.copy(), exp, nbf)
+            self._entries.move_to_end(key)
+            if exp != float("inf"):
+                heapq.heappush(self._expirations, (exp, next(self._insertions), key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expirations.clear()
+
+    def _evict_expired(self, *, now: float):
+        while self._expirations and self._expirations[0][0] <= now:
+            exp, _, key = heapq.heappop(self._expirations)
+            if (entry := self._entries.get(key)) is not None and entry[1] == exp:
+                self._delete(key=key)
+        if len(self._expirations) > 2 * self.max_size:  # drop heap items of entries evicted by LRU
+            self._expirations = [item for item in self._expirations if item[2] in self._entries]
+            heapq.heapify(self._expirations)
+
+    def _delete(self, *, key: tuple):
+        del self._entries[key]
+        self.evictions += 1
+
+
+class TokenKey:
+    """Parsed signing/verification key (PEM and JWK are parsed once, not on every token)."""
+
+    def __init__(
+        self, *, algorithm: TOKEN_ALGORITHMS, key: typing.Union[str, bytes, dict, typing.Any], kid: str = None
+    ):
+        self.algorithm = TOKEN_ALGORITHMS(algorithm)
+        self.kid = kid
+        try:
+            self.signer = jwt.algorithms.get_default_algorithms()[self.algorithm.value]
+        except KeyError:
+            raise NotImplementedError(
+                f"Algorithm '{self.algorithm.value}' requires 'cryptography' package, install it to use it."
+            ) from None
+        if isinstance(key, dict):
+            key = self.signer.from_jwk(key)
+        self.signing_key = self.signer.prepare_key(key)
+        # private keys of asymmetric algorithms have 'public_key()', their public keys and HMAC secrets don't
+        public_key = getattr(self.signing_key, "public_key", None)
+        self.can_sign = self.algorithm in SYMMETRIC_TOKEN_ALGORITHMS or public_key is not None
+        self.verifying_key = public_key() if public_key is not None else self.signing_key
+        self.header_segment = _header_segment(algorithm=self.algorithm.value, kid=kid)
+
+    def __repr__(self):
+        """Representation of TokenKey (never shows key material)."""
+        return f"{self.__class__.__name__}(algorithm={self.algorithm.value}, kid={self.kid}, can_sign={self.can_sign})"
+
+    @classmethod
+    def from_jwk(cls, jwk: dict) -> "TokenKey":
+        """Parse JWK, algorithm is taken from "alg" member or from key type and curve."""
+        algorithm = jwk.get("alg") or JWK_DEFAULT_ALGORITHMS.get((jwk.get("kty"), jwk.get("crv")))
+        if algorithm is None:
+            raise ValueError(f"Can't detect algorithm of JWK with kid '{jwk.get('kid')}', set its 'alg' member.")
+        return cls(algorithm=algorithm, key=jwk, kid=jwk.get("kid"))
+
+    def sign(self, *, signing_input: bytes) -> bytes:
+        return self.signer.sign(signing_input, self.signing_key)
+
+
+class TokenKeySet:
+    """Keys from local JWKS files indexed by 'kid', reload swaps all keys at once (rotation without restart)."""
+
+    def __init__(
+        self,
+        *,
+        paths: typing.Sequence[typing.Union[str, os.PathLike]] = (),  # JWKS files ({"keys": [<JWK>, ...]})
+        keys: typing.Sequence[dict] = (),  # JWKs that aren't stored in files
+        signing_kid: str = None,  # key to sign new tokens (None -> first key with private part)
+        reload_interval: float = None,  # seconds between checks of files modification (None -> call 'reload')
+    ):
+        self.paths = [pathlib.Path(path) for path in paths]
+        self.signing_kid = signing_kid
+        self.reload_interval = reload_interval
+        self.version = 0  # increments on every reload
+        self._static_keys = list(keys)
+        self._keys: dict[str, TokenKey] = {}
+        self._signing_key: typing.Optional[TokenKey] = None
+        self._modified: dict[pathlib.Path, int] = {}
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.reload()
+
+    def __repr__(self):
+        """Representation of TokenKeySet."""
+        return f"{self.__class__.__name__}(kids={self.kids}, signing_kid={self.signing_kid}, version={self.version})"
+
+    def __len__(self):
+        """Count of keys."""
+        return len(self._keys)
+
+    def __contains__(self, kid: str):
+        """Check key id in key set."""
+        return kid in self._keys
+
+    @property
+    def kids(self) -> list[str]:
+        return list(self._keys)
+
+    @property
+    def signing_key(self) -> TokenKey:
+        self._reload_if_due()
+        if self._signing_key is None:
+            raise fastapi_mongodb.exceptions.ManagerException("Key set has no key to sign tokens.")
+        return self._signing_key
+
+    def get(self, *, kid: typing.Optional[str]) -> TokenKey:
+        """Retrieve key to verify token signed with 'kid'."""
+        self._reload_if_due()
+        try:
+            return self._keys[kid]
+        except KeyError:
+            raise fastapi_mongodb.exceptions.ManagerException("Unknown JWT key id.") from None
+
+    def reload(self, *, force: bool = True) -> bool:
+        """Parse keys from files and swap them with current ones (invalid files keep current keys)."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            modified = {path: path.stat().st_mtime_ns for path in self.paths}
+            if not force and modified == self._modified:
+                return False
+            jwks = list(self._static_keys)
+            for path in self.paths:
+                jwks.extend(json.loads(path.read_text())["keys"])
+            keys = {}
+            for jwk in jwks:
+                if not jwk.get("kid"):
+                    raise ValueError("Every JWK of key set must have 'kid' member.")
+                keys[jwk["kid"]] = TokenKey.from_jwk(jwk)
+            if self.signing_kid is not None:
+                signing_key = keys.get(self.signing_kid)
+                if signing_key is None or not signing_key.can_sign:
+                    raise ValueError(f"Key '{self.signing_kid}' doesn't exist or has no private part.")
+            else:
+                signing_key = next((key for key in keys.values() if key.can_sign), None)
+            self._keys, self._signing_key, self._modified = keys, signing_key, modified
+            self.version += 1
+            return True
+
+    def _reload_if_due(self):
+        if self.reload_interval is None or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        try:
+            self.reload(force=False)
+        except (OSError, ValueError, KeyError, jwt.exceptions.PyJWTError) as error:
+            logger.error(msg=f"Key set reload failed, current keys are kept: {error!r}")
+
+
+@functools.lru_cache()
+def _header_segment(*, algorithm: str, kid: str = None) -> bytes:
+    """Encoded JWT header (the same for all tokens of algorithm and key)."""
+    header = {"typ": "JWT", "alg": algorithm} if kid is None else {"typ": "JWT", "alg": algorithm, "kid": kid}
+    # header keys are sorted as in 'jwt.encode' (PyJWT 2.4+), so tokens are byte-identical
+    return jwt.utils.base64url_encode(json.dumps(header, separators=(",", ":"), sort_keys=True).encode())
+
+
+def _timestamp(value: datetime.datetime) -> int:
+    """NumericDate of JWT claim (as in 'jwt.encode')."""
+    return calendar.timegm(value.utctimetuple())
 
 
 class TokensManager:
@@ -88,13 +484,23 @@ class TokensManager:
     def __init__(
         self,
         *,
-        secret_key: str,
+        secret_key: str = None,  # HMAC secret or PEM private key of asymmetric algorithm
         algorithm: TOKEN_ALGORITHMS = TOKEN_ALGORITHMS.HS256,
         default_token_lifetime: datetime.timedelta = datetime.timedelta(minutes=30),
+        token_cache: TokenCache = None,  # skip signature verification and conversion for already verified tokens
+        key_set: TokenKeySet = None,  # keys chosen by 'kid' header (instead of 'secret_key' and 'algorithm')
+        # denylist checked by 'read_code_async' ('read_code' refuses to skip it), tokens get random 'jti' claim
+        revocation_store: fastapi_mongodb.revocations.TokenRevocationStore = None,
     ):
-        self._secret_key = secret_key
-        self._algorithm = algorithm
+        if (secret_key is None) == (key_set is None):
+            raise ValueError("Provide one of 'secret_key' or 'key_set'.")
+        self._algorithm = TOKEN_ALGORITHMS(algorithm)
+        self._key = TokenKey(algorithm=self._algorithm, key=secret_key) if secret_key is not None else None
+        self.key_set = key_set
         self.default_token_lifetime = default_token_lifetime
+        self.token_cache = token_cache
+        self.revocation_store = revocation_store
+        self._key_set_version = key_set.version if key_set is not None else None
 
     def create_code(
         self,
@@ -105,10 +511,40 @@ class TokensManager:
         exp: datetime.datetime = None,  # Expired at datetime
         nbf: datetime.datetime = None,  # Not before datetime
         iss: str = "",  # Issuer
+        jti: str = None,  # JWT ID to revoke token (generated, if manager has revocation store)
     ) -> str:
         """Method for generation of JWT token."""
-        if data is None:
-            data = {}
+        claims = self._make_claims(aud=aud, iat=iat, exp=exp, nbf=nbf, iss=iss)
+        if jti is not None or self.revocation_store is not None:
+            claims["jti"] = jti if jti is not None else secrets.token_urlsafe(16)
+        # payload is serialized at once, so shallow merge never changes caller's data (no need in deep copy)
+        return self._encode(payload={**data, **claims} if data else claims)
+
+    def create_codes(
+        self,
+        *,
+        data: typing.Iterable[dict[str, typing.Union[str, int, float, dict, list, bool]]],
+        aud: str = "access",  # Audience
+        iat: datetime.datetime = None,  # Issued at datetime
+        exp: datetime.datetime = None,  # Expired at datetime
+        nbf: datetime.datetime = None,  # Not before datetime
+        iss: str = "",  # Issuer
+    ) -> list[str]:
+        """Generate JWT token for every item of 'data' with the same registered claims (but unique 'jti')."""
+        claims = self._make_claims(aud=aud, iat=iat, exp=exp, nbf=nbf, iss=iss)
+        if self.revocation_store is not None:
+            return [self._encode(payload={**(item or {}), **claims, "jti": secrets.token_urlsafe(16)}) for item in data]
+        return [self._encode(payload={**item, **claims} if item else claims) for item in data]
+
+    def _make_claims(
+        self,
+        *,
+        aud: str,
+        iat: typing.Optional[datetime.datetime],
+        exp: typing.Optional[datetime.datetime],
+        nbf: typing.Optional[datetime.datetime],
+        iss: str,
+    ) -> dict[str, typing.Union[str, int]]:
         now = fastapi_mongodb.helpers.utc_now()
         if iat is None:
             iat = now
@@ -116,9 +552,15 @@ class TokensManager:
             exp = now + self.default_token_lifetime
         if nbf is None:
             nbf = now
-        payload = copy.deepcopy(data)
-        payload |= {"iat": iat, "aud": aud, "exp": exp, "nbf": nbf, "iss": iss}
-        return jwt.encode(payload=payload, key=self._secret_key, algorithm=self._algorithm)
+        return {"iat": _timestamp(iat), "aud": aud, "exp": _timestamp(exp), "nbf": _timestamp(nbf), "iss": iss}
+
+    def _encode(self, *, payload: dict) -> str:
+        """The same output as 'jwt.encode', but header and signing key are prepared once."""
+        key = self._key or self.key_set.signing_key
+        signing_input = b".".join(
+            (key.header_segment, jwt.utils.base64url_encode(json.dumps(payload, separators=(",", ":")).encode()))
+        )
+        return b".".join((signing_input, jwt.utils.base64url_encode(key.sign(signing_input=signing_input)))).decode()
 
     def read_code(
         self,
@@ -129,12 +571,38 @@ class TokensManager:
         leeway: int = 0,  # provide extra time in seconds to validate (iat, exp, nbf)
         convert_to: typing.Type[fastapi_mongodb.schemas.BaseSchema] = None,
     ):
-        """Method for parse and validate JWT token."""
+        """Method for parse and validate JWT token (use 'read_code_async', if manager has revocation store)."""
+        if self.revocation_store is not None:
+            raise fastapi_mongodb.exceptions.ManagerException(
+                "Revoked JWT tokens are rejected by 'read_code_async' only, use it with revocation store."
+            )
+        return self._read_code(code=code, aud=aud, iss=iss, leeway=leeway, convert_to=convert_to)
+
+    def _read_code(
+        self,
+        *,
+        code: str,
+        aud: str,
+        iss: str,
+        leeway: int,
+        convert_to: typing.Optional[typing.Type[fastapi_mongodb.schemas.BaseSchema]],
+    ):
+        cache_key = None
+        if self.key_set is not None and self.token_cache is not None:
+            self.key_set._reload_if_due()
+            if self.key_set.version != self._key_set_version:
+                self.token_cache.clear()  # tokens of removed keys must not be accepted from cache
+                self._key_set_version = self.key_set.version
+        if self.token_cache is not None:
+            cache_key = self.token_cache.make_key(code=code, aud=aud, iss=iss, convert_to=convert_to)
+            if (cached_payload := self.token_cache.get(key=cache_key, leeway=leeway)) is not None:
+                return cached_payload
         try:
-            payload = jwt.decode(
+            key = self._key or self.key_set.get(kid=jwt.get_unverified_header(code).get("kid"))
+            claims = payload = jwt.decode(
                 jwt=code,
-                key=self._secret_key,
-                algorithms=[self._algorithm],
+                key=key.verifying_key,
+                algorithms=[key.algorithm.value],
                 leeway=leeway,
                 audience=aud,
                 issuer=iss,
@@ -153,4 +621,44 @@ class TokensManager:
         except jwt.exceptions.PyJWTError as error:
             raise fastapi_mongodb.exceptions.ManagerException("Invalid JWT.") from error
         else:
+            if cache_key is not None:
+                self.token_cache.set(key=cache_key, payload=payload, exp=claims.get("exp"), nbf=claims.get("nbf"))
             return payload
+
+    async def read_code_async(
+        self,
+        *,
+        code: str,
+        aud: str = "access",  # Audience
+        iss: str = "",  # Issuer
+        leeway: int = 0,  # provide extra time in seconds to validate (iat, exp, nbf)
+        convert_to: typing.Type[fastapi_mongodb.schemas.BaseSchema] = None,
+    ):
+        """Parse and validate JWT token, reject revoked one (cached tokens are checked too)."""
+        payload = self._read_code(code=code, aud=aud, iss=iss, leeway=leeway, convert_to=convert_to)
+        if self.revocation_store is not None and (jti := self._get_claims(code=code).get("jti")) is not None:
+            if await self.revocation_store.is_revoked(jti=jti):
+                raise fastapi_mongodb.exceptions.ManagerException("Revoked JWT token.")
+        return payload
+
+    async def revoke_code(
+        self,
+        *,
+        code: str,
+        aud: str = "access",  # Audience
+        iss: str = "",  # Issuer
+        leeway: int = 0,  # provide extra time in seconds to validate (iat, exp, nbf)
+    ):
+        """Add valid JWT token to revocation store until its expiration."""
+        if self.revocation_store is None:
+            raise fastapi_mongodb.exceptions.ManagerException("Provide 'revocation_store' to revoke tokens.")
+        self._read_code(code=code, aud=aud, iss=iss, leeway=leeway, convert_to=None)
+        claims = self._get_claims(code=code)
+        if "jti" not in claims or "exp" not in claims:
+            raise fastapi_mongodb.exceptions.ManagerException("JWT token without 'jti' and 'exp' can't be revoked.")
+        await self.revocation_store.revoke(jti=claims["jti"], exp=claims["exp"])
+
+    @staticmethod
+    def _get_claims(*, code: str) -> dict:
+        """Claims of already verified token (payload may be converted to schema, that drops registered claims)."""
+        return json.loads(jwt.utils.base64url_decode(code.split(".")[1]))
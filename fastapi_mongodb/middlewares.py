@@ -1,24 +1,300 @@
 """Application middleware classes."""
+import contextlib
+import random
+import typing
+import warnings
 
-import fastapi
-from starlette.middleware.base import BaseHTTPMiddleware, DispatchFunction, RequestResponseEndpoint
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from fastapi_mongodb.db import BaseDBManager
+from fastapi_mongodb.db import (
+    BaseDBManager,
+    LazyDBSession,
+    ReadRouter,
+    RequestDBStats,
+    get_request_db_stats,
+    track_request_db_stats,
+)
+from fastapi_mongodb.exceptions import ManagerException
+from fastapi_mongodb.helpers import BaseProfiler, utc_now
+from fastapi_mongodb.logging import simple_logger as logger
+from fastapi_mongodb.managers import TokensManager
+from fastapi_mongodb.profiling import BaseProfileStore
+from fastapi_mongodb.tracing import SPAN_KINDS, SPAN_STATUSES, Tracer
 
-__all__ = ["DBSessionMiddleware"]
+__all__ = ["DBSessionMiddleware", "DBStatsMiddleware", "ProfilerMiddleware", "TracingMiddleware"]
 
 
-class DBSessionMiddleware(BaseHTTPMiddleware):
-    """Append 'db_session' for every request.state."""
+class _RoutePaths:
+    """Path templates of matched routes (few names for aggregates instead of every requested path)."""
 
-    def __init__(self, app: ASGIApp, db_manager: BaseDBManager, dispatch: DispatchFunction = None) -> None:
+    def __init__(self):
+        self._paths: dict[typing.Callable, str] = {}
+
+    def get(self, *, scope: Scope) -> str:
+        """Path template of route, that handled request (available after the request is handled)."""
+        if (endpoint := scope.get("endpoint")) is None:
+            return "<unmatched>"
+        if (path := self._paths.get(endpoint)) is None:
+            routes = getattr(scope.get("app"), "routes", [])
+            self._paths.update((route.endpoint, route.path) for route in routes if hasattr(route, "endpoint"))
+            # endpoint of mounted application isn't in routes of the main one
+            path = self._paths.setdefault(endpoint, getattr(endpoint, "__qualname__", repr(endpoint)))
+        return path
+
+
+class DBSessionMiddleware:
+    """Append 'db_session' for every request.state (lazy one starts on first use), session ends after response."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        db_manager: BaseDBManager,
+        dispatch: typing.Callable = None,  # deprecated, ignored (middleware isn't BaseHTTPMiddleware anymore)
+        *,
+        lazy: bool = True,  # LazyDBSession, that starts on first use (False -> started ClientSession, as before)
+        read_router: ReadRouter = None,  # route reads of request by its method and client writes
+        client_key_header: str = None,  # header that identifies client for read-your-writes across requests
+        **session_options,
+    ) -> None:
+        if dispatch is not None:
+            warnings.warn(
+                "'dispatch' of DBSessionMiddleware is ignored, wrap the application with own middleware instead.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
         self.app = app
         self.db_manager = db_manager
-        self.dispatch_func = self.dispatch if dispatch is None else dispatch
+        self.lazy = lazy
+        self.read_router = read_router
+        self.client_key_header = client_key_header.lower().encode() if client_key_header else None
+        self.session_options = session_options
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Pure ASGI middleware (no extra task and response streaming like in BaseHTTPMiddleware)."""
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        db_session = LazyDBSession(db_manager=self.db_manager, **self.session_options)
+        # 'request.state' is a view of 'scope["state"]'
+        scope.setdefault("state", {})["db_session"] = db_session if self.lazy else await db_session
+        routing_token = None
+        if self.read_router is not None:
+            routing_token = self.read_router.begin_request(
+                method=scope.get("method", "GET"), client_key=self._get_client_key(scope=scope)
+            )
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if routing_token is not None:
+                self.read_router.end_request(routing_token)
+            await db_session.end()
+
+    def _get_client_key(self, *, scope: Scope) -> typing.Optional[str]:
+        if self.client_key_header is None:
+            return None
+        for name, value in scope["headers"]:
+            if name == self.client_key_header:
+                return value.decode("latin-1")
+        return None
+
+
+class DBStatsMiddleware:
+    """Track database usage of requests, warn about exceeded budgets and N+1 queries (needs RequestStatsListener)."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        max_commands: int = None,  # warn when request executes more commands
+        max_db_time: float = None,  # seconds, warn when request spends more time in database
+        n_plus_one_threshold: int = 5,  # warn when query of the same shape repeats so many times (0 -> disabled)
+        server_timing: bool = False,  # add 'Server-Timing' header with totals (known at response start)
+        track_call_sites: bool = True,  # report code lines, that executed repeated queries
+    ) -> None:
+        self.app = app
+        self.max_commands = max_commands
+        self.max_db_time = max_db_time
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+        self.track_call_sites = track_call_sites
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_request_db_stats(track_call_sites=self.track_call_sites) as stats:
+            scope.setdefault("state", {})["db_stats"] = stats
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start" and self.server_timing:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", stats.server_timing().encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._report(scope=scope, stats=stats)
+
+    def _report(self, *, scope: Scope, stats: RequestDBStats):
+        request = f"{scope['method']} {scope['path']}"
+        if (self.max_commands is not None and stats.commands > self.max_commands) or (
+            self.max_db_time is not None and stats.db_time > self.max_db_time
+        ):
+            logger.warning(
+                msg=f"Request '{request}' exceeded database budget: {stats.commands} commands, "
+                f"{stats.db_time * 1000:.1f} ms, {stats.request_bytes + stats.reply_bytes} bytes"
+            )
+        if not self.n_plus_one_threshold:
+            return
+        for query in stats.repeated_queries(threshold=self.n_plus_one_threshold):
+            call_sites = ", ".join(query["call_sites"]) or "unknown"
+            logger.warning(
+                msg=f"Request '{request}' repeated '{query['command']}' on '{query['namespace']}' "
+                f"{query['count']} times (possible N+1 queries), shape: {query['shape']}, called from: {call_sites}"
+            )
+
+
+class ProfilerMiddleware:
+    """Profile share of requests (and requests with signed debug header), measurements are named by route template."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        profiler: BaseProfiler,
+        sample_rate: float = 1.0,  # share of profiled requests
+        store: BaseProfileStore = None,  # keep profiled requests (timing, memory, database commands)
+        tokens_manager: TokensManager = None,  # verify debug header, that forces profiling
+        debug_header: str = "x-profile",  # header with token of 'debug_audience' created by 'tokens_manager'
+        debug_audience: str = "profiler",
+    ) -> None:
+        self.app = app
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.store = store
+        self.tokens_manager = tokens_manager
+        self.debug_header = debug_header.lower().encode()
+        self.debug_audience = debug_audience
+        self._route_paths = _RoutePaths()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        forced = await self._is_forced(scope=scope)
+        if not forced and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # commands are counted in stats of outer DBStatsMiddleware, if it's used
+        db_stats = get_request_db_stats()
+        db_tracking = contextlib.nullcontext(db_stats) if db_stats else track_request_db_stats(track_call_sites=False)
+        with db_tracking as db_stats:
+            commands, db_time = db_stats.commands, db_stats.db_time
+            with self.profiler.block(name=f"{scope['method']} {scope['path']}") as block:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    block.name = f"{scope['method']} {self._route_paths.get(scope=scope)}"
+            commands, db_time = db_stats.commands - commands, db_stats.db_time - db_time
+
+        if self.store is not None:
+            record = {
+                "route": block.name,
+                "path": scope["path"],
+                "status": status,
+                "duration": block.duration,
+                "memory": block.memory,
+                "db_commands": commands,
+                "db_time": db_time,
+                "time": utc_now(),
+                "forced": forced,
+            }
+            try:
+                await self.store.add(record=record)
+            except Exception as error:
+                logger.warning(msg=f"Profiled request '{block.name}' wasn't saved: {error!r}")
+
+    async def _is_forced(self, *, scope: Scope) -> bool:
+        if self.tokens_manager is None:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.debug_header:
+                try:
+                    await self.tokens_manager.read_code_async(code=value.decode("latin-1"), aud=self.debug_audience)
+                except ManagerException as error:
+                    logger.warning(msg=f"Invalid profiling header of '{scope['path']}' request: {error}")
+                    return False
+                return True
+        return False
+
+
+class TracingMiddleware:
+    """Root span per request (MongoDB commands become its children with TracingListener)."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        tracer: Tracer,
+        continue_traces: bool = True,  # use trace id of incoming W3C 'traceparent' header
+    ) -> None:
+        self.app = app
+        self.tracer = tracer
+        self.continue_traces = continue_traces
+        self._route_paths = _RoutePaths()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with self.tracer.span(
+            name=f"{scope['method']} {scope['path']}",
+            kind=SPAN_KINDS.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+            **self._get_remote_parent(scope=scope),
+        ) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = self._route_paths.get(scope=scope)
+                span.name = f"{scope['method']} {route}"
+                span.attributes["http.route"] = route
+                if status is not None:
+                    span.attributes["http.status_code"] = status
+                    if status >= 500:
+                        span.set_status(SPAN_STATUSES.ERROR)
 
-    async def dispatch(self, request: fastapi.Request, call_next: RequestResponseEndpoint) -> fastapi.Response:
-        db_client = self.db_manager.retrieve_client()
-        async with await db_client.start_session() as session:
-            request.state.db_session = session
-            return await call_next(request)
+    def _get_remote_parent(self, *, scope: Scope) -> dict[str, str]:
+        if not self.continue_traces:
+            return {}
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                # version-trace_id-parent_id-flags
+                parts = value.decode("latin-1").split("-")
+                if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[1] != "0" * 32:
+                    return {"trace_id": parts[1].lower(), "parent_span_id": parts[2].lower()}
+                return {}
+        return {}
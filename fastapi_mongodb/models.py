@@ -1,5 +1,6 @@
 """Pydantic based and custom classes to interact with MongoDB database."""
 import datetime
+import functools
 import typing
 
 import bson
@@ -12,9 +13,10 @@ import fastapi_mongodb.db
 import fastapi_mongodb.helpers
 from fastapi_mongodb.config import BaseConfiguration
 from fastapi_mongodb.repositories import BaseRepository
+from fastapi_mongodb.schemas import BaseSchema
 from fastapi_mongodb.types import OID
 
-__all__ = ["BaseDBModel", "BaseCreatedUpdatedModel", "BaseActiveRecord", "BaseDataMapper"]
+__all__ = ["BaseDBModel", "BaseCreatedUpdatedModel", "SchemaProjection", "BaseActiveRecord", "BaseDataMapper"]
 
 
 class BaseDBModel(pydantic.BaseModel):
@@ -27,6 +29,12 @@ class BaseDBModel(pydantic.BaseModel):
 
     id = property(fget=lambda self: str(self.oid))
 
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_schema_projection(cls, schema: typing.Type[BaseSchema]) -> "SchemaProjection":
+        """Retrieve compiled SchemaProjection (cached per model and schema)."""
+        return SchemaProjection(model=cls, schema=schema)
+
     @classmethod
     def from_db(cls, *, data: dict):
         """Convert result from MongoDB to BaseDBModel."""
@@ -116,6 +124,42 @@ class BaseCreatedUpdatedModel(BaseDBModel):
         return result
 
 
+class SchemaProjection:
+    """Convert MongoDB documents of BaseDBModel to response dicts of BaseSchema without building both models.
+
+    Values are taken from documents as is (without validation), so use it for documents written by the model.
+    """
+
+    def __init__(self, *, model: typing.Type[BaseDBModel], schema: typing.Type[BaseSchema]):
+        self.model = model
+        self.schema = schema
+        # (document key, response key, schema field) per schema field, e.g. ('_id', 'oid', ...)
+        self._fields: list[tuple[str, str, pydantic.fields.ModelField]] = []
+        for name, field in schema.__fields__.items():
+            if (model_field := model.__fields__.get(name)) is not None:
+                self._fields.append((model_field.alias, field.alias, field))
+            elif field.required:
+                raise ValueError(f"Required field '{name}' of {schema.__name__} is missing in {model.__name__}.")
+            else:
+                self._fields.append((name, field.alias, field))  # always default, there is no such key in documents
+        self.projection: dict[str, bool] = {key: True for key, _, _ in self._fields}  # 'projection' option of find
+        if "_id" not in self.projection:
+            self.projection["_id"] = False
+
+    def __repr__(self):
+        """Representation of SchemaProjection."""
+        return f"{self.__class__.__name__}(model={self.model.__name__}, schema={self.schema.__name__})"
+
+    def __call__(self, document: typing.Union[dict, fastapi_mongodb.db.BaseDocument]) -> dict[str, typing.Any]:
+        """Convert document to response dict (missing keys are replaced with schema defaults)."""
+        if isinstance(document, fastapi_mongodb.db.BaseDocument):
+            document = document.data
+        return {
+            response_key: document[key] if key in document else field.get_default()
+            for key, response_key, field in self._fields
+        }
+
+
 class BaseActiveRecord:
     def __init__(
         self,
@@ -270,6 +314,17 @@ class BaseDataMapper:
             async for result in await self._repository.find(query=query, session=session or self._db_session)
         )
 
+    async def list_projected(
+        self, query: dict, schema: typing.Type[BaseSchema], session: pymongo.client_session.ClientSession = None
+    ):
+        projection = self._model.get_schema_projection(schema)
+        return (
+            projection(document)
+            async for document in await self._repository.find(
+                query=query, projection=projection.projection, session=session or self._db_session
+            )
+        )
+
     async def retrieve(self, query: dict, session: pymongo.client_session.ClientSession = None):
         document = await self._repository.find_one(query=query, session=session or self._db_session)
         return self._model.from_db(data=document)
@@ -0,0 +1,139 @@
+"""Stores of profiled requests and admin router to view them."""
+import heapq
+import itertools
+import typing
+
+import fastapi
+
+from fastapi_mongodb.helpers import ProfileStats
+from fastapi_mongodb.repositories import BaseRepository
+
+__all__ = ["BaseProfileStore", "MemoryProfileStore", "RepositoryProfileStore", "create_profiling_router"]
+
+
+class BaseProfileStore:
+    """Interface to keep profiled requests."""
+
+    # record fields: route, path, status, duration (seconds), memory (bytes), db_commands, db_time (seconds), time,
+    # forced (profiled because of debug header)
+
+    async def add(self, *, record: dict):
+        """Save profiled request."""
+        raise NotImplementedError
+
+    async def worst(self, *, limit: int = 10, route: str = None) -> list[dict]:
+        """Retrieve the slowest requests."""
+        raise NotImplementedError
+
+    async def routes(self) -> dict[str, dict[str, typing.Union[int, float]]]:
+        """Retrieve aggregates by route."""
+        raise NotImplementedError
+
+
+class MemoryProfileStore(BaseProfileStore):
+    """Keep the slowest requests and rolling aggregates by route in process memory."""
+
+    def __init__(
+        self,
+        *,
+        worst_count: int = 20,  # the slowest requests to keep
+        max_samples: int = 1000,  # latest durations kept per route to calculate percentiles
+    ):
+        self.worst_count = worst_count
+        self.max_samples = max_samples
+        self._worst: list[tuple[float, int, dict]] = []  # heap of (duration, insertion number, record)
+        self._counter = itertools.count()
+        self._routes: dict[str, tuple[ProfileStats, dict[str, int]]] = {}
+
+    async def add(self, *, record: dict):
+        """Save profiled request."""
+        item = (record["duration"], next(self._counter), record)
+        if len(self._worst) < self.worst_count:
+            heapq.heappush(self._worst, item)
+        else:
+            heapq.heappushpop(self._worst, item)
+
+        if (route := self._routes.get(record["route"])) is None:
+            route = self._routes[record["route"]] = (
+                ProfileStats(max_samples=self.max_samples),
+                {"db_commands": 0, "max_db_commands": 0},
+            )
+        stats, db_stats = route
+        stats.add(duration_ns=int(record["duration"] * 1e9), memory=record["memory"])
+        db_stats["db_commands"] += record["db_commands"]
+        db_stats["max_db_commands"] = max(db_stats["max_db_commands"], record["db_commands"])
+
+    async def worst(self, *, limit: int = 10, route: str = None) -> list[dict]:
+        """Retrieve the slowest requests."""
+        records = [record for _, _, record in sorted(self._worst, reverse=True)]
+        return [record for record in records if route is None or record["route"] == route][:limit]
+
+    async def routes(self) -> dict[str, dict[str, typing.Union[int, float]]]:
+        """Retrieve aggregates by route."""
+        return {
+            name: stats.as_dict()
+            | {
+                "mean_db_commands": db_stats["db_commands"] / stats.count,
+                "max_db_commands": db_stats["max_db_commands"],
+            }
+            for name, (stats, db_stats) in self._routes.items()
+        }
+
+
+class RepositoryProfileStore(BaseProfileStore):
+    """Keep profiled requests in MongoDB collection shared by workers (use capped or TTL collection to limit it)."""
+
+    def __init__(self, repository: BaseRepository):
+        self._repository = repository
+
+    async def add(self, *, record: dict):
+        """Save profiled request."""
+        await self._repository.insert_one(document=dict(record))  # insert adds '_id' to document
+
+    async def worst(self, *, limit: int = 10, route: str = None) -> list[dict]:
+        """Retrieve the slowest requests."""
+        cursor = await self._repository.find(
+            query={} if route is None else {"route": route},
+            sort=[("duration", -1)],
+            limit=limit,
+            projection={"_id": False},
+        )
+        # documents are decoded as BaseDocument (CODEC_OPTIONS of manager), records are plain flat dicts
+        return [dict(document) async for document in cursor]
+
+    async def routes(self) -> dict[str, dict[str, typing.Union[int, float]]]:
+        """Retrieve aggregates by route."""
+        cursor = await self._repository.aggregate(
+            pipeline=[
+                {
+                    "$group": {
+                        "_id": "$route",
+                        "count": {"$sum": 1},
+                        "mean": {"$avg": "$duration"},
+                        "max": {"$max": "$duration"},
+                        "max_memory": {"$max": "$memory"},
+                        "mean_db_commands": {"$avg": "$db_commands"},
+                        "max_db_commands": {"$max": "$db_commands"},
+                    }
+                }
+            ]
+        )
+        return {
+            document["_id"]: {key: value for key, value in document.items() if key != "_id"}
+            async for document in cursor
+        }
+
+
+def create_profiling_router(*, store: BaseProfileStore, **kwargs) -> fastapi.APIRouter:
+    """Admin endpoints with profiled requests (protect them with 'dependencies' option)."""
+    router = fastapi.APIRouter(**kwargs)  # APIRouter options (prefix, tags, dependencies etc.)
+
+    @router.get("/worst")
+    async def worst(limit: int = fastapi.Query(10, ge=1, le=100), route: str = None) -> list[dict]:
+        return await store.worst(limit=limit, route=route)
+
+    @router.get("/routes")
+    async def routes() -> dict[str, dict[str, typing.Union[int, float]]]:
+        return await store.routes()
+
+    return router
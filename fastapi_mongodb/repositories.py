@@ -1,20 +1,205 @@
 """Repository pattern to work with MongoDB."""
+import asyncio
+import collections
+import functools
+import time
 import typing
 from functools import cached_property
 
+import bson
 import motor.motor_asyncio
 import pymongo.client_session
 import pymongo.results
 
-from fastapi_mongodb.db import BaseDBManager
+from fastapi_mongodb.db import BaseDBManager, LazyDBSession, ReadRouter, _mark_call_site, get_current_session
+from fastapi_mongodb.logging import simple_logger as logger
+
+
+class CountCache:
+    """In-process cache of `count_documents` results with TTL, refresh-ahead and invalidation."""
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 5.0,  # seconds while cached count is served
+        refresh_ahead: float = None,  # seconds before expiration when a hit schedules background re-count
+        max_size: int = 1024,  # least recently used filters are evicted first
+    ):
+        if refresh_ahead is not None and not 0 < refresh_ahead < ttl:
+            raise ValueError("'refresh_ahead' must be greater than 0 and less than 'ttl'.")
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._entries: collections.OrderedDict[bytes, tuple[int, float]] = collections.OrderedDict()
+        self._pending: dict[bytes, asyncio.Future] = {}
+        self._refreshing: set[bytes] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._generation = 0
+
+    def __len__(self):
+        """Count of cached filters."""
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(
+        *,
+        query: dict,
+        codec_options: bson.codec_options.CodecOptions = None,
+        read_preference: pymongo.ReadPreference = None,  # counts read from secondaries are cached apart from primary
+        **kwargs,
+    ) -> bytes:
+        """Build cache key from normalized query, read preference and count options."""
+        normalized = {"query": CountCache._normalize_query(query=query or {}), "options": dict(sorted(kwargs.items()))}
+        if read_preference is not None:
+            normalized["read_preference"] = read_preference.document
+        if codec_options is None:
+            return bson.encode(normalized)
+        return bson.encode(normalized, codec_options=codec_options)
+
+    @staticmethod
+    def _normalize_query(query: typing.Mapping) -> dict:
+        """Sort fields and operators (embedded documents keep their order, it matters for equality matches)."""
+        result = {}
+        for key in sorted(query):
+            value = query[key]
+            if key in ("$and", "$or", "$nor") and isinstance(value, (list, tuple)):
+                value = [CountCache._normalize_query(query=item) for item in value]
+            elif isinstance(value, typing.Mapping) and value and all(str(name).startswith("$") for name in value):
+                value = CountCache._normalize_query(query=value)
+            result[key] = value
+        return result
+
+    def get(self, *, key: bytes) -> typing.Optional[int]:
+        """Return cached count or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        count, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return count
+
+    def set(self, *, key: bytes, count: int):
+        """Store count for key."""
+        self._entries[key] = (count, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop all cached counts, results of counts started before invalidation are discarded."""
+        self._generation += 1
+        self._entries.clear()
+        self._pending.clear()
+
+    async def get_or_count(self, *, key: bytes, count: typing.Callable[[], typing.Awaitable[int]]) -> int:
+        """Return cached count or run 'count' (concurrent misses for same key share one db call)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            if self._should_refresh(key=key, expires_at=entry[1]):
+                self._schedule_refresh(key=key, count=count)
+            return entry[0]
+
+        self.misses += 1
+        if (future := self._pending.get(key)) is None:
+            future = asyncio.ensure_future(self._count(key=key, count=count))
+            self._pending[key] = future
+            future.add_done_callback(functools.partial(self._forget_pending, key))
+        return await asyncio.shield(future)
+
+    def _forget_pending(self, key: bytes, future: asyncio.Future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+
+    def _should_refresh(self, *, key: bytes, expires_at: float) -> bool:
+        if self.refresh_ahead is None or key in self._refreshing:
+            return False
+        return expires_at - time.monotonic() <= self.refresh_ahead
+
+    def _schedule_refresh(self, *, key: bytes, count: typing.Callable[[], typing.Awaitable[int]]):
+        self._refreshing.add(key)
+        self.refreshes += 1
+        task = asyncio.get_running_loop().create_task(self._refresh(key=key, count=count))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, *, key: bytes, count: typing.Callable[[], typing.Awaitable[int]]):
+        try:
+            await self._count(key=key, count=count)
+        except Exception as error:  # refresh is best effort, next miss counts on request path
+            logger.warning(msg=f"Background count refresh failed: {error!r}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def _count(self, *, key: bytes, count: typing.Callable[[], typing.Awaitable[int]]) -> int:
+        generation = self._generation
+        result = await count()
+        if generation == self._generation:
+            self.set(key=key, count=result)
+        return result
+
+
+def _write_operation(method):
+    """Drop cached counts and pin reads to primary after write (even failed one, it may be partially applied)."""
+
+    @functools.wraps(method)
+    async def wrapper(self: "BaseRepository", *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            if self._count_cache is not None:
+                self._count_cache.invalidate()
+            if self._read_router is not None:
+                session = kwargs.get("session") or get_current_session()
+                if isinstance(session, LazyDBSession):
+                    session = session.session
+                self._read_router.record_write(session=session)
+
+    return wrapper
 
 
 class BaseRepository:
-    def __init__(self, db_manager: BaseDBManager, db_name: str, col_name: str):
+    def __init__(
+        self,
+        db_manager: BaseDBManager,
+        db_name: str,
+        col_name: str,
+        count_cache: CountCache = None,
+        read_preference: pymongo.ReadPreference = None,  # repository default instead of database one
+        read_router: ReadRouter = None,  # per request routing of reads (overrides 'read_preference' in requests)
+    ):
         """Repository initializer."""
         self._db_manager = db_manager
         self._db_name = db_name
         self._col_name = col_name
+        self._count_cache = count_cache
+        self._read_preference = read_preference
+        self._read_router = read_router
+        self._routed_cols: dict[str, motor.motor_asyncio.AsyncIOMotorCollection] = {}
+
+    @property
+    def count_cache(self) -> typing.Optional[CountCache]:
+        """Retrieve count cache of this repository."""
+        return self._count_cache
+
+    @staticmethod
+    async def _get_session(
+        session: typing.Union[pymongo.client_session.ClientSession, LazyDBSession, None],
+    ) -> typing.Optional[pymongo.client_session.ClientSession]:
+        """Use explicitly passed session (start it, if it's lazy) or session of running transaction."""
+        _mark_call_site()  # attribute following commands to caller in request stats
+        if session is None:
+            return get_current_session()
+        if isinstance(session, LazyDBSession):
+            return await session.get()
+        return session
 
     @cached_property
     def db(self) -> motor.motor_asyncio.AsyncIOMotorDatabase:
@@ -24,8 +209,22 @@ class BaseRepository:
     @cached_property
     def col(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
         """Retrieve collection of this repository."""
+        if self._read_preference is not None:
+            return self.db.get_collection(name=self._col_name, read_preference=self._read_preference)
         return self.db[self._col_name]
 
+    def _read_col(
+        self, *, session: pymongo.client_session.ClientSession = None
+    ) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        """Retrieve collection with read preference chosen by read router."""
+        if self._read_router is None or (preference := self._read_router.read_preference(session=session)) is None:
+            return self.col
+        key = repr(preference)
+        if (collection := self._routed_cols.get(key)) is None:
+            collection = self._routed_cols[key] = self.col.with_options(read_preference=preference)
+        return collection
+
+    @_write_operation
     async def insert_one(
         self,
         *,
@@ -34,8 +233,9 @@ class BaseRepository:
         **kwargs,
     ) -> pymongo.results.InsertOneResult:
         """Insert one document to MongoDB."""
-        return await self.col.insert_one(document=document, session=session, **kwargs)
+        return await self.col.insert_one(document=document, session=await self._get_session(session=session), **kwargs)
 
+    @_write_operation
     async def insert_many(
         self,
         *,
@@ -45,8 +245,11 @@ class BaseRepository:
         **kwargs,
     ) -> pymongo.results.InsertManyResult:
         """Insert many documents to MongoDB."""
-        return await self.col.insert_many(documents=documents, ordered=ordered, session=session, **kwargs)
+        return await self.col.insert_many(
+            documents=documents, ordered=ordered, session=await self._get_session(session=session), **kwargs
+        )
 
+    @_write_operation
     async def replace_one(
         self,
         *,
@@ -61,10 +264,11 @@ class BaseRepository:
             filter=query,
             replacement=replacement,
             upsert=upsert,
-            session=session,
+            session=await self._get_session(session=session),
             **kwargs,
         )
 
+    @_write_operation
     async def update_one(
         self,
         *,
@@ -75,8 +279,11 @@ class BaseRepository:
         **kwargs,
     ) -> pymongo.results.UpdateResult:
         """Update one document to MongoDB."""
-        return await self.col.update_one(filter=query, update=update, upsert=upsert, session=session, **kwargs)
+        return await self.col.update_one(
+            filter=query, update=update, upsert=upsert, session=await self._get_session(session=session), **kwargs
+        )
 
+    @_write_operation
     async def update_many(
         self,
         *,
@@ -87,8 +294,11 @@ class BaseRepository:
         **kwargs,
     ) -> pymongo.results.UpdateResult:
         """Update many documents to MongoDB."""
-        return await self.col.update_many(filter=query, update=update, upsert=upsert, session=session, **kwargs)
+        return await self.col.update_many(
+            filter=query, update=update, upsert=upsert, session=await self._get_session(session=session), **kwargs
+        )
 
+    @_write_operation
     async def delete_one(
         self,
         *,
@@ -97,8 +307,9 @@ class BaseRepository:
         **kwargs,
     ) -> pymongo.results.DeleteResult:
         """Delete one document from MongoDB."""
-        return await self.col.delete_one(filter=query, session=session, **kwargs)
+        return await self.col.delete_one(filter=query, session=await self._get_session(session=session), **kwargs)
 
+    @_write_operation
     async def delete_many(
         self,
         *,
@@ -107,7 +318,7 @@ class BaseRepository:
         **kwargs,
     ) -> pymongo.results.DeleteResult:
         """Delete many documents from MongoDB."""
-        return await self.col.delete_many(filter=query, session=session, **kwargs)
+        return await self.col.delete_many(filter=query, session=await self._get_session(session=session), **kwargs)
 
     async def find(
         self,
@@ -121,7 +332,8 @@ class BaseRepository:
         **kwargs,
     ) -> motor.motor_asyncio.AsyncIOMotorCursor:
         """Find documents from MongoDB."""
-        return self.col.find(
+        session = await self._get_session(session=session)
+        return self._read_col(session=session).find(
             filter=query,
             sort=sort,
             skip=skip,
@@ -141,8 +353,12 @@ class BaseRepository:
         **kwargs,
     ):
         """Find one document from MongoDB."""
-        return await self.col.find_one(filter=query, sort=sort, projection=projection, session=session, **kwargs)
+        session = await self._get_session(session=session)
+        return await self._read_col(session=session).find_one(
+            filter=query, sort=sort, projection=projection, session=session, **kwargs
+        )
 
+    @_write_operation
     async def find_one_and_delete(
         self,
         *,
@@ -154,9 +370,10 @@ class BaseRepository:
     ):
         """Find one and delete a document from MongoDB."""
         return await self.col.find_one_and_delete(
-            filter=query, projection=projection, sort=sort, session=session, **kwargs
+            filter=query, projection=projection, sort=sort, session=await self._get_session(session=session), **kwargs
         )
 
+    @_write_operation
     async def find_one_and_replace(
         self,
         *,
@@ -176,11 +393,12 @@ class BaseRepository:
             upsert=upsert,
             sort=sort,
             projection=projection,
-            session=session,
+            session=await self._get_session(session=session),
             return_document=return_document,
             **kwargs,
         )
 
+    @_write_operation
     async def find_one_and_update(
         self,
         *,
@@ -198,7 +416,7 @@ class BaseRepository:
             update=update,
             sort=sort,
             projection=projection,
-            session=session,
+            session=await self._get_session(session=session),
             return_document=return_document,
             **kwargs,
         )
@@ -208,14 +426,27 @@ class BaseRepository:
         *,
         query: dict,
         session: pymongo.client_session.ClientSession = None,
+        use_cache: bool = True,
         **kwargs,
     ) -> int:
-        """Count documents in MongoDB collection."""
-        return await self.col.count_documents(filter=query, session=session, **kwargs)
+        """Count documents in MongoDB collection (through count cache, if it's configured)."""
+        session = session if session is not None else get_current_session()
+        if self._count_cache is None or not use_cache or (session is not None and session.in_transaction):
+            session = await self._get_session(session=session)
+            return await self._read_col(session=session).count_documents(filter=query, session=session, **kwargs)
+
+        collection = self._read_col()
+        key = self._count_cache.make_key(
+            query=query, codec_options=collection.codec_options, read_preference=collection.read_preference, **kwargs
+        )
+        # background refresh can outlive request (and its session), so cached counts don't use session
+        return await self._count_cache.get_or_count(
+            key=key, count=lambda: collection.count_documents(filter=query, **kwargs)
+        )
 
     async def estimated_document_count(self, **kwargs):
         """Count documents in MongoDB from collection metadata."""
-        return await self.col.estimated_document_count(**kwargs)
+        return await self._read_col().estimated_document_count(**kwargs)
 
     async def aggregate(
         self,
@@ -225,8 +456,12 @@ class BaseRepository:
         **kwargs,
     ) -> motor.motor_asyncio.AsyncIOMotorCommandCursor:
         """Run aggregation pipeline against collection."""
-        return self.col.aggregate(pipeline=pipeline, session=session, **kwargs)
+        session = await self._get_session(session=session)
+        if any("$out" in stage or "$merge" in stage for stage in pipeline):  # it writes, so primary is required
+            return self.col.aggregate(pipeline=pipeline, session=session, **kwargs)
+        return self._read_col(session=session).aggregate(pipeline=pipeline, session=session, **kwargs)
 
+    @_write_operation
     async def bulk_write(
         self,
         *,
@@ -244,10 +479,26 @@ class BaseRepository:
         session: pymongo.client_session.ClientSession = None,
     ) -> pymongo.results.BulkWriteResult:
         """Run multiple operations in one db call."""
-        return await self.col.bulk_write(requests=operations, ordered=ordered, session=session)
+        return await self.col.bulk_write(
+            requests=operations, ordered=ordered, session=await self._get_session(session=session)
+        )
 
     async def watch(
         self, *, pipeline: list[dict], session: pymongo.client_session.ClientSession = None, **kwargs
     ) -> motor.motor_asyncio.AsyncIOMotorChangeStream:
         """Blocking client stream to get operations on collection."""
+        if isinstance(session, LazyDBSession):  # change streams can't be opened in transaction, so no fallback to it
+            session = await session.get()
         return self.col.watch(pipeline=pipeline, session=session, **kwargs)
+
+    async def export(self, *, directory: str, **kwargs) -> dict:
+        """Export collection to NDJSON or BSON files by partitions (see CollectionExporter options)."""
+        from fastapi_mongodb.transfer import CollectionExporter  # transfer depends on repositories
+
+        return await CollectionExporter(self, directory=directory, **kwargs).run()
+
+    async def import_file(self, *, path: str, **kwargs) -> dict:
+        """Import NDJSON, BSON or CSV file to collection (see CollectionImporter options)."""
+        from fastapi_mongodb.transfer import CollectionImporter  # transfer depends on repositories
+
+        return await CollectionImporter(self, path=path, **kwargs).run()
@@ -0,0 +1,144 @@
+"""JSON responses that serialize schemas, models and BSON types without FastAPI 'jsonable_encoder' pass."""
+import datetime
+import decimal
+import functools
+import inspect
+import typing
+import uuid
+
+import bson
+import fastapi
+import fastapi.datastructures
+import fastapi.dependencies.utils
+import fastapi.responses
+import fastapi.routing
+import pydantic
+import pydantic.json
+
+from fastapi_mongodb.models import BaseDBModel
+
+try:
+    import orjson
+
+    def json_dumps(content: typing.Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+except ImportError:
+    import json
+
+    def json_dumps(content: typing.Any) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+__all__ = ["ORJSONResponse", "ORJSONRoute"]
+
+# APIRoute options applied by 'jsonable_encoder' (with their defaults), ORJSONRoute renders without it
+_ENCODER_OPTIONS = {
+    "response_model_include": None,
+    "response_model_exclude": None,
+    "response_model_by_alias": True,
+    "response_model_exclude_unset": False,
+    "response_model_exclude_defaults": False,
+    "response_model_exclude_none": False,
+}
+
+
+def _default(obj: typing.Any) -> typing.Any:
+    """Convert value unknown to JSON serializer (called for nested values too), the same way as 'jsonable_encoder'."""
+    if isinstance(obj, bson.ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseDBModel):
+        return obj.dict()  # field names, BaseDBModel aliases ('_id') are for MongoDB only
+    if isinstance(obj, pydantic.BaseModel):
+        return obj.dict(by_alias=True)
+    if isinstance(obj, datetime.timedelta):
+        return pydantic.json.timedelta_isoformat(obj)
+    if isinstance(obj, bson.Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    # serialized natively by orjson, required for 'json' fallback only
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type '{obj.__class__.__name__}' is not JSON serializable")
+
+
+class ORJSONResponse(fastapi.responses.JSONResponse):
+    """Render content with orjson (json, if orjson isn't installed), content may include schemas and BSON types."""
+
+    def render(self, content: typing.Any) -> bytes:
+        return json_dumps(content)
+
+
+def _render_endpoint(
+    endpoint: typing.Callable,
+    *,
+    response_class: typing.Type[fastapi.Response],
+    status_code: int,
+    route: fastapi.routing.APIRoute,  # 'response_model' field of route is created after endpoint is wrapped
+):
+    """Wrap endpoint to return rendered response (FastAPI returns Response instances as is)."""
+    signature = fastapi.dependencies.utils.get_typed_signature(endpoint)
+    response_parameter = next(
+        (name for name, parameter in signature.parameters.items() if parameter.annotation is fastapi.Response), None
+    )
+    parameters = list(signature.parameters.values())
+    if response_parameter is None:  # headers, cookies and status code of endpoint are set via injected Response
+        response_parameter = "_orjson_sub_response"
+        parameters.append(
+            inspect.Parameter(name=response_parameter, kind=inspect.Parameter.KEYWORD_ONLY, annotation=fastapi.Response)
+        )
+        pass_response = False
+    else:
+        pass_response = True
+
+    def render(result: typing.Any, sub_response: fastapi.Response) -> fastapi.Response:
+        if isinstance(result, fastapi.Response):
+            return result
+        if (field := route.secure_cloned_response_field) is not None:  # only fields of response_model are rendered
+            result, errors = field.validate(result, {}, loc=("response",))
+            if errors:
+                raise pydantic.ValidationError(errors if isinstance(errors, list) else [errors], field.type_)
+        response = response_class(content=result, status_code=sub_response.status_code or status_code)
+        response.headers.raw.extend(sub_response.headers.raw)
+        return response
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            sub_response = kwargs[response_parameter] if pass_response else kwargs.pop(response_parameter)
+            return render(result=await endpoint(**kwargs), sub_response=sub_response)
+
+    else:
+
+        @functools.wraps(endpoint)
+        def wrapper(**kwargs):
+            sub_response = kwargs[response_parameter] if pass_response else kwargs.pop(response_parameter)
+            return render(result=endpoint(**kwargs), sub_response=sub_response)
+
+    wrapper.__signature__ = signature.replace(parameters=parameters)  # FastAPI injects parameters by signature
+    return wrapper
+
+
+class ORJSONRoute(fastapi.routing.APIRoute):
+    """Route that renders endpoint result with ORJSONResponse directly (use it as 'route_class' of APIRouter).
+
+    The result is validated by 'response_model' (if it's set), so fields missing in response_model aren't rendered.
+    Options of 'jsonable_encoder' ('response_model_include', 'response_model_exclude' etc.) aren't supported.
+    """
+
+    def __init__(self, path: str, endpoint: typing.Callable, **kwargs):
+        if options := [name for name, default in _ENCODER_OPTIONS.items() if kwargs.get(name, default) != default]:
+            raise ValueError(f"ORJSONRoute doesn't support {', '.join(options)}, shape 'response_model' instead.")
+        response_class = kwargs.get("response_class")
+        if response_class is None or isinstance(response_class, fastapi.datastructures.DefaultPlaceholder):
+            response_class = kwargs["response_class"] = ORJSONResponse
+        endpoint = _render_endpoint(
+            endpoint, response_class=response_class, status_code=kwargs.get("status_code") or 200, route=self
+        )
+        super().__init__(path, endpoint, **kwargs)
@@ -0,0 +1,183 @@
+"""Denylist of revoked JWT tokens in MongoDB with in-process Bloom filter front."""
+import asyncio
+import datetime
+import hashlib
+import math
+import time
+import typing
+
+import pymongo
+import pymongo.errors
+
+import fastapi_mongodb.helpers
+from fastapi_mongodb.logging import simple_logger as logger
+from fastapi_mongodb.repositories import BaseRepository
+
+__all__ = ["BloomFilter", "TokenRevocationStore"]
+
+
+class BloomFilter:
+    """Set without false negatives, false positives have ~'error_rate' probability up to 'capacity' items."""
+
+    def __init__(self, *, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))  # bits
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def __repr__(self):
+        """Representation of BloomFilter."""
+        return f"{self.__class__.__name__}(capacity={self.capacity}, error_rate={self.error_rate}, items={self._count})"
+
+    def __len__(self):
+        """Count of added items (duplicates included)."""
+        return self._count
+
+    def __contains__(self, item: str):
+        """Check whether item may be in filter."""
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item=item))
+
+    def _positions(self, *, item: str) -> typing.Iterator[int]:
+        # double hashing (Kirsch-Mitzenmacher): one digest gives all 'hash_count' positions
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        """Add item to filter."""
+        for position in self._positions(item=item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+
+class TokenRevocationStore:
+    """Revoked JWT ids ('jti') in MongoDB collection, not revoked tokens are checked without database round trip."""
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        *,
+        capacity: int = 100000,  # expected count of revoked not expired tokens (filter grows on sync, if exceeded)
+        error_rate: float = 0.001,  # share of not revoked tokens, that are confirmed in database
+        sync_interval: float = 60.0,  # seconds between full reloads of filter (drop expired ids, catch up polling)
+        change_stream: bool = True,  # add ids revoked by other processes at once (False -> only periodic reload)
+        retry_delay: float = 1.0,  # seconds between reconnection attempts
+    ):
+        self.repository = repository
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.change_stream = change_stream
+        self.retry_delay = retry_delay
+        self.checks = 0
+        self.lookups = 0
+        self.false_positives = 0
+        self._filter = BloomFilter(capacity=capacity, error_rate=error_rate)
+        self._next_filter: typing.Optional[BloomFilter] = None  # filter being loaded by 'sync'
+        self._ready = False  # filter is unknown before first sync and stale after sync failure
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def __repr__(self):
+        """Representation of TokenRevocationStore."""
+        return f"{self.__class__.__name__}(filter={self._filter!r}, ready={self._ready})"
+
+    @property
+    def ready(self) -> bool:
+        """Filter is synced (otherwise every check is a database lookup)."""
+        return self._ready
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Counters to compare checks with database lookups."""
+        return {"checks": self.checks, "lookups": self.lookups, "false_positives": self.false_positives}
+
+    async def create_indexes(self):
+        """Create unique index on 'jti' and TTL index, that removes ids of expired tokens."""
+        await self.repository.col.create_indexes(
+            [
+                pymongo.IndexModel([("jti", pymongo.ASCENDING)], unique=True),
+                pymongo.IndexModel([("exp", pymongo.ASCENDING)], expireAfterSeconds=0),
+            ]
+        )
+
+    async def revoke(self, *, jti: str, exp: typing.Union[datetime.datetime, int, float]):
+        """Add token id to denylist until token expiration."""
+        if not isinstance(exp, datetime.datetime):
+            exp = datetime.datetime.fromtimestamp(exp, tz=datetime.timezone.utc)
+        await self.repository.update_one(
+            query={"jti": jti}, update={"$setOnInsert": {"jti": jti, "exp": exp}}, upsert=True
+        )
+        self._filter.add(jti)
+        if self._next_filter is not None:
+            self._next_filter.add(jti)
+
+    async def is_revoked(self, *, jti: str) -> bool:
+        """Check token id, only possible hits of filter are confirmed in database."""
+        self.checks += 1
+        if self._ready and jti not in self._filter:
+            return False
+        self.lookups += 1
+        document = await self.repository.find_one(query={"jti": jti}, projection={"_id": True})
+        if document is None and self._ready:
+            self.false_positives += 1
+        return document is not None
+
+    async def sync(self):
+        """Reload filter from database."""
+        query = {"exp": {"$gt": fastapi_mongodb.helpers.utc_now()}}
+        count = await self.repository.count_documents(query=query, use_cache=False)
+        self._next_filter = BloomFilter(capacity=max(self.capacity, count * 2), error_rate=self.error_rate)
+        try:
+            cursor = await self.repository.find(query=query, projection={"jti": True, "_id": False})
+            async for document in cursor:
+                self._next_filter.add(document["jti"])
+            self._filter = self._next_filter
+            self._ready = True
+        finally:
+            self._next_filter = None
+
+    async def start(self):
+        """Keep filter in sync in background task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop background sync."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                if self.change_stream:
+                    await self._follow()
+                else:
+                    await self.sync()
+                    await asyncio.sleep(self.sync_interval)
+            except Exception as error:
+                self._ready = False  # revocations of other processes may be missed, confirm all checks in database
+                if isinstance(error, pymongo.errors.PyMongoError):
+                    logger.warning(msg=f"Token revocations sync failed, retrying: {error!r}")
+                else:  # e.g. malformed document, the task must keep running anyway
+                    logger.exception(msg=f"Unexpected error of token revocations sync, retrying: {error!r}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _follow(self):
+        """Sync filter and add ids inserted by other processes until the next full reload."""
+        # stream is opened before loading, so ids revoked during loading are not missed
+        async with await self.repository.watch(
+            pipeline=[{"$match": {"operationType": "insert"}}], max_await_time_ms=1000
+        ) as change_stream:
+            await self.sync()
+            deadline = time.monotonic() + self.sync_interval
+            while time.monotonic() < deadline:
+                if (event := await change_stream.try_next()) is not None:
+                    self._filter.add(event["fullDocument"]["jti"])
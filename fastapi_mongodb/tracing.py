@@ -0,0 +1,289 @@
+"""Request and MongoDB command spans exported as OTLP JSON without tracing backend."""
+import collections
+import contextlib
+import contextvars
+import enum
+import json
+import logging
+import logging.handlers
+import secrets
+import threading
+import time
+import typing
+
+import pymongo.monitoring
+
+from fastapi_mongodb.db import get_command_shape
+
+__all__ = [
+    "SPAN_KINDS",
+    "SPAN_STATUSES",
+    "Span",
+    "BaseSpanExporter",
+    "InMemorySpanExporter",
+    "FileSpanExporter",
+    "Tracer",
+    "get_current_span",
+    "TracingListener",
+]
+
+_current_span: contextvars.ContextVar[typing.Optional["Span"]] = contextvars.ContextVar(
+    "fastapi_mongodb_current_span", default=None
+)
+
+
+class SPAN_KINDS(int, enum.Enum):
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class SPAN_STATUSES(int, enum.Enum):
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+def _otlp_value(value: typing.Any) -> dict:
+    """Attribute value of OTLP JSON (64-bit integers are strings)."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """Timed operation of trace."""
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        kind: SPAN_KINDS = SPAN_KINDS.INTERNAL,
+        parent: "Span" = None,
+        trace_id: str = None,  # hex, continue remote trace (root span only)
+        parent_span_id: str = None,  # hex, span of remote parent (root span only)
+        attributes: dict[str, typing.Any] = None,
+        start_time_ns: int = None,  # unix time
+    ):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else trace_id or secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent is not None else parent_span_id
+        self.attributes = attributes or {}
+        self.start_time_ns = start_time_ns or time.time_ns()
+        self.end_time_ns: typing.Optional[int] = None
+        self.status = SPAN_STATUSES.UNSET
+        self.status_message = ""
+        self._start_counter_ns = time.perf_counter_ns()
+        self._children: list[Span] = []  # ended spans of trace, exported together with root span
+
+    def __repr__(self):
+        """Representation of Span."""
+        return f"{self.__class__.__name__}(name={self.name!r}, trace_id={self.trace_id}, span_id={self.span_id})"
+
+    @property
+    def root(self) -> "Span":
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    @property
+    def ended(self) -> bool:
+        return self.end_time_ns is not None
+
+    @property
+    def duration(self) -> typing.Optional[float]:
+        """Seconds."""
+        return None if self.end_time_ns is None else (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def set_status(self, status: SPAN_STATUSES, message: str = ""):
+        self.status = SPAN_STATUSES(status)
+        self.status_message = message
+
+    def end(self, *, duration_ns: int = None):
+        """Set end time (measured duration is more precise, than difference of wall clock times)."""
+        if duration_ns is None:
+            duration_ns = time.perf_counter_ns() - self._start_counter_ns
+        self.end_time_ns = self.start_time_ns + duration_ns
+
+    def as_otlp(self) -> dict:
+        """Span in OTLP JSON format."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind.value,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status.value},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class BaseSpanExporter:
+    """Interface to export ended spans."""
+
+    def export(self, *, spans: list[Span]):
+        """Export spans of one trace (or late spans of already exported trace)."""
+        raise NotImplementedError
+
+    def close(self):
+        """Flush and release resources."""
+
+
+class InMemorySpanExporter(BaseSpanExporter):
+    """Keep the latest spans in memory (tests, debug endpoints)."""
+
+    def __init__(self, *, max_spans: int = 10000):
+        self.spans: collections.deque[Span] = collections.deque(maxlen=max_spans)
+
+    def export(self, *, spans: list[Span]):
+        """Export spans of one trace (or late spans of already exported trace)."""
+        self.spans.extend(spans)
+
+    def get_trace(self, *, trace_id: str) -> list[Span]:
+        return [span for span in self.spans if span.trace_id == trace_id]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class FileSpanExporter(BaseSpanExporter):
+    """Write OTLP JSON export request per trace as line of rotating file (readable by OpenTelemetry collector)."""
+
+    def __init__(
+        self,
+        *,
+        path: str,
+        service_name: str = "fastapi_mongodb",  # 'service.name' resource attribute
+        max_bytes: int = 10 * 1024 * 1024,  # rotate file after this size (0 -> never)
+        backup_count: int = 5,  # rotated files to keep
+    ):
+        self.service_name = service_name
+        # "handle" serializes writes and rotation with the handler lock, spans are passed as preformatted messages
+        self._handler = logging.handlers.RotatingFileHandler(
+            filename=path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        self._handler.setFormatter(logging.Formatter(fmt="%(message)s"))
+
+    def export(self, *, spans: list[Span]):
+        """Export spans of one trace (or late spans of already exported trace)."""
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(self.service_name)}]},
+                        "scopeSpans": [{"scope": {"name": "fastapi_mongodb"}, "spans": [s.as_otlp() for s in spans]}],
+                    }
+                ]
+            },
+            separators=(",", ":"),
+        )
+        self._handler.handle(logging.makeLogRecord({"msg": line, "args": None}))
+
+    def close(self):
+        """Flush and release resources."""
+        self._handler.close()
+
+
+def get_current_span() -> typing.Optional[Span]:
+    """Return span of current context (None -> context isn't traced)."""
+    return _current_span.get()
+
+
+class Tracer:
+    """Create spans and export whole traces after their root spans end."""
+
+    def __init__(self, *, exporter: BaseSpanExporter):
+        self.exporter = exporter
+        self._lock = threading.Lock()
+
+    def start_span(self, *, name: str, kind: SPAN_KINDS = SPAN_KINDS.INTERNAL, parent: Span = None, **kwargs) -> Span:
+        """Start span, child of 'parent' or of current span (it isn't set as current span)."""
+        return Span(name=name, kind=kind, parent=parent or _current_span.get(), **kwargs)
+
+    def end_span(self, *, span: Span, duration_ns: int = None):
+        """End span, export trace after root span."""
+        span.end(duration_ns=duration_ns)
+        root = span.root
+        with self._lock:
+            if span is not root and not root.ended:
+                root._children.append(span)
+                return
+            spans, root._children = ([span, *root._children], []) if span is root else ([span], root._children)
+        self.exporter.export(spans=spans)
+
+    @contextlib.contextmanager
+    def span(self, *, name: str, kind: SPAN_KINDS = SPAN_KINDS.INTERNAL, **kwargs) -> typing.Iterator[Span]:
+        """Run block in new current span (status is ERROR, if block raises exception)."""
+        span = self.start_span(name=name, kind=kind, **kwargs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.set_status(SPAN_STATUSES.ERROR, message=repr(error))
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span=span)
+
+
+class TracingListener(pymongo.monitoring.CommandListener):
+    """Child span of current span per MongoDB command (register it in MongoDB client 'event_listeners')."""
+
+    def __init__(self, *, tracer: Tracer, statement: bool = False):  # statement -> add command without values
+        self.tracer = tracer
+        self.statement = statement
+        # motor runs commands in executor threads with copy of context, so parent span is known in 'started' only
+        self._spans: dict[tuple[int, typing.Any], Span] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if (parent := _current_span.get()) is None:
+            return
+        collection = event.command.get(event.command_name)
+        attributes = {
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.request_id": event.request_id,
+        }
+        if isinstance(collection, str):
+            attributes["db.mongodb.collection"] = collection
+        if isinstance(event.connection_id, tuple):
+            attributes["net.peer.name"], attributes["net.peer.port"] = event.connection_id
+        if self.statement and (shape := get_command_shape(command_name=event.command_name, command=event.command)):
+            attributes["db.statement"] = shape
+        span = self.tracer.start_span(
+            name=f"{event.command_name} {collection}" if isinstance(collection, str) else event.command_name,
+            kind=SPAN_KINDS.CLIENT,
+            parent=parent,
+            attributes=attributes,
+        )
+        with self._lock:
+            self._spans[(event.request_id, event.connection_id)] = span
+
+    def succeeded(self, event):
+        with self._lock:
+            span = self._spans.pop((event.request_id, event.connection_id), None)
+        if span is not None:
+            self.tracer.end_span(span=span, duration_ns=event.duration_micros * 1000)
+
+    def failed(self, event):
+        with self._lock:
+            span = self._spans.pop((event.request_id, event.connection_id), None)
+        if span is not None:
+            span.set_status(SPAN_STATUSES.ERROR, message=str(event.failure.get("errmsg", event.failure)))
+            self.tracer.end_span(span=span, duration_ns=event.duration_micros * 1000)
@@ -0,0 +1,543 @@
+"""Bulk export of MongoDB collections to files and import of files to collections."""
+import asyncio
+import concurrent.futures
+import csv
+import datetime
+import decimal
+import enum
+import functools
+import io
+import itertools
+import os
+import time
+import typing
+import uuid
+
+import bson
+import bson.codec_options
+import bson.errors
+import bson.json_util
+import bson.raw_bson
+import motor.motor_asyncio
+import pydantic
+import pymongo.errors
+import pymongo.operations
+
+from fastapi_mongodb.logging import simple_logger as logger
+from fastapi_mongodb.models import BaseDBModel
+from fastapi_mongodb.repositories import BaseRepository
+
+__all__ = ["TRANSFER_FORMATS", "CollectionExporter", "CollectionImporter"]
+
+# errors after which partition is read again from its last written '_id'
+RETRYABLE_ERRORS = (pymongo.errors.ConnectionFailure, pymongo.errors.CursorNotFound)
+# documents are read without decoding and written as is (BSON) or as relaxed Extended JSON (NDJSON)
+RAW_CODEC_OPTIONS = bson.codec_options.CodecOptions(document_class=bson.raw_bson.RawBSONDocument, tz_aware=True)
+CODEC_OPTIONS = bson.codec_options.CodecOptions(tz_aware=True)
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+
+class TRANSFER_FORMATS(str, enum.Enum):
+    NDJSON = "ndjson"  # Extended JSON document per line (mongoexport)
+    BSON = "bson"  # concatenated BSON documents (mongodump)
+    CSV = "csv"  # header and rows of string values (import only)
+
+
+FILE_EXTENSIONS = {
+    ".ndjson": TRANSFER_FORMATS.NDJSON,
+    ".jsonl": TRANSFER_FORMATS.NDJSON,
+    ".json": TRANSFER_FORMATS.NDJSON,
+    ".bson": TRANSFER_FORMATS.BSON,
+    ".csv": TRANSFER_FORMATS.CSV,
+}
+
+
+def _bson_type_alias(value: typing.Any) -> typing.Optional[str]:
+    """'$type' alias of value (comparison query operators match values of the same type only)."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, bson.ObjectId):
+        return "objectId"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (int, float, decimal.Decimal, bson.Decimal128)):
+        return "number"
+    if isinstance(value, datetime.datetime):
+        return "date"
+    if isinstance(value, (bytes, uuid.UUID)):
+        return "binData"
+    return None
+
+
+class CollectionExporter:
+    """Export collection by '_id' range partitions read concurrently, with resumable per-partition checkpoints.
+
+    Partition boundaries are calculated with '$bucketAuto' (or '$sample' of 'sample_size' ids for huge collections).
+    Each partition is written to its own file, checkpoint keeps written size and the last '_id' of every partition,
+    so export continues after failover or restart. Collections with '_id' of mixed types are exported as one
+    partition, that restarts from the beginning.
+    """
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        *,
+        directory: str,
+        format: TRANSFER_FORMATS = TRANSFER_FORMATS.NDJSON,
+        query: dict = None,
+        partitions: int = 8,
+        concurrency: int = 4,  # partitions read at the same time
+        batch_size: int = 1000,  # documents written (and checkpointed) at once
+        sample_size: int = None,  # calculate boundaries from random ids instead of '$bucketAuto' over all ids
+        resume: bool = True,  # continue from existing checkpoint
+        max_retries: int = 5,  # per partition, on network errors and lost cursors
+        retry_delay: float = 1,
+        read_preference: pymongo.ReadPreference = None,
+    ):
+        self.repository = repository
+        self.directory = directory
+        self.format = TRANSFER_FORMATS(format)
+        if self.format not in (TRANSFER_FORMATS.NDJSON, TRANSFER_FORMATS.BSON):
+            raise ValueError(f"Export to '{self.format.value}' isn't supported.")
+        self.query = query or {}
+        self.partitions = partitions
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+        self.resume = resume
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.read_preference = read_preference
+        self.name = repository.col.name
+        self._state: typing.Optional[dict] = None
+
+    def __repr__(self):
+        """Representation of CollectionExporter."""
+        return f"{self.__class__.__name__}(collection={self.name}, format={self.format.value})"
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.checkpoint.json")
+
+    def get_file_path(self, *, index: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{index:04d}.{self.format.value}")
+
+    async def get_boundaries(self) -> list:
+        """Lower '_id' of every partition except the first one."""
+        if self.sample_size is None:
+            pipeline = [
+                {"$match": self.query},
+                {"$project": {"_id": True}},
+                {"$bucketAuto": {"groupBy": "$_id", "buckets": self.partitions}},
+            ]
+            cursor = await self.repository.aggregate(pipeline=pipeline, allowDiskUse=True)
+            return [bucket["_id"]["min"] for bucket in await cursor.to_list(length=None)][1:]
+
+        # '$sample' is fast only as the first stage
+        pipeline = [
+            {"$sample": {"size": self.sample_size}},
+            {"$match": self.query},
+            {"$project": {"_id": True}},
+            {"$sort": {"_id": 1}},
+        ]
+        cursor = await self.repository.aggregate(pipeline=pipeline, allowDiskUse=True)
+        ids = [document["_id"] for document in await cursor.to_list(length=None)]
+        if not ids:  # empty collection or no sampled document matches query
+            return []
+        boundaries = [ids[len(ids) * number // self.partitions] for number in range(1, self.partitions)]
+        return [
+            boundary for number, boundary in enumerate(boundaries) if not number or boundary != boundaries[number - 1]
+        ]
+
+    async def create_partitions(self) -> list[dict]:
+        boundaries = await self.get_boundaries() if self.partitions > 1 else []
+        first = await self.repository.find_one(query=self.query, sort=[("_id", 1)], projection={"_id": True})
+        alias = _bson_type_alias(first["_id"]) if first is not None else None
+        if alias is not None and boundaries and any(_bson_type_alias(boundary) != alias for boundary in boundaries):
+            alias = None
+        if alias is not None:
+            other_type = await self.repository.find_one(
+                query={"$and": [self.query, {"_id": {"$not": {"$type": alias}}}]}, projection={"_id": True}
+            )
+            alias = None if other_type is not None else alias
+        if alias is None:
+            if boundaries:
+                logger.warning(
+                    msg=f"Collection '{self.name}' has '_id' of mixed types, it's exported as one partition."
+                )
+            boundaries = []
+        lowers, uppers = [None, *boundaries], [*boundaries, None]
+        return [
+            {
+                "index": index,
+                "lower": lower,
+                "upper": upper,
+                "resumable": alias is not None,
+                "last_id": None,
+                "documents": 0,
+                "size": 0,  # bytes written to partition file
+                "done": False,
+            }
+            for index, (lower, upper) in enumerate(zip(lowers, uppers))
+        ]
+
+    def get_partition_query(self, *, partition: dict) -> dict:
+        condition = {}
+        if partition["last_id"] is not None:
+            condition["$gt"] = partition["last_id"]
+        elif partition["lower"] is not None:
+            condition["$gte"] = partition["lower"]
+        if partition["upper"] is not None:
+            condition["$lt"] = partition["upper"]
+        if not condition:
+            return self.query
+        return {"$and": [self.query, {"_id": condition}]} if self.query else {"_id": condition}
+
+    async def run(self) -> dict:
+        """Export collection, return throughput report."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._state = self._load_checkpoint() if self.resume else None
+        if self._state is None:
+            self._state = {
+                "format": self.format.value,
+                "query": self.query,
+                "partitions": await self.create_partitions(),
+            }
+            self._save_checkpoint()
+        elif (self._state["format"], self._state["query"]) != (self.format.value, self.query):
+            raise ValueError(f"Checkpoint '{self.checkpoint_path}' was created for other format or query.")
+
+        collection = self.repository.col.with_options(
+            codec_options=RAW_CODEC_OPTIONS, read_preference=self.read_preference
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+        partitions = self._state["partitions"]
+        exported_before = sum(partition["documents"] for partition in partitions)
+        size_before = sum(partition["size"] for partition in partitions)
+        start = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(
+                self._export_partition(partition=partition, collection=collection, semaphore=semaphore)
+            )
+            for partition in partitions
+            if not partition["done"]
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        seconds = time.perf_counter() - start
+        documents = sum(partition["documents"] for partition in partitions)
+        size = sum(partition["size"] for partition in partitions)
+        report = {
+            "collection": self.name,
+            "files": [self.get_file_path(index=partition["index"]) for partition in partitions],
+            "documents": documents,
+            "size": size,
+            "seconds": seconds,
+            # throughput of this run (without documents exported before resume)
+            "documents_per_second": (documents - exported_before) / seconds if seconds else 0.0,
+            "bytes_per_second": (size - size_before) / seconds if seconds else 0.0,
+        }
+        logger.info(
+            msg=f"Exported {documents} documents of '{self.name}' ({size / 2 ** 20:.1f} MiB) in {seconds:.1f}s, "
+            f"{report['documents_per_second']:.0f} documents/s."
+        )
+        return report
+
+    async def _export_partition(
+        self,
+        *,
+        partition: dict,
+        collection: motor.motor_asyncio.AsyncIOMotorCollection,
+        semaphore: asyncio.Semaphore,
+    ):
+        async with semaphore:
+            path = self.get_file_path(index=partition["index"])
+            with open(path, "r+b" if os.path.exists(path) else "wb") as file:
+                file.truncate(partition["size"])  # drop data written after the last checkpoint
+                file.seek(partition["size"])
+                retries = 0
+                while True:
+                    try:
+                        await self._read_partition(partition=partition, collection=collection, file=file)
+                        break
+                    except RETRYABLE_ERRORS as error:
+                        retries += 1
+                        if retries > self.max_retries:
+                            raise
+                        logger.warning(msg=f"Export of '{path}' failed, retrying: {error!r}")
+                        if not partition["resumable"]:
+                            partition |= {"documents": 0, "size": 0}
+                            file.truncate(0)
+                            file.seek(0)
+                        await asyncio.sleep(self.retry_delay)
+            partition["done"] = True
+            self._save_checkpoint()
+
+    async def _read_partition(
+        self, *, partition: dict, collection: motor.motor_asyncio.AsyncIOMotorCollection, file: typing.BinaryIO
+    ):
+        cursor = collection.find(
+            filter=self.get_partition_query(partition=partition),
+            sort=[("_id", 1)] if partition["resumable"] else None,
+            batch_size=self.batch_size,
+        )
+        batch = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                await self._write_batch(partition=partition, file=file, batch=batch)
+                batch = []
+        if batch:
+            await self._write_batch(partition=partition, file=file, batch=batch)
+
+    async def _write_batch(self, *, partition: dict, file: typing.BinaryIO, batch: list):
+        # encoding and writing run in thread, while other partitions are read
+        written = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._write, file=file, batch=batch)
+        )
+        partition["documents"] += len(batch)
+        partition["size"] += written
+        if partition["resumable"]:
+            partition["last_id"] = batch[-1]["_id"]
+        self._save_checkpoint()
+
+    def _write(self, *, file: typing.BinaryIO, batch: list[bson.raw_bson.RawBSONDocument]) -> int:
+        if self.format == TRANSFER_FORMATS.BSON:
+            data = b"".join(document.raw for document in batch)
+        else:
+            data = "".join(
+                bson.json_util.dumps(document, json_options=bson.json_util.RELAXED_JSON_OPTIONS) + "\n"
+                for document in batch
+            ).encode("utf-8")
+        file.write(data)
+        file.flush()
+        return len(data)
+
+    def _load_checkpoint(self) -> typing.Optional[dict]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            return bson.json_util.loads(file.read(), json_options=bson.json_util.CANONICAL_JSON_OPTIONS)
+
+    def _save_checkpoint(self):
+        # canonical Extended JSON keeps types of boundaries, replace makes checkpoint update atomic
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(bson.json_util.dumps(self._state, json_options=bson.json_util.CANONICAL_JSON_OPTIONS))
+        os.replace(temporary_path, self.checkpoint_path)
+
+
+def _read_bson_documents(file: typing.BinaryIO, count: int) -> list[bytes]:
+    """Read up to 'count' documents of concatenated BSON (truncated document is returned as is and rejected)."""
+    records = []
+    while len(records) < count and (size_bytes := file.read(4)):
+        size = int.from_bytes(size_bytes, byteorder="little", signed=True)
+        records.append(size_bytes + file.read(max(size - 4, 0)))
+    return records
+
+
+def _parse_batch(
+    *,
+    format: TRANSFER_FORMATS,
+    records: list,
+    start: int,  # number of the first record in file (line of NDJSON, row after CSV header, document of BSON)
+    fieldnames: typing.Optional[list[str]],  # CSV header
+    model: typing.Optional[typing.Type[BaseDBModel]],
+) -> tuple[list[tuple[int, dict]], list[dict]]:
+    """Parse (and validate) records to (record number, document) pairs and rejects (runs in executor)."""
+    documents, rejects = [], []
+    for number, record in enumerate(records, start=start):
+        if not (record.strip() if format == TRANSFER_FORMATS.NDJSON else record):
+            continue  # empty line or row, it's still counted in record numbers
+        try:
+            if format == TRANSFER_FORMATS.NDJSON:
+                document = bson.json_util.loads(record)
+                if not isinstance(document, dict):  # e.g. '5' or '[1]' is valid JSON, but not a document
+                    raise ValueError(f"Record must be a JSON object, not {type(document).__name__}.")
+            elif format == TRANSFER_FORMATS.BSON:
+                document = bson.decode(record, codec_options=CODEC_OPTIONS)
+            else:
+                if len(record) != len(fieldnames):
+                    raise ValueError(f"Row has {len(record)} values, header has {len(fieldnames)} fields.")
+                document = dict(zip(fieldnames, record))
+            if model is not None:
+                document = model(**document).to_db()
+        except (ValueError, TypeError, bson.errors.BSONError, pydantic.ValidationError) as error:
+            data = record.decode("utf-8", errors="replace") if format == TRANSFER_FORMATS.NDJSON else record
+            rejects.append({"record": number, "error": str(error), "data": data})
+        else:
+            documents.append((number, document))
+    return documents, rejects
+
+
+class CollectionImporter:
+    """Import NDJSON, BSON or CSV file to collection with parsing in executor and concurrent unordered writes.
+
+    Reading, parsing and writing are connected by bounded queue, so at most 'max_pending_batches' batches are kept in
+    memory. Invalid records and write errors (e.g. duplicate keys) are written to NDJSON reject file.
+    """
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        *,
+        path: str,
+        format: TRANSFER_FORMATS = None,  # None -> by file extension
+        model: typing.Type[BaseDBModel] = None,  # validate documents and convert them with 'to_db'
+        upsert: bool = False,  # replace documents with the same '_id' instead of rejecting them as duplicates
+        batch_size: int = 1000,  # documents per parsed chunk and per write
+        concurrency: int = 4,  # batches written at the same time
+        max_pending_batches: int = None,  # read and parsed batches waiting for write (default is 2 * concurrency)
+        executor: concurrent.futures.Executor = None,  # parsing pool (ProcessPoolExecutor for CPU-heavy validation)
+        reject_path: str = None,  # default is '<path>.rejects.ndjson'
+    ):
+        self.repository = repository
+        self.path = path
+        if format is None:
+            try:
+                format = FILE_EXTENSIONS[os.path.splitext(path)[1].lower()]
+            except KeyError:
+                raise ValueError(f"Format of '{path}' can't be detected by extension, set 'format'.") from None
+        self.format = TRANSFER_FORMATS(format)
+        self.model = model
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_pending_batches = max_pending_batches or 2 * concurrency
+        self.executor = executor
+        self.reject_path = reject_path or f"{path}.rejects.ndjson"
+        self.stats = {"read": 0, "inserted": 0, "upserted": 0, "modified": 0, "rejected": 0, "duplicates": 0}
+        self._reject_file: typing.Optional[typing.TextIO] = None
+
+    def __repr__(self):
+        """Representation of CollectionImporter."""
+        return f"{self.__class__.__name__}(path={self.path}, format={self.format.value})"
+
+    async def run(self) -> dict:
+        """Import file, return throughput report."""
+        queue: asyncio.Queue[typing.Optional[asyncio.Future]] = asyncio.Queue(maxsize=self.max_pending_batches)
+        tasks = [
+            asyncio.ensure_future(self._read(queue=queue)),
+            *(asyncio.ensure_future(self._write(queue=queue)) for _ in range(self.concurrency)),
+        ]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            if self._reject_file is not None:
+                self._reject_file.close()
+                self._reject_file = None
+        seconds = time.perf_counter() - start
+        report = self.stats | {
+            "path": self.path,
+            "reject_path": self.reject_path if self.stats["rejected"] else None,
+            "seconds": seconds,
+            "documents_per_second": self.stats["read"] / seconds if seconds else 0.0,
+        }
+        logger.info(
+            msg=f"Imported {self.stats['inserted'] + self.stats['upserted']} of {self.stats['read']} documents from "
+            f"'{self.path}' in {seconds:.1f}s, {report['documents_per_second']:.0f} documents/s, "
+            f"{self.stats['rejected']} rejected."
+        )
+        return report
+
+    async def _read(self, *, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        with open(self.path, "rb") as file:
+            text_file = rows = fieldnames = None
+            if self.format == TRANSFER_FORMATS.CSV:
+                text_file = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+                rows = csv.reader(text_file)
+                fieldnames = await loop.run_in_executor(None, next, rows, [])
+            number = 1
+            while True:
+                records = await loop.run_in_executor(None, functools.partial(self._read_records, file=file, rows=rows))
+                if not records:
+                    break
+                parse = functools.partial(
+                    _parse_batch,
+                    format=self.format,
+                    records=records,
+                    start=number,
+                    fieldnames=fieldnames,
+                    model=self.model,
+                )
+                # waits while queue is full, so reading doesn't outrun writes
+                await queue.put(loop.run_in_executor(self.executor, parse))
+                number += len(records)
+            if text_file is not None:
+                text_file.detach()
+        for _ in range(self.concurrency):
+            await queue.put(None)
+
+    def _read_records(self, *, file: typing.BinaryIO, rows: typing.Optional[typing.Iterator[list[str]]]) -> list:
+        if self.format == TRANSFER_FORMATS.BSON:
+            return _read_bson_documents(file=file, count=self.batch_size)
+        if self.format == TRANSFER_FORMATS.CSV:
+            return list(itertools.islice(rows, self.batch_size))
+        return list(itertools.islice(file, self.batch_size))
+
+    async def _write(self, *, queue: asyncio.Queue):
+        while (future := await queue.get()) is not None:
+            documents, rejects = await future
+            self.stats["read"] += len(documents) + len(rejects)
+            self._reject(rejects=rejects)
+            if documents:
+                await self._write_batch(documents=documents)
+
+    async def _write_batch(self, *, documents: list[tuple[int, dict]]):
+        try:
+            if self.upsert:
+                result = await self.repository.bulk_write(
+                    operations=[
+                        pymongo.operations.ReplaceOne(
+                            filter={"_id": document["_id"]}, replacement=document, upsert=True
+                        )
+                        if "_id" in document
+                        else pymongo.operations.InsertOne(document=document)
+                        for _, document in documents
+                    ]
+                )
+                details = result.bulk_api_result
+            else:
+                result = await self.repository.insert_many(
+                    documents=[document for _, document in documents], ordered=False
+                )
+                details = {"nInserted": len(result.inserted_ids), "writeErrors": []}
+        except pymongo.errors.BulkWriteError as error:
+            details = error.details
+        self.stats["inserted"] += details.get("nInserted", 0)
+        self.stats["upserted"] += details.get("nUpserted", 0)
+        self.stats["modified"] += details.get("nModified", 0)
+        self.stats["duplicates"] += sum(
+            1 for error in details["writeErrors"] if error["code"] == DUPLICATE_KEY_ERROR_CODE
+        )
+        self._reject(
+            rejects=[
+                {
+                    "record": documents[error["index"]][0],
+                    "error": error["errmsg"],
+                    "code": error["code"],
+                    "data": documents[error["index"]][1],
+                }
+                for error in details["writeErrors"]
+            ]
+        )
+
+    def _reject(self, *, rejects: list[dict]):
+        if not rejects:
+            return
+        if self._reject_file is None:
+            self._reject_file = open(self.reject_path, "w", encoding="utf-8")
+        self.stats["rejected"] += len(rejects)
+        self._reject_file.writelines(
+            bson.json_util.dumps(reject, json_options=bson.json_util.RELAXED_JSON_OPTIONS) + "\n" for reject in rejects
+        )
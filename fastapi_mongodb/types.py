@@ -1,5 +1,18 @@
 """Pydantic types to work with bson.ObjectId instance."""
+import re
+import typing
+
 import bson
+import bson.objectid
+import pydantic.errors
+
+__all__ = ["OID", "OIDs", "InvalidObjectIdsError"]
+
+_HEX_PATTERN = re.compile(r"[0-9a-fA-F]*")  # bson.ObjectId accepts upper case hex too
+
+
+def _invalid_id_message(value: typing.Any) -> str:
+    return f"'{value}' is not a valid ObjectId, it must be a 12-byte input or a 24-character hex string"
 
 
 class OID(str):
@@ -23,9 +36,56 @@ class OID(str):
     @classmethod
     def validate(cls, v) -> bson.ObjectId:
         """Require validation for Pydantic Types."""
-        try:
-            value = bson.ObjectId(oid=str(v))
-        except bson.errors.InvalidId as error:
-            raise ValueError(error) from error
-        else:
-            return value
+        if isinstance(v, bson.objectid.ObjectId):  # already validated (e.g. document from MongoDB)
+            return v
+        if isinstance(v, str):
+            if len(v) == 24 and _HEX_PATTERN.fullmatch(v):
+                return bson.ObjectId(oid=bytes.fromhex(v))
+        elif isinstance(v, bytes) and len(v) == 12:  # binary ObjectId
+            return bson.ObjectId(oid=v)
+        raise ValueError(_invalid_id_message(value=v))
+
+
+class InvalidObjectIdsError(pydantic.errors.PydanticValueError):
+    """Indexes of all invalid items of OIDs list."""
+
+    code = "object_ids"
+    msg_template = "invalid ObjectIds at indexes {indexes}"
+
+
+class OIDs(list):
+    """List of ObjectIds for BaseMongoDBModels and BaseSchemas (reports all invalid items at once)."""
+
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        """Update OpenAPI docs schema."""
+        items_schema = {}
+        OID.__modify_schema__(field_schema=items_schema)
+        field_schema.update(type="array", items=items_schema)
+
+    @classmethod
+    def __get_validators__(cls):
+        """Require method for Pydantic Types."""
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, v) -> list[bson.ObjectId]:
+        """Require validation for Pydantic Types."""
+        if not isinstance(v, (list, tuple)):
+            raise pydantic.errors.ListError()
+        # hex strings (ids from query or JSON body) are checked and decoded in one pass for the whole list
+        if all(type(item) is str and len(item) == 24 for item in v):
+            joined = "".join(v)
+            if _HEX_PATTERN.fullmatch(joined):
+                binary = bytes.fromhex(joined)
+                return [bson.ObjectId(oid=binary[start : start + 12]) for start in range(0, len(binary), 12)]
+
+        result, invalid_indexes = [], []
+        for index, item in enumerate(v):
+            try:
+                result.append(OID.validate(v=item))
+            except ValueError:
+                invalid_indexes.append(index)
+        if invalid_indexes:
+            raise InvalidObjectIdsError(indexes=invalid_indexes)
+        return result
@@ -0,0 +1,254 @@
+import asyncio
+import unittest.mock
+
+import bson
+import pymongo.errors
+import pytest
+
+import fastapi_mongodb.repositories
+from fastapi_mongodb.change_streams import (
+    SLOW_CONSUMER_POLICIES,
+    ChangeStreamHub,
+    MemoryResumeTokenStore,
+    RepositoryResumeTokenStore,
+)
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class FakeChangeStream:
+    def __init__(self, events: list[dict], error: Exception = None):
+        self._events = list(events)
+        self._error = error
+        self.resume_token = None
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._events:
+            event = self._events.pop(0)
+            self.resume_token = {"_data": event["_id"]}
+            return event
+        if self._error is not None:
+            raise self._error
+        await asyncio.Event().wait()  # stream is open, no new events
+
+
+@pytest.fixture()
+def fake_repository():
+    repository = unittest.mock.MagicMock()
+    repository.db.name, repository.col.name = "test_db", "test_col"
+    return repository
+
+
+async def wait_for(subscription, count: int, timeout: float = 1) -> list[dict]:
+    return [await asyncio.wait_for(subscription.get(), timeout=timeout) for _ in range(count)]
+
+
+class TestChangeStreamHub:
+    def _events_factory(self, count: int) -> list[dict]:
+        return [{"_id": str(i), "operationType": "insert", "fullDocument": {"number": i}} for i in range(count)]
+
+    async def test_one_stream_for_many_subscribers(self, fake_repository):
+        events = self._events_factory(count=3)
+        fake_repository.watch = unittest.mock.AsyncMock(side_effect=[FakeChangeStream(events=events)])
+        hub = ChangeStreamHub()
+        pipeline = [{"$match": {"operationType": "insert"}}]
+
+        first = await hub.subscribe(repository=fake_repository, pipeline=pipeline)
+        second = await hub.subscribe(repository=fake_repository, pipeline=pipeline)
+
+        assert events == await wait_for(subscription=first, count=3)
+        assert 1 == fake_repository.watch.await_count
+        assert 1 == len(hub.streams)
+        await hub.close()
+        assert first.closed and second.closed
+        assert {} == hub.streams
+
+    async def test_different_pipelines(self, fake_repository):
+        fake_repository.watch = unittest.mock.AsyncMock(side_effect=[FakeChangeStream([]), FakeChangeStream([])])
+        hub = ChangeStreamHub()
+
+        await hub.subscribe(repository=fake_repository, pipeline=[])
+        await hub.subscribe(repository=fake_repository, pipeline=[{"$match": {"operationType": "delete"}}])
+
+        assert 2 == len(hub.streams)
+        await hub.close()
+
+    async def test_event_filter(self, fake_repository):
+        events = self._events_factory(count=4)
+        fake_repository.watch = unittest.mock.AsyncMock(return_value=FakeChangeStream(events=events))
+        hub = ChangeStreamHub()
+
+        subscription = await hub.subscribe(
+            repository=fake_repository, event_filter=lambda event: event["fullDocument"]["number"] % 2 == 0
+        )
+
+        assert [events[0], events[2]] == await wait_for(subscription=subscription, count=2)
+        await subscription.close()
+        assert {} == hub.streams
+
+    @pytest.mark.parametrize(
+        argnames=["policy", "expected_numbers"],
+        argvalues=[(SLOW_CONSUMER_POLICIES.DROP_NEWEST, [0, 1]), (SLOW_CONSUMER_POLICIES.DROP_OLDEST, [3, 4])],
+    )
+    async def test_slow_consumer_drop(self, fake_repository, policy, expected_numbers):
+        fake_repository.watch = unittest.mock.AsyncMock(
+            return_value=FakeChangeStream(events=self._events_factory(count=5))
+        )
+        hub = ChangeStreamHub(max_queue_size=2, policy=policy)
+
+        subscription = await hub.subscribe(repository=fake_repository)
+        await asyncio.sleep(0.01)
+
+        assert 3 == subscription.dropped
+        assert expected_numbers == [event["fullDocument"]["number"] for event in await wait_for(subscription, 2)]
+        await hub.close()
+
+    async def test_slow_consumer_disconnect(self, fake_repository):
+        fake_repository.watch = unittest.mock.AsyncMock(
+            return_value=FakeChangeStream(events=self._events_factory(count=5))
+        )
+        hub = ChangeStreamHub(max_queue_size=2)
+
+        slow = await hub.subscribe(repository=fake_repository, policy=SLOW_CONSUMER_POLICIES.DISCONNECT)
+        await asyncio.sleep(0.01)
+
+        assert slow.closed
+        with pytest.raises(ConnectionAbortedError):
+            await slow.get()
+        assert {} == hub.streams
+
+    async def test_resume_token_persisted(self, fake_repository):
+        events = self._events_factory(count=2)
+        fake_repository.watch = unittest.mock.AsyncMock(
+            side_effect=[FakeChangeStream(events=events), FakeChangeStream(events=[])]
+        )
+        token_store = MemoryResumeTokenStore()
+        hub = ChangeStreamHub(token_store=token_store)
+        key = hub.make_key(repository=fake_repository, pipeline=[])
+
+        subscription = await hub.subscribe(repository=fake_repository)
+        await wait_for(subscription=subscription, count=2)
+        await subscription.close()
+        await hub.subscribe(repository=fake_repository)
+
+        assert {"_data": "1"} == await token_store.load(key=key)
+        assert {"_data": "1"} == fake_repository.watch.await_args.kwargs["start_after"]
+        await hub.close()
+
+    async def test_reconnect_on_error(self, fake_repository):
+        events = self._events_factory(count=2)
+        fake_repository.watch = unittest.mock.AsyncMock(
+            side_effect=[
+                FakeChangeStream(events=events[:1], error=pymongo.errors.AutoReconnect()),
+                FakeChangeStream(events=events[1:]),
+            ]
+        )
+        hub = ChangeStreamHub(retry_delay=0)
+
+        subscription = await hub.subscribe(repository=fake_repository)
+
+        assert events == await wait_for(subscription=subscription, count=2)
+        assert {"_data": "0"} == fake_repository.watch.await_args.kwargs["start_after"]
+        await hub.close()
+
+    async def test_reconnect_on_resumable_operation_failure(self, fake_repository):
+        events = self._events_factory(count=2)
+        error = pymongo.errors.OperationFailure("interrupted due to repl state change", code=11602)
+        fake_repository.watch = unittest.mock.AsyncMock(
+            side_effect=[FakeChangeStream(events=events[:1], error=error), FakeChangeStream(events=events[1:])]
+        )
+        hub = ChangeStreamHub(retry_delay=0)
+
+        subscription = await hub.subscribe(repository=fake_repository)
+
+        assert events == await wait_for(subscription=subscription, count=2)
+        await hub.close()
+
+    async def test_fatal_operation_failure(self, fake_repository):
+        fake_repository.watch = unittest.mock.AsyncMock(
+            side_effect=pymongo.errors.OperationFailure("not authorized", code=13)
+        )
+        hub = ChangeStreamHub(retry_delay=0)
+
+        with pytest.raises(pymongo.errors.OperationFailure):
+            await hub.subscribe(repository=fake_repository)
+
+        assert 1 == fake_repository.watch.await_count
+        assert {} == hub.streams
+
+    async def test_checkpoint_in_background(self, fake_repository):
+        events = self._events_factory(count=3)
+        fake_repository.watch = unittest.mock.AsyncMock(return_value=FakeChangeStream(events=events))
+        token_store, saved = MemoryResumeTokenStore(), asyncio.Event()
+        save = token_store.save
+
+        async def slow_save(**kwargs):
+            await saved.wait()
+            await save(**kwargs)
+
+        token_store.save = unittest.mock.AsyncMock(side_effect=slow_save)
+        hub = ChangeStreamHub(token_store=token_store, checkpoint_every=1)
+        key = hub.make_key(repository=fake_repository, pipeline=[])
+
+        subscription = await hub.subscribe(repository=fake_repository)
+
+        assert events == await wait_for(subscription=subscription, count=3)  # fan out doesn't wait for token store
+        assert 1 == token_store.save.await_count
+        saved.set()
+        await hub.close()
+        assert {"_data": "2"} == await token_store.load(key=key)  # the latest token is saved on stop
+
+    async def test_open_timeout(self, fake_repository):
+        fake_repository.watch = unittest.mock.AsyncMock(side_effect=pymongo.errors.ServerSelectionTimeoutError())
+        hub = ChangeStreamHub(retry_delay=0.01, open_timeout=0.05)
+
+        with pytest.raises(asyncio.TimeoutError) as exception_context:
+            await hub.subscribe(repository=fake_repository)
+
+        assert isinstance(exception_context.value.__cause__, pymongo.errors.ServerSelectionTimeoutError)
+        assert {} == hub.streams
+
+    async def test_fatal_error_closes_subscriptions(self, fake_repository):
+        error = pymongo.errors.OperationFailure(error="Unauthorized", code=13)
+        fake_repository.watch = unittest.mock.AsyncMock(side_effect=error)
+        hub = ChangeStreamHub()
+
+        with pytest.raises(pymongo.errors.OperationFailure):
+            await hub.subscribe(repository=fake_repository)
+        assert {} == hub.streams
+
+
+class TestRepositoryResumeTokenStore:
+    async def test_save_load(self, db_manager, faker):
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=db_manager, db_name="test_db", col_name="test_resume_tokens"
+        )
+        store, key, token = RepositoryResumeTokenStore(repository=repository), faker.pystr(), {"_data": faker.pystr()}
+
+        assert await store.load(key=key) is None
+        await store.save(key=key, token=token)
+
+        assert token == await store.load(key=key)
+
+    async def test_watch_real_collection(self, repository, mongodb_session):
+        hub = ChangeStreamHub()
+        document = {"_id": bson.ObjectId()}
+
+        async with await hub.subscribe(
+            repository=repository, pipeline=[{"$match": {"operationType": "insert"}}]
+        ) as subscription:
+            await repository.insert_one(document=document, session=mongodb_session)
+            event = await asyncio.wait_for(subscription.get(), timeout=5)
+
+        assert document == event["fullDocument"]
+        assert {} == hub.streams
@@ -1,11 +1,13 @@
 import datetime
 import decimal
+import logging
 import random
 import typing
 import unittest.mock
 
 import bson
 import motor.motor_asyncio
+import pymongo
 import pymongo.errors
 import pytest
 
@@ -116,6 +118,42 @@ def event():
     return unittest.mock.MagicMock()
 
 
+class TestBaseEventLogger:
+    def test_disabled_level(self, patcher, event):
+        is_enabled_for = patcher.patch_attr(
+            target=fastapi_mongodb.logging.simple_logger, attribute="isEnabledFor", return_value=False
+        )
+        event_logger = fastapi_mongodb.db.HeartbeatLogger()
+
+        event_logger.succeeded(event=event)
+
+        is_enabled_for.assert_called_once_with(logging.DEBUG)
+        event.reply.document.__str__.assert_not_called()
+
+    def test_sample_rate(self, patch_logging, event):
+        event_logger = fastapi_mongodb.db.CommandLogger(sample_rate=0.1)
+
+        with unittest.mock.patch.object(target=fastapi_mongodb.db.random, attribute="random") as random_mock:
+            random_mock.side_effect = [0.05, 0.5, 0.09]
+            for _ in range(3):
+                event_logger.started(event=event)
+
+        assert 2 == patch_logging.call_count
+        assert 1 == event_logger.suppressed
+
+    def test_rate_limit(self, patch_logging, event):
+        with unittest.mock.patch.object(target=fastapi_mongodb.db.time, attribute="monotonic") as monotonic:
+            monotonic.return_value = 100.0
+            event_logger = fastapi_mongodb.db.ConnectionPoolLogger(rate_limit=2)
+            for _ in range(5):
+                event_logger.pool_created(event=event)
+            monotonic.return_value = 100.5
+            event_logger.pool_created(event=event)
+
+        assert 3 == patch_logging.call_count
+        assert 3 == event_logger.suppressed
+
+
 class TestCommandLogger:
     @classmethod
     def setup_class(cls) -> None:
@@ -125,24 +163,32 @@ class TestCommandLogger:
         self.logger.started(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Command '{event.command_name}' with request id {event.request_id} started on server "
-            f"{event.connection_id}"
+            "Command '%s' with request id %s started on server %s",
+            event.command_name,
+            event.request_id,
+            event.connection_id,
         )
 
     def test_succeeded(self, patch_logging, event):
         self.logger.succeeded(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Command '{event.command_name}' with request id {event.request_id} on server "
-            f"{event.connection_id} succeeded in {event.duration_micros} microseconds"
+            "Command '%s' with request id %s on server %s succeeded in %s microseconds",
+            event.command_name,
+            event.request_id,
+            event.connection_id,
+            event.duration_micros,
         )
 
     def test_failed(self, patch_logging, event):
         self.logger.failed(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Command {event.command_name} with request id {event.request_id} on server "
-            f"{event.connection_id} failed in {event.duration_micros} microseconds"
+            "Command %s with request id %s on server %s failed in %s microseconds",
+            event.command_name,
+            event.request_id,
+            event.connection_id,
+            event.duration_micros,
         )
 
 
@@ -154,61 +200,63 @@ class TestConnectionPoolLogger:
     def test_pool_created(self, patch_logging, event):
         self.logger.pool_created(event=event)
 
-        patch_logging.assert_called_once_with(f"[pool {event.address}] pool created")
+        patch_logging.assert_called_once_with("[pool %s] pool created", event.address)
 
     def test_pool_cleared(self, patch_logging, event):
         self.logger.pool_cleared(event=event)
 
-        patch_logging.assert_called_once_with(f"[pool {event.address}] pool cleared")
+        patch_logging.assert_called_once_with("[pool %s] pool cleared", event.address)
 
     def test_pool_closed(self, patch_logging, event):
         self.logger.pool_closed(event=event)
 
-        patch_logging.assert_called_once_with(f"[pool {event.address}] pool closed")
+        patch_logging.assert_called_once_with("[pool %s] pool closed", event.address)
 
     def test_connection_created(self, patch_logging, event):
         self.logger.connection_created(event=event)
 
-        patch_logging.assert_called_once_with(f"[pool {event.address}][conn #{event.connection_id}] connection created")
+        patch_logging.assert_called_once_with(
+            "[pool %s][conn #%s] connection created", event.address, event.connection_id
+        )
 
     def test_connection_ready(self, patch_logging, event):
         self.logger.connection_ready(event=event)
 
         patch_logging.assert_called_once_with(
-            f"[pool {event.address}][conn #{event.connection_id}] connection setup succeeded"
+            "[pool %s][conn #%s] connection setup succeeded", event.address, event.connection_id
         )
 
     def test_connection_closed(self, patch_logging, event):
         self.logger.connection_closed(event=event)
 
         patch_logging.assert_called_once_with(
-            f"[pool {event.address}][conn #{event.connection_id}] connection closed, reason: {event.reason}"
+            "[pool %s][conn #%s] connection closed, reason: %s", event.address, event.connection_id, event.reason
         )
 
     def test_connection_check_out_started(self, patch_logging, event):
         self.logger.connection_check_out_started(event=event)
 
-        patch_logging.assert_called_once_with(f"[pool {event.address}] connection check out started")
+        patch_logging.assert_called_once_with("[pool %s] connection check out started", event.address)
 
     def test_connection_check_out_failed(self, patch_logging, event):
         self.logger.connection_check_out_failed(event=event)
 
         patch_logging.assert_called_once_with(
-            f"[pool {event.address}] connection check out failed, reason: {event.reason}"
+            "[pool %s] connection check out failed, reason: %s", event.address, event.reason
         )
 
     def test_connection_checked_out(self, patch_logging, event):
         self.logger.connection_checked_out(event=event)
 
         patch_logging.assert_called_once_with(
-            f"[pool {event.address}][conn #{event.connection_id}] connection checked out of pool"
+            "[pool %s][conn #%s] connection checked out of pool", event.address, event.connection_id
         )
 
     def test_connection_checked_in(self, patch_logging, event):
         self.logger.connection_checked_in(event=event)
 
         patch_logging.assert_called_once_with(
-            f"[pool {event.address}][conn #{event.connection_id}] connection checked into pool"
+            "[pool %s][conn #%s] connection checked into pool", event.address, event.connection_id
         )
 
 
@@ -220,7 +268,7 @@ class TestServerLogger:
     def test_opened(self, patch_logging, event):
         self.logger.opened(event=event)
 
-        patch_logging.assert_called_once_with(f"Server {event.server_address} added to topology {event.topology_id}")
+        patch_logging.assert_called_once_with("Server %s added to topology %s", event.server_address, event.topology_id)
 
     def test_description_changed_called(self, patch_logging, event):
         new_mock = unittest.mock.MagicMock()
@@ -228,8 +276,10 @@ class TestServerLogger:
         self.logger.description_changed(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Server {event.server_address} changed type from {event.previous_description.server_type_name} to "
-            f"{event.new_description.server_type_name}"
+            "Server %s changed type from %s to %s",
+            event.server_address,
+            event.previous_description.server_type_name,
+            event.new_description.server_type_name,
         )
 
     def test_description_changed_not_called(self, patch_logging, event):
@@ -244,7 +294,7 @@ class TestServerLogger:
         self.logger.closed(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Server {event.server_address} removed from topology {event.topology_id}"
+            "Server %s removed from topology %s", event.server_address, event.topology_id
         )
 
 
@@ -256,20 +306,20 @@ class TestHeartbeatLogger:
     def test_started(self, patch_logging, event):
         self.logger.started(event=event)
 
-        patch_logging.assert_called_once_with(f"Heartbeat sent to server {event.connection_id}")
+        patch_logging.assert_called_once_with("Heartbeat sent to server %s", event.connection_id)
 
     def test_succeeded(self, patch_logging, event):
         self.logger.succeeded(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Heartbeat to server {event.connection_id} succeeded with reply {event.reply.document}"
+            "Heartbeat to server %s succeeded with reply %s", event.connection_id, event.reply.document
         )
 
     def test_failed(self, patch_logging, event):
         self.logger.failed(event=event)
 
         patch_logging.assert_called_once_with(
-            f"Heartbeat to server {event.connection_id} failed with error {event.reply}"
+            "Heartbeat to server %s failed with error %s", event.connection_id, event.reply
         )
 
 
@@ -281,7 +331,7 @@ class TestTopologyLogger:
     def test_opened(self, patch_logging, event):
         self.logger.opened(event=event)
 
-        patch_logging.assert_called_once_with(f"Topology with id {event.topology_id} opened")
+        patch_logging.assert_called_once_with("Topology with id %s opened", event.topology_id)
 
     def test_description_changed(self, patch_logging, event):
         event.new_description.has_writable_server.return_value = False
@@ -290,10 +340,12 @@ class TestTopologyLogger:
 
         patch_logging.assert_has_calls(
             calls=[
-                unittest.mock.call(f"Topology description updated for topology id {event.topology_id}"),
+                unittest.mock.call("Topology description updated for topology id %s", event.topology_id),
                 unittest.mock.call(
-                    f"Topology {event.topology_id} changed type from {event.previous_description.topology_type_name} "
-                    f"to {event.new_description.topology_type_name}"
+                    "Topology %s changed type from %s to %s",
+                    event.topology_id,
+                    event.previous_description.topology_type_name,
+                    event.new_description.topology_type_name,
                 ),
                 unittest.mock.call("No writable servers available."),
                 unittest.mock.call("No readable servers available."),
@@ -306,12 +358,12 @@ class TestTopologyLogger:
         event.new_description.topology_type = mock_topology_type
         self.logger.description_changed(event=event)
 
-        patch_logging.assert_called_once_with(f"Topology description updated for topology id {event.topology_id}")
+        patch_logging.assert_called_once_with("Topology description updated for topology id %s", event.topology_id)
 
     def test_closed(self, patch_logging, event):
         self.logger.closed(event=event)
 
-        patch_logging.assert_called_once_with(f"Topology with id {event.topology_id} closed")
+        patch_logging.assert_called_once_with("Topology with id %s closed", event.topology_id)
 
 
 class TestDBHandler:
@@ -544,3 +596,351 @@ class TestDBHandler:
         assert index_order == created_index_son["key"][index_key]
         assert created_index_son["background"]
         assert not created_index_son["sparse"]
+
+
+class FakeTransactionSession:
+    def __init__(self, commit_errors: list[Exception] = None):
+        self.in_transaction = False
+        self.commit_errors = list(commit_errors or [])
+        self.transaction_options = []
+        self.commits = 0
+        self.aborts = 0
+
+    def start_transaction(self, **kwargs):
+        self.in_transaction = True
+        self.transaction_options.append(kwargs)
+
+    async def commit_transaction(self):
+        self.commits += 1
+        if self.commit_errors:
+            raise self.commit_errors.pop(0)
+        self.in_transaction = False
+
+    async def abort_transaction(self):
+        self.aborts += 1
+        self.in_transaction = False
+
+
+def _labeled_error(label: str, code: int = None) -> pymongo.errors.OperationFailure:
+    return pymongo.errors.OperationFailure(error=label, code=code, details={"errorLabels": [label]})
+
+
+class TestTransactions:
+    async def test_run_transaction_commit(self, db_manager):
+        session = FakeTransactionSession()
+        db_manager.transaction_metrics = fastapi_mongodb.db.TransactionMetrics()
+
+        async def callback(callback_session):
+            assert fastapi_mongodb.db.get_current_session() is callback_session
+            return "result"
+
+        result = await db_manager.run_transaction(callback, session=session, profile="snapshot")
+
+        assert "result" == result
+        assert fastapi_mongodb.db.get_current_session() is None
+        assert "snapshot" == session.transaction_options[0]["read_concern"].level
+        assert (1, 1, 0, 0) == (
+            db_manager.transaction_metrics.started,
+            db_manager.transaction_metrics.committed,
+            db_manager.transaction_metrics.aborted,
+            db_manager.transaction_metrics.retries,
+        )
+
+    async def test_run_transaction_transient_error_retry(self, db_manager):
+        session = FakeTransactionSession()
+        db_manager.transaction_metrics = fastapi_mongodb.db.TransactionMetrics()
+        callback = unittest.mock.AsyncMock(side_effect=[_labeled_error("TransientTransactionError"), "result"])
+
+        result = await db_manager.run_transaction(callback, session=session, backoff_base=0)
+
+        assert "result" == result
+        assert 2 == callback.await_count
+        assert 1 == session.aborts
+        assert (2, 1, 1, 1) == (
+            db_manager.transaction_metrics.started,
+            db_manager.transaction_metrics.committed,
+            db_manager.transaction_metrics.aborted,
+            db_manager.transaction_metrics.retries,
+        )
+
+    async def test_run_transaction_unknown_commit_result_retry(self, db_manager):
+        session = FakeTransactionSession(commit_errors=[_labeled_error("UnknownTransactionCommitResult")] * 2)
+        db_manager.transaction_metrics = fastapi_mongodb.db.TransactionMetrics()
+        callback = unittest.mock.AsyncMock(return_value="result")
+
+        result = await db_manager.run_transaction(callback, session=session, backoff_base=0)
+
+        assert "result" == result
+        assert 1 == callback.await_count
+        assert 3 == session.commits
+        assert 2 == db_manager.transaction_metrics.commit_retries
+
+    async def test_run_transaction_time_budget(self, db_manager):
+        session = FakeTransactionSession()
+        db_manager.transaction_metrics = fastapi_mongodb.db.TransactionMetrics()
+        callback = unittest.mock.AsyncMock(side_effect=_labeled_error("TransientTransactionError"))
+
+        with pytest.raises(pymongo.errors.OperationFailure):
+            await db_manager.run_transaction(callback, session=session, max_time=0.05, backoff_base=0.01)
+
+        assert callback.await_count > 1
+        assert 1 == db_manager.transaction_metrics.failed
+
+    async def test_run_transaction_not_retryable_error(self, db_manager):
+        session = FakeTransactionSession()
+        callback = unittest.mock.AsyncMock(side_effect=ValueError("test"))
+
+        with pytest.raises(ValueError):
+            await db_manager.run_transaction(callback, session=session)
+
+        assert 1 == callback.await_count
+        assert 1 == session.aborts
+
+    async def test_run_transaction_nested(self, db_manager):
+        session = FakeTransactionSession()
+
+        async def inner(inner_session):
+            assert inner_session is session
+            return "inner"
+
+        async def outer(outer_session):
+            return await db_manager.run_transaction(inner)
+
+        assert "inner" == await db_manager.run_transaction(outer, session=session)
+        assert 1 == len(session.transaction_options)
+
+    async def test_transactional_repository_session(self, db_manager, repository, faker):
+        document = {"_id": bson.ObjectId(), faker.pystr(): faker.pystr()}
+
+        @db_manager.transactional()
+        async def create_and_fail():
+            await repository.insert_one(document=document)
+            assert await repository.find_one(query={"_id": document["_id"]}) == document
+            raise ValueError("rollback")
+
+        with pytest.raises(ValueError):
+            await create_and_fail()
+
+        assert await repository.find_one(query={"_id": document["_id"]}) is None
+
+
+class TestLazyDBSession:
+    @pytest.fixture()
+    def fake_db_manager(self):
+        session = unittest.mock.MagicMock(in_transaction=False)
+        session.__aenter__ = unittest.mock.AsyncMock(return_value=session)
+        session.__aexit__ = unittest.mock.AsyncMock(return_value=None)
+        db_manager = unittest.mock.MagicMock()
+        db_manager.retrieve_client.return_value.start_session = unittest.mock.AsyncMock(return_value=session)
+        return db_manager
+
+    async def test_lazy_start(self, fake_db_manager):
+        lazy_session = fastapi_mongodb.db.LazyDBSession(db_manager=fake_db_manager, snapshot=True)
+        start_session = fake_db_manager.retrieve_client.return_value.start_session
+
+        assert lazy_session.started is False
+        assert lazy_session.in_transaction is False
+        with pytest.raises(AttributeError):
+            _ = lazy_session.session_id
+        start_session.assert_not_awaited()
+
+        session = await lazy_session
+
+        assert session is await lazy_session.get()
+        assert session.session_id == lazy_session.session_id
+        start_session.assert_awaited_once_with(snapshot=True)
+
+    async def test_end(self, fake_db_manager):
+        lazy_session = fastapi_mongodb.db.LazyDBSession(db_manager=fake_db_manager)
+        session = await lazy_session
+
+        await lazy_session.end()
+
+        session.__aexit__.assert_awaited_once()
+        assert lazy_session.ended is True
+        with pytest.raises(RuntimeError):
+            await lazy_session
+
+    async def test_end_not_started(self, fake_db_manager):
+        lazy_session = fastapi_mongodb.db.LazyDBSession(db_manager=fake_db_manager)
+
+        await lazy_session.end()
+
+        fake_db_manager.retrieve_client.assert_not_called()
+
+
+class TestReadRouter:
+    @staticmethod
+    def _session_factory(*, causal_consistency: bool = True, in_transaction: bool = False):
+        session = unittest.mock.MagicMock(in_transaction=in_transaction)
+        session.options.causal_consistency = causal_consistency
+        return session
+
+    def test_outside_of_request(self):
+        router = fastapi_mongodb.db.ReadRouter()
+
+        router.record_write()
+
+        assert router.read_preference() is None
+        assert router.is_pinned() is False
+
+    @pytest.mark.parametrize(
+        argnames=["method", "expected_safe"],
+        argvalues=[("GET", True), ("head", True), ("OPTIONS", True), ("POST", False), ("DELETE", False)],
+    )
+    def test_request_method(self, method, expected_safe):
+        router = fastapi_mongodb.db.ReadRouter()
+        expected = router.safe_read_preference if expected_safe else pymongo.ReadPreference.PRIMARY
+
+        with router.route_request(method=method):
+            assert expected == router.read_preference()
+        assert router.read_preference() is None
+
+    def test_pin_after_write(self):
+        router = fastapi_mongodb.db.ReadRouter()
+
+        with router.route_request(method="GET"):
+            router.record_write()
+
+            assert router.is_pinned() is True
+            assert pymongo.ReadPreference.PRIMARY == router.read_preference()
+
+    def test_client_pinned_across_requests(self, patcher):
+        router = fastapi_mongodb.db.ReadRouter(pin_window=5)
+        monotonic = patcher.patch_attr(target=fastapi_mongodb.db.time, attribute="monotonic", return_value=100.0)
+
+        with router.route_request(method="POST", client_key="client"):
+            router.record_write()
+        with router.route_request(method="GET", client_key="client"):
+            assert pymongo.ReadPreference.PRIMARY == router.read_preference()
+        with router.route_request(method="GET", client_key="other"):
+            assert router.safe_read_preference == router.read_preference()
+
+        monotonic.return_value = 106.0
+        with router.route_request(method="GET", client_key="client"):
+            assert router.safe_read_preference == router.read_preference()
+
+    def test_max_clients(self):
+        router = fastapi_mongodb.db.ReadRouter(max_clients=1)
+
+        for client_key in ("first", "second"):
+            with router.route_request(method="POST", client_key=client_key):
+                router.record_write()
+
+        with router.route_request(method="GET", client_key="first"):
+            assert router.is_pinned() is False
+        with router.route_request(method="GET", client_key="second"):
+            assert router.is_pinned() is True
+
+    def test_transaction_session(self):
+        router = fastapi_mongodb.db.ReadRouter()
+
+        with router.route_request(method="POST"):
+            assert router.read_preference(session=self._session_factory(in_transaction=True)) is None
+
+    def test_causal_session(self):
+        router = fastapi_mongodb.db.ReadRouter()
+        session = self._session_factory()
+
+        with router.route_request(method="GET"):
+            router.record_write(session=session)
+
+            assert router.safe_read_preference == router.read_preference(session=session)
+            assert pymongo.ReadPreference.PRIMARY == router.read_preference(session=self._session_factory())
+            assert pymongo.ReadPreference.PRIMARY == router.read_preference()
+
+    def test_not_causal_session(self):
+        router = fastapi_mongodb.db.ReadRouter()
+        session = self._session_factory(causal_consistency=False)
+
+        with router.route_request(method="GET"):
+            router.record_write(session=session)
+
+            assert pymongo.ReadPreference.PRIMARY == router.read_preference(session=session)
+
+
+class TestRequestStatsListener:
+    @staticmethod
+    def _events_factory(*, command: dict, duration_micros: int = 1500) -> tuple[unittest.mock.MagicMock, ...]:
+        command_name = next(iter(command))
+        started = unittest.mock.MagicMock(command_name=command_name, database_name="test_db", command=command)
+        succeeded = unittest.mock.MagicMock(duration_micros=duration_micros, reply={"ok": 1.0})
+        return started, succeeded
+
+    @pytest.mark.parametrize(
+        argnames=["query", "expected"],
+        argvalues=[
+            (None, "?"),
+            ({"_id": bson.ObjectId()}, "{_id: ?}"),
+            ({"status": {"$in": [1, 2, 3]}, "user": {"name": "test"}}, "{status: {$in: [?]}, user: {name: ?}}"),
+            ([{"$match": {"a": 1}}, {"$limit": 1}], "[{$match: {a: ?}}, {$limit: ?}]"),
+        ],
+    )
+    def test_query_shape(self, query, expected):
+        assert expected == fastapi_mongodb.db._query_shape(query)
+
+    def test_command_shape(self):
+        assert "{number: ?}" == fastapi_mongodb.db.get_command_shape(
+            command_name="find", command={"find": "test_col", "filter": {"number": 1}}
+        )
+        assert fastapi_mongodb.db.get_command_shape(command_name="insert", command={"insert": "test_col"}) is None
+
+    def test_not_tracked(self):
+        listener = fastapi_mongodb.db.RequestStatsListener()
+        started, succeeded = self._events_factory(command={"find": "test_col", "filter": {}})
+
+        listener.started(event=started)
+        listener.succeeded(event=succeeded)
+
+        assert fastapi_mongodb.db.get_request_db_stats() is None
+
+    def test_totals(self):
+        listener = fastapi_mongodb.db.RequestStatsListener()
+        started, succeeded = self._events_factory(command={"find": "test_col", "filter": {"_id": 1}})
+
+        with fastapi_mongodb.db.track_request_db_stats() as stats:
+            assert stats is fastapi_mongodb.db.get_request_db_stats()
+            listener.started(event=started)
+            listener.succeeded(event=succeeded)
+            listener.started(event=started)
+            listener.failed(event=succeeded)
+
+        assert 2 == stats.commands
+        assert 1 == stats.failed
+        assert 0.003 == stats.db_time
+        assert 2 * len(bson.encode(started.command)) == stats.request_bytes
+        assert len(bson.encode(succeeded.reply)) == stats.reply_bytes
+        assert stats.server_timing().startswith('db;dur=3.000;desc="2 commands, ')
+        assert fastapi_mongodb.db.get_request_db_stats() is None
+
+    def test_without_bytes(self):
+        listener = fastapi_mongodb.db.RequestStatsListener(measure_bytes=False)
+        started, succeeded = self._events_factory(command={"insert": "test_col", "documents": [{"a": 1}]})
+
+        with fastapi_mongodb.db.track_request_db_stats() as stats:
+            listener.started(event=started)
+            listener.succeeded(event=succeeded)
+
+        assert 0 == stats.request_bytes == stats.reply_bytes
+
+    def test_repeated_queries(self):
+        listener = fastapi_mongodb.db.RequestStatsListener()
+
+        with fastapi_mongodb.db.track_request_db_stats() as stats:
+            for number in range(5):
+                fastapi_mongodb.db._mark_call_site()
+                started, succeeded = self._events_factory(command={"find": "test_col", "filter": {"number": number}})
+                listener.started(event=started)
+                listener.succeeded(event=succeeded)
+            started, succeeded = self._events_factory(command={"getMore": 1, "collection": "test_col"})
+            listener.started(event=started)
+            listener.succeeded(event=succeeded)
+
+        assert 6 == stats.commands
+        assert [] == stats.repeated_queries(threshold=6)
+        [query] = stats.repeated_queries(threshold=5)
+        assert {"command": "find", "namespace": "test_db.test_col", "shape": "{number: ?}", "count": 5} == {
+            key: value for key, value in query.items() if key != "call_sites"
+        }
+        [call_site] = query["call_sites"]
+        assert call_site.startswith(__file__) and call_site.endswith("in test_repeated_queries")
@@ -0,0 +1,74 @@
+import unittest.mock
+
+import fastapi
+import pytest
+from fastapi.testclient import TestClient
+
+import fastapi_mongodb.db
+from fastapi_mongodb.dependencies import DBSession
+
+
+@pytest.fixture()
+def fake_db_manager():
+    session = unittest.mock.MagicMock()
+    session.__aenter__ = unittest.mock.AsyncMock(return_value=session)
+    session.__aexit__ = unittest.mock.AsyncMock(return_value=None)
+    db_manager = unittest.mock.MagicMock()
+    db_manager.retrieve_client.return_value.start_session = unittest.mock.AsyncMock(return_value=session)
+    return db_manager
+
+
+class TestDBSession:
+    def _create_app(self, dependency: DBSession) -> fastapi.FastAPI:
+        app = fastapi.FastAPI()
+
+        @app.get("/")
+        async def endpoint(use_db: bool = False, db_session=fastapi.Depends(dependency)):
+            if use_db:
+                await db_session
+            return {"type": db_session.__class__.__name__}
+
+        return app
+
+    def test_lazy(self, fake_db_manager):
+        dependency = DBSession(db_manager=fake_db_manager)
+
+        with TestClient(app=self._create_app(dependency=dependency)) as client:
+            response = client.get("/")
+            client.get("/", params={"use_db": True})
+
+        assert {"type": fastapi_mongodb.db.LazyDBSession.__name__} == response.json()
+        assert {"requests_served": 2, "sessions_created": 1} == dependency.stats
+        fake_db_manager.retrieve_client.return_value.start_session.assert_awaited_once_with(snapshot=False)
+
+    def test_eager(self, fake_db_manager):
+        dependency = DBSession(db_manager=fake_db_manager, lazy=False, causal_consistency=False)
+        session = fake_db_manager.retrieve_client.return_value.start_session.return_value
+
+        with TestClient(app=self._create_app(dependency=dependency)) as client:
+            client.get("/")
+
+        assert {"requests_served": 1, "sessions_created": 1} == dependency.stats
+        fake_db_manager.retrieve_client.return_value.start_session.assert_awaited_once_with(
+            snapshot=False, causal_consistency=False
+        )
+        session.__aexit__.assert_awaited_once()
+
+    def test_app_state_db_manager(self, fake_db_manager):
+        dependency = DBSession(snapshot=True)
+        app = self._create_app(dependency=dependency)
+        app.state.db_manager = fake_db_manager
+
+        with TestClient(app=app) as client:
+            client.get("/", params={"use_db": True})
+
+        fake_db_manager.retrieve_client.return_value.start_session.assert_awaited_once_with(snapshot=True)
+
+    def test_no_db_manager(self):
+        with TestClient(app=self._create_app(dependency=DBSession())) as client:
+            with pytest.raises(NotImplementedError):
+                client.get("/")
+
+    def test_snapshot_causal_consistency(self):
+        with pytest.raises(ValueError):
+            DBSession(snapshot=True, causal_consistency=True)
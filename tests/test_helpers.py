@@ -1,7 +1,12 @@
+import asyncio
 import datetime
 import random
+import time
+import tracemalloc
 import zoneinfo
 
+import pytest
+
 import fastapi_mongodb.helpers
 from tests.conftest import Patcher
 
@@ -52,3 +57,284 @@ class TestBaseProfiler:
 
         with self.base_profiler:
             something_new()
+
+    def test_stats(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(show_memory=False)
+
+        @profiler
+        def something():
+            ...
+
+        for _ in range(3):
+            something()
+        with profiler:
+            pass
+
+        stats = profiler.stats
+        assert {"TestBaseProfiler.test_stats.<locals>.something", "CODE BLOCK"} == set(stats)
+        assert 3 == stats["TestBaseProfiler.test_stats.<locals>.something"]["count"]
+        assert 1 == stats["CODE BLOCK"]["count"]
+        profiler.reset()
+        assert {} == profiler.stats
+
+    def test_stats_percentiles(self):
+        stats = fastapi_mongodb.helpers.ProfileStats(max_samples=100)
+
+        for duration in range(1, 101):
+            stats.add(duration_ns=duration * 10**6)
+
+        assert {
+            "count": 100,
+            "mean": 0.0505,
+            "max": 0.1,
+            "p50": 0.05,
+            "p95": 0.095,
+            "p99": 0.099,
+            "max_memory": 0,
+        } == stats.as_dict()
+
+    def test_exception_is_measured(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(show_memory=False)
+
+        @profiler
+        def failing():
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            failing()
+
+        assert 1 == profiler.stats["TestBaseProfiler.test_exception_is_measured.<locals>.failing"]["count"]
+
+    @pytest.mark.asyncio
+    async def test_coroutine_function(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(show_memory=False)
+
+        @profiler
+        async def endpoint():
+            await asyncio.sleep(0.02)
+            return True
+
+        assert await endpoint() is True
+        assert 0.02 <= profiler.stats["TestBaseProfiler.test_coroutine_function.<locals>.endpoint"]["max"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_blocks(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(show_memory=False)
+
+        async def request(delay: float):
+            async with profiler:
+                await asyncio.sleep(delay)
+
+        await asyncio.gather(request(delay=0.05), request(delay=0.01))
+
+        stats = profiler.stats["CODE BLOCK"]
+        assert 2 == stats["count"]
+        assert 0.05 <= stats["max"] < 0.09
+        assert 0.01 <= stats["p50"] < 0.05  # shorter block isn't extended by overlapping one
+
+    def test_tracemalloc_shared(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler()
+
+        with profiler:
+            with profiler:
+                data = [object() for _ in range(1000)]
+            assert tracemalloc.is_tracing()  # outer block is still measured
+        del data
+
+        assert not tracemalloc.is_tracing()
+        assert profiler.stats["CODE BLOCK"]["max_memory"] > 0
+
+    def test_block_without_snapshot(self, patcher):
+        profiler = fastapi_mongodb.helpers.BaseProfiler()
+        end_trace_malloc = patcher.patch_attr(target=profiler, attribute="_end_trace_malloc")
+
+        with profiler.block(name="GET /items") as block:
+            data = [object() for _ in range(1000)]
+        with profiler:
+            pass
+
+        assert block.memory > 0
+        end_trace_malloc.assert_called_once_with()  # context manager only
+        del data
+
+    def test_tracemalloc_started_outside(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler()
+        tracemalloc.start()
+        try:
+            with profiler:
+                data = [object() for _ in range(1000)]
+
+            assert tracemalloc.is_tracing()
+            assert profiler.stats["CODE BLOCK"]["max_memory"] > 0
+            del data
+        finally:
+            tracemalloc.stop()
+
+    def test_sampling_mode(self, tmp_path):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(
+            show_memory=False, mode=fastapi_mongodb.helpers.PROFILER_MODES.SAMPLING, sample_interval=0.001
+        )
+
+        def busy():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        with profiler.block(name="GET /busy"):
+            busy()
+
+        stacks = profiler.collapsed_stacks(name="GET /busy")
+        assert any(stack.endswith(f"busy ({__file__}:{busy.__code__.co_firstlineno})") for stack in stacks)
+        paths = profiler.dump(directory=tmp_path)
+        assert [tmp_path / "GET_busy.collapsed"] == paths
+        stack, count = paths[0].read_text().splitlines()[0].rsplit(" ", maxsplit=1)
+        assert stacks[stack] == int(count)
+
+    def test_cprofile_mode(self, tmp_path):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(
+            show_memory=False, mode=fastapi_mongodb.helpers.PROFILER_MODES.CPROFILE
+        )
+
+        @profiler
+        def something():
+            with profiler:  # overlapping call in the same thread can't enable second profile
+                return sorted(range(10))
+
+        something()
+        something()
+
+        functions = [function for _, _, function in profiler.profile_stats(name=something.__qualname__).stats]
+        assert any("sorted" in function for function in functions)
+        assert profiler.profile_stats(name="CODE BLOCK") is None
+        assert 2 == profiler.stats["CODE BLOCK"]["count"]
+        paths = profiler.dump(directory=tmp_path)
+        assert [tmp_path / "TestBaseProfiler.test_cprofile_mode._locals_.something.pstats"] == paths
+
+    @pytest.mark.asyncio
+    async def test_cprofile_concurrent_blocks(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(
+            show_memory=False, mode=fastapi_mongodb.helpers.PROFILER_MODES.CPROFILE
+        )
+
+        async def request(name: str, delay: float) -> fastapi_mongodb.helpers.ProfiledBlock:
+            with profiler.block(name=name) as block:
+                await asyncio.sleep(delay)
+            return block
+
+        overlapped = await asyncio.gather(request(name="first", delay=0.02), request(name="second", delay=0.01))
+        alone = await request(name="alone", delay=0)
+
+        # profile of the first block would include the second one, the second one can't enable own profile
+        assert [False, False, True] == [block.profiled for block in (*overlapped, alone)]
+        assert (None, None) == (profiler.profile_stats(name="first"), profiler.profile_stats(name="second"))
+        assert profiler.profile_stats(name="alone") is not None
+        assert 1 == profiler.stats["first"]["count"]
+
+    @pytest.mark.asyncio
+    async def test_sampling_block_started_during_other(self):
+        profiler = fastapi_mongodb.helpers.BaseProfiler(
+            show_memory=False, mode=fastapi_mongodb.helpers.PROFILER_MODES.SAMPLING, sample_interval=0.001
+        )
+
+        async def request(name: str, start: float, delay: float) -> fastapi_mongodb.helpers.ProfiledBlock:
+            await asyncio.sleep(start)
+            with profiler.block(name=name) as block:
+                await asyncio.sleep(delay)
+            return block
+
+        # "long" starts during "first" and is still running, when "last" starts after "first" has ended
+        blocks = await asyncio.gather(
+            request(name="first", start=0, delay=0.01),
+            request(name="long", start=0.005, delay=0.04),
+            request(name="last", start=0.02, delay=0.01),
+        )
+
+        assert [False, False, False] == [block.profiled for block in blocks]
+        assert {} == profiler.collapsed_stacks(name="last")
+
+
+class TestAllocationTracker:
+    @staticmethod
+    def _tracker_factory(**kwargs) -> fastapi_mongodb.helpers.AllocationTracker:
+        return fastapi_mongodb.helpers.AllocationTracker(**{"include_files": [__file__], "every_calls": 2} | kwargs)
+
+    def test_growing_sites(self):
+        tracker = self._tracker_factory(retention=3)
+        profiler = fastapi_mongodb.helpers.BaseProfiler(show_memory=False, allocation_tracker=tracker)
+        cache = []
+
+        @profiler
+        def leaking():
+            cache.append(bytearray(4096))
+
+        @profiler
+        def stable():
+            return [bytearray(4096) for _ in range(10)]
+
+        try:
+            for _ in range(10):
+                leaking()
+                stable()
+
+            sites = tracker.growing()
+            assert 3 == tracker.snapshots_count
+            assert [f"{__file__}:{leaking.__wrapped__.__code__.co_firstlineno + 2}"] == [
+                site["traceback"][-1] for site in sites
+            ]
+            assert 2 * 4096 <= sites[0]["growth"]
+        finally:
+            tracker.stop()
+        assert not tracemalloc.is_tracing()
+
+    def test_diff(self):
+        tracker = self._tracker_factory()
+        tracker.take_snapshot()
+        data = [bytearray(10000) for _ in range(3)]
+        tracker.take_snapshot()
+        tracker.stop()
+
+        assert [] == tracker.diff()  # snapshots are dropped on stop
+
+        tracker.take_snapshot()
+        extra = bytearray(20000)
+        tracker.take_snapshot()
+        change = tracker.diff(limit=1)[0]
+        tracker.stop()
+
+        assert 20000 <= change["size_diff"]
+        assert 0 < change["count_diff"]  # object and its buffer
+        del data, extra
+
+    def test_report(self, patcher):
+        warning = patcher.patch_attr(target=fastapi_mongodb.helpers.simple_logger, attribute="warning")
+        tracker = self._tracker_factory(min_growth=0)
+        data = []
+
+        try:
+            for _ in range(3):
+                data.append(bytearray(2048))
+                tracker.take_snapshot()
+            tracker.report()
+        finally:
+            tracker.stop()
+
+        assert warning.call_args.kwargs["msg"].startswith("Possible memory leak: +")
+
+    def test_interval(self, patcher):
+        monotonic = patcher.patch_obj(target="fastapi_mongodb.helpers.time.monotonic", return_value=100)
+        tracker = self._tracker_factory(every_calls=None, interval=10)
+
+        try:
+            tracker.tick()
+            tracker.tick()
+            monotonic.return_value = 110
+            tracker.tick()
+        finally:
+            snapshots_count = tracker.snapshots_count
+            tracker.stop()
+
+        assert 2 == snapshots_count
+
+    def test_schedule_required(self):
+        with pytest.raises(ValueError):
+            fastapi_mongodb.helpers.AllocationTracker()
@@ -1,4 +1,9 @@
-from fastapi_mongodb.logging import logger
+import contextvars
+import json
+import logging
+import sys
+
+from fastapi_mongodb.logging import BackgroundQueueHandler, ContextFilter, JSONFormatter, logger, setup_logging
 
 
 def test_logging():
@@ -9,3 +14,98 @@ def test_logging():
     logger.warning(msg="WARNING MESSAGE")
     logger.error(msg="ERROR MESSAGE")
     logger.critical(msg="CRITICAL MESSAGE")
+
+
+def test_queue_logging(capsys):
+    queue_logger = setup_logging(
+        name="Queue Logger", file_link_formatter=False, color_formatter=False, raw_format="{message}", queue_size=100
+    )
+    [handler] = queue_logger.handlers
+
+    for number in range(10):
+        queue_logger.info(msg=f"QUEUE MESSAGE {number}")
+    handler.flush()
+
+    assert [f"QUEUE MESSAGE {number}" for number in range(10)] == capsys.readouterr().err.splitlines()
+    assert 0 == handler.dropped
+
+
+def test_queue_logging_overflow(capsys):
+    stream_handler = logging.StreamHandler()
+    handler = BackgroundQueueHandler(stream_handler, queue_size=2)
+    handler.listener.stop()  # nobody takes records from queue
+    queue_logger = logging.getLogger(name="Overflow Logger")
+    queue_logger.propagate = False
+    queue_logger.addHandler(hdlr=handler)
+    try:
+        for number in range(5):
+            queue_logger.warning(msg=f"OVERFLOW MESSAGE {number}")
+        handler.listener.start()
+        handler.close()
+    finally:
+        queue_logger.removeHandler(hdlr=handler)
+
+    assert 3 == handler.dropped
+    assert 2 == capsys.readouterr().err.count("OVERFLOW MESSAGE")
+
+
+class TestJSONFormatter:
+    @staticmethod
+    def make_record(msg: str = "message %s", args: tuple = ("value",), **extra) -> logging.LogRecord:
+        record = logging.LogRecord(
+            name="test", level=logging.WARNING, pathname=__file__, lineno=1, msg=msg, args=args, exc_info=None
+        )
+        record.created, record.msecs = 1630497600.123, 123.0
+        record.__dict__.update(extra)
+        return record
+
+    def test_default_fields(self):
+        formatter = JSONFormatter()
+
+        result = json.loads(formatter.format(record=self.make_record(request_id="not configured")))
+
+        assert {
+            "time": "2021-09-01T12:00:00.123Z",
+            "level": "warning",
+            "logger": "test",
+            "message": "message value",
+        } == result
+
+    def test_custom_fields(self):
+        formatter = JSONFormatter(
+            fields=("level", "message", "lineno"), extra_fields=("request_id", "user_id"), rename={"level": "severity"}
+        )
+
+        result = json.loads(formatter.format(record=self.make_record(request_id="abc")))
+
+        assert {"severity": "warning", "message": "message value", "lineno": 1, "request_id": "abc"} == result
+
+    def test_exception(self):
+        formatter = JSONFormatter(fields=("message",))
+        try:
+            raise ValueError("test error")
+        except ValueError:
+            record = self.make_record()
+            record.exc_info = sys.exc_info()
+
+        result = json.loads(formatter.format(record=record))
+
+        assert result["exception"].startswith("Traceback") and "ValueError: test error" in result["exception"]
+
+    def test_context_filter(self):
+        request_id = contextvars.ContextVar("request_id", default=None)
+        request_id.set("abc")
+        record = self.make_record()
+
+        assert ContextFilter(request_id=request_id.get).filter(record=record) is True
+        assert "abc" == record.request_id
+
+
+def test_json_logging(capsys):
+    json_logger = setup_logging(name="JSON Logger", json_formatter=True)
+
+    json_logger.info(msg="JSON MESSAGE")
+
+    assert {"level": "info", "logger": "JSON Logger", "message": "JSON MESSAGE"}.items() <= json.loads(
+        capsys.readouterr().err
+    ).items()
@@ -1,5 +1,15 @@
+import base64
+import binascii
 import datetime
-
+import hashlib
+import itertools
+import json
+import os
+import secrets
+import time
+
+import jwt
+import jwt.algorithms
 import pytest
 
 import fastapi_mongodb.exceptions
@@ -7,25 +17,51 @@ import fastapi_mongodb.helpers
 import fastapi_mongodb.managers
 import fastapi_mongodb.schemas
 
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+except ImportError:  # asymmetric algorithms are optional
+    serialization = None
+
+requires_cryptography = pytest.mark.skipif(serialization is None, reason="'cryptography' package isn't installed")
+
 
 class TestPasswordsHandler:
-    def _manager_factory(self, algorithm: fastapi_mongodb.managers.PASSWORD_ALGORITHMS):
-        return fastapi_mongodb.managers.PasswordsManager(algorithm=algorithm, iterations=1)
+    def _manager_factory(self, algorithm: fastapi_mongodb.managers.PASSWORD_ALGORITHMS, **kwargs):
+        return fastapi_mongodb.managers.PasswordsManager(
+            algorithm=algorithm, **{"iterations": 1, "scrypt_n": 2**4} | kwargs
+        )
+
+    @staticmethod
+    def _legacy_hash(*, algorithm: fastapi_mongodb.managers.PASSWORD_ALGORITHMS, password: str, iterations: int):
+        """Hash in format before parameters were stored ('<hex salt><hex hash>')."""
+        salt = hashlib.new(algorithm.value, secrets.token_bytes(nbytes=64)).hexdigest()
+        password_hash = hashlib.pbkdf2_hmac(
+            hash_name=algorithm.value, password=password.encode(), salt=salt.encode(), iterations=iterations
+        )
+        return salt + binascii.hexlify(password_hash).decode()
 
     @pytest.mark.parametrize(
-        argnames=["algorithm", "faker"],
-        argvalues=[(algorithm, "faker") for algorithm in fastapi_mongodb.managers.PASSWORD_ALGORITHMS],
+        argnames=["algorithm", "expected_prefix", "faker"],
+        argvalues=[
+            (fastapi_mongodb.managers.PASSWORD_ALGORITHMS.SHA256, "$pbkdf2-sha256$i=1$", "faker"),
+            (fastapi_mongodb.managers.PASSWORD_ALGORITHMS.SHA384, "$pbkdf2-sha384$i=1$", "faker"),
+            (fastapi_mongodb.managers.PASSWORD_ALGORITHMS.SHA512, "$pbkdf2-sha512$i=1$", "faker"),
+            (fastapi_mongodb.managers.PASSWORD_ALGORITHMS.SCRYPT, "$scrypt$n=16,r=8,p=1$", "faker"),
+        ],
         indirect=["faker"],
     )
-    def test_make_password(self, algorithm: fastapi_mongodb.managers.PASSWORD_ALGORITHMS, faker):
+    def test_make_password(self, algorithm: fastapi_mongodb.managers.PASSWORD_ALGORITHMS, expected_prefix, faker):
         fake_password = faker.pystr()
-        hash_length = fastapi_mongodb.managers.ALGORITHMS_LENGTH_MAP[algorithm] * 2  # SALT + HASH
         manager = self._manager_factory(algorithm=algorithm)
 
         password_hash = manager.make_password(password=fake_password)
 
-        assert len(password_hash) == hash_length
         assert isinstance(password_hash, str)
+        assert password_hash.startswith(expected_prefix)
+        salt, digest = password_hash.removeprefix(expected_prefix).split("$")
+        assert 16 == len(base64.b64decode(salt + "=" * (-len(salt) % 4)))
+        assert password_hash != manager.make_password(password=fake_password)
 
     @pytest.mark.parametrize(
         argnames=["algorithm", "faker"],
@@ -44,6 +80,82 @@ class TestPasswordsHandler:
         assert manager.check_password(password=fake_password, password_hash=fake_password_hash_2) is False
         assert manager.check_password(password=fake_password_2, password_hash=fake_password_hash) is False
 
+    def test_check_password_after_parameters_change(self, faker):
+        fake_password = faker.pystr()
+        password_hash = self._manager_factory(algorithm="sha256").make_password(password=fake_password)
+        manager = self._manager_factory(algorithm="scrypt", iterations=2)
+
+        assert manager.check_password(password=fake_password, password_hash=password_hash) is True
+        assert manager.needs_rehash(password_hash=password_hash) is True
+
+    @pytest.mark.parametrize(
+        argnames=["algorithm", "faker"],
+        argvalues=[(algorithm, "faker") for algorithm in fastapi_mongodb.managers.ALGORITHMS_LENGTH_MAP],
+        indirect=["faker"],
+    )
+    def test_check_legacy_password(self, algorithm: fastapi_mongodb.managers.PASSWORD_ALGORITHMS, faker):
+        fake_password = faker.pystr()
+        manager = self._manager_factory(algorithm=fastapi_mongodb.managers.PASSWORD_ALGORITHMS.SHA512, iterations=3)
+        legacy_hash = self._legacy_hash(algorithm=algorithm, password=fake_password, iterations=3)
+
+        assert manager.check_password(password=fake_password, password_hash=legacy_hash) is True
+        assert manager.check_password(password=faker.pystr(), password_hash=legacy_hash) is False
+        assert manager.needs_rehash(password_hash=legacy_hash) is True
+
+    @pytest.mark.parametrize(
+        argnames=["kwargs", "expected"],
+        argvalues=[
+            ({}, False),
+            ({"iterations": 2}, True),
+            ({"algorithm": "sha384"}, True),
+            ({"salt_size": 32}, True),
+            ({"scrypt_n": 2**5}, False),  # other algorithm parameters
+        ],
+    )
+    def test_needs_rehash(self, kwargs, expected):
+        password_hash = self._manager_factory(algorithm="sha512").make_password(password="password")
+        manager = self._manager_factory(**{"algorithm": "sha512"} | kwargs)
+
+        assert expected is manager.needs_rehash(password_hash=password_hash)
+
+    @pytest.mark.parametrize(
+        argnames=["password_hash"],
+        argvalues=[
+            ("$pbkdf2-md5$i=1$c2FsdA$aGFzaA",),
+            ("$scrypt$n=x$c2FsdA$aGFzaA",),
+            ("$scrypt$i=1$c2FsdA$aGFzaA",),  # known scheme with parameters of other one
+            ("$pbkdf2-sha512$n=2,r=8,p=1$c2FsdA$aGFzaA",),
+            ("$sha512$i=1",),
+            ("short",),
+        ],
+    )
+    def test_unknown_format(self, password_hash):
+        manager = self._manager_factory(algorithm="sha512")
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            manager.check_password(password="password", password_hash=password_hash)
+
+        assert "Unknown password hash format." == str(exception_context.value)
+
+    def test_calibrate_pbkdf2(self, patcher):
+        # every hash takes 0.01 seconds
+        patcher.patch_obj(target="fastapi_mongodb.managers.time.perf_counter", side_effect=itertools.count(step=0.01))
+
+        manager = fastapi_mongodb.managers.PasswordsManager.calibrate(algorithm="sha256", target_time=0.25)
+
+        assert 250000 == manager.iterations
+
+    def test_calibrate_scrypt(self, patcher):
+        # hash with n = 2 ** 10 takes 0.01 seconds, time grows linearly with n
+        patcher.patch_obj(
+            target="fastapi_mongodb.managers.PasswordsManager._measure",
+            side_effect=lambda manager: 0.01 * manager.scrypt_n / 2**10,
+        )
+
+        manager = fastapi_mongodb.managers.PasswordsManager.calibrate(algorithm="scrypt", target_time=0.1)
+
+        assert 2**13 == manager.scrypt_n  # 0.08 seconds, the next power of 2 exceeds target
+
 
 class TestTokensManager:
     class MockPayload(fastapi_mongodb.schemas.BaseSchema):
@@ -60,6 +172,10 @@ class TestTokensManager:
         list_key: list
         dict_key: dict
 
+    class MockPayloadIssuer(fastapi_mongodb.schemas.BaseSchema):
+        iss: str
+        exp: datetime.datetime
+
     def test_data(self, faker):
         return {
             "int_key": faker.pyint(),
@@ -83,7 +199,8 @@ class TestTokensManager:
         return ["aud", "exp", "iat", "iss", "nbf"]
 
     @pytest.mark.parametrize(
-        argnames=["algorithm"], argvalues=[(algorithm,) for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS]
+        argnames=["algorithm"],
+        argvalues=[(algorithm,) for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
     )
     def test_create_read_code_default(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS):
         manager = self._manager_factory(algorithm=algorithm)
@@ -97,7 +214,7 @@ class TestTokensManager:
 
     @pytest.mark.parametrize(
         argnames=["algorithm", "faker"],
-        argvalues=[(algorithm, "faker") for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm, "faker") for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
         indirect=["faker"],
     )
     def test_create_read_code_custom(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS, faker):
@@ -118,9 +235,54 @@ class TestTokensManager:
         assert isinstance(parsed, self.MockPayload)
         assert test_data == parsed.dict(include={key for key in test_data.keys()})
 
+    @pytest.mark.parametrize(
+        argnames=["algorithm", "faker"],
+        argvalues=[(algorithm, "faker") for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
+        indirect=["faker"],
+    )
+    def test_create_code_as_pyjwt(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS, faker):
+        now = fastapi_mongodb.helpers.utc_now()
+        test_data = self.test_data(faker=faker)
+        manager = self._manager_factory(algorithm=algorithm)
+
+        code = manager.create_code(data=test_data, iat=now, exp=now, nbf=now)
+
+        expected_code = jwt.encode(
+            payload=test_data | {"iat": now, "aud": "access", "exp": now, "nbf": now, "iss": ""},
+            key="TEST",
+            algorithm=algorithm,
+        )
+        assert expected_code == code
+        assert "iat" not in test_data
+
+    def test_header_segment_with_kid_as_pyjwt(self):
+        expected_header = jwt.encode(payload={}, key="TEST", algorithm="HS256", headers={"kid": "key-1"}).split(".")[0]
+
+        header = fastapi_mongodb.managers._header_segment(algorithm="HS256", kid="key-1")
+
+        assert expected_header == header.decode()
+
+    @pytest.mark.parametrize(
+        argnames=["algorithm", "faker"],
+        argvalues=[(algorithm, "faker") for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
+        indirect=["faker"],
+    )
+    def test_create_codes(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS, faker):
+        data = [self.test_data(faker=faker) for _ in range(3)] + [{}]
+        manager = self._manager_factory(algorithm=algorithm)
+
+        codes = manager.create_codes(data=data, aud="batch")
+
+        assert len(data) == len(codes)
+        parsed = [manager.read_code(code=code, aud="batch") for code in codes]
+        assert data == [
+            {key: value for key, value in item.items() if key in data_item} for item, data_item in zip(parsed, data)
+        ]
+        assert 1 == len({(item["iat"], item["exp"], item["nbf"]) for item in parsed})
+
     @pytest.mark.parametrize(
         argnames=["algorithm"],
-        argvalues=[(algorithm,) for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm,) for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
     )
     def test_read_code_exception_exp(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS):
         manager = self._manager_factory(algorithm=algorithm)
@@ -133,7 +295,7 @@ class TestTokensManager:
 
     @pytest.mark.parametrize(
         argnames=["algorithm"],
-        argvalues=[(algorithm,) for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm,) for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
     )
     def test_read_code_exception_nbf(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS):
         manager = self._manager_factory(algorithm=algorithm)
@@ -146,7 +308,7 @@ class TestTokensManager:
 
     @pytest.mark.parametrize(
         argnames=["algorithm"],
-        argvalues=[(algorithm,) for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm,) for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
     )
     def test_read_code_exception_leeway(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS):
         manager = self._manager_factory(algorithm=algorithm)
@@ -161,7 +323,7 @@ class TestTokensManager:
 
     @pytest.mark.parametrize(
         argnames=["algorithm"],
-        argvalues=[(algorithm,) for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm,) for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
     )
     def test_read_code_exception_aud(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS):
         manager = self._manager_factory(algorithm=algorithm)
@@ -174,7 +336,7 @@ class TestTokensManager:
 
     @pytest.mark.parametrize(
         argnames=["algorithm"],
-        argvalues=[(algorithm,) for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm,) for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
     )
     def test_read_code_exception_iss(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS):
         manager = self._manager_factory(algorithm=algorithm)
@@ -187,7 +349,7 @@ class TestTokensManager:
 
     @pytest.mark.parametrize(
         argnames=["algorithm", "faker"],
-        argvalues=[(algorithm, "faker") for algorithm in fastapi_mongodb.managers.TOKEN_ALGORITHMS],
+        argvalues=[(algorithm, "faker") for algorithm in sorted(fastapi_mongodb.managers.SYMMETRIC_TOKEN_ALGORITHMS)],
         indirect=["faker"],
     )
     def test_read_code_exception_invalid_jwt(self, algorithm: fastapi_mongodb.managers.TOKEN_ALGORITHMS, faker):
@@ -197,3 +359,205 @@ class TestTokensManager:
             manager.read_code(code=faker.pystr())
 
         assert "Invalid JWT." == str(exception_context.value)
+
+
+class TestTokenCache:
+    @staticmethod
+    def _manager_factory(**kwargs):
+        return fastapi_mongodb.managers.TokensManager(
+            secret_key="TEST", token_cache=fastapi_mongodb.managers.TokenCache(**kwargs)
+        )
+
+    def test_cached_read(self, patcher):
+        manager = self._manager_factory()
+        code = manager.create_code(data={"user": "test"})
+        decode = patcher.patch_obj(target="fastapi_mongodb.managers.jwt.decode", wraps=jwt.decode)
+
+        first = manager.read_code(code=code)
+        first["user"] = "changed"
+        second = manager.read_code(code=code)
+
+        assert "test" == second["user"]
+        assert 1 == decode.call_count
+        assert {"size": 1, "hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5} == manager.token_cache.stats
+
+    def test_key_includes_validation_options(self):
+        manager = self._manager_factory()
+        code = manager.create_code(aud="first")
+
+        manager.read_code(code=code, aud="first")
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException):
+            manager.read_code(code=code, aud="second")
+
+        assert 0 == manager.token_cache.hits
+
+    def test_expired_hit(self, patcher):
+        manager = self._manager_factory()
+        now = fastapi_mongodb.helpers.utc_now()
+        code = manager.create_code(exp=now + datetime.timedelta(seconds=10))
+        manager.read_code(code=code)
+        patcher.patch_obj(target="fastapi_mongodb.managers.time.time", return_value=now.timestamp() + 15)
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            manager.read_code(code=code)
+
+        assert "Expired JWT token." == str(exception_context.value)
+        assert 0 == len(manager.token_cache)
+
+    def test_expired_hit_with_leeway(self, patcher):
+        manager = self._manager_factory()
+        now = fastapi_mongodb.helpers.utc_now()
+        code = manager.create_code(exp=now + datetime.timedelta(seconds=10))
+        manager.read_code(code=code)
+        patcher.patch_obj(target="fastapi_mongodb.managers.time.time", return_value=now.timestamp() + 15)
+
+        assert isinstance(manager.read_code(code=code, leeway=10), dict)
+        assert 1 == manager.token_cache.hits
+        assert 0 == len(manager.token_cache)
+
+    def test_not_valid_yet_hit(self):
+        manager = self._manager_factory()
+        code = manager.create_code(nbf=fastapi_mongodb.helpers.utc_now() + datetime.timedelta(seconds=5))
+        manager.read_code(code=code, leeway=10)
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            manager.read_code(code=code)
+
+        assert "The token is not valid yet." == str(exception_context.value)
+        assert 1 == manager.token_cache.hits
+
+    def test_eviction(self, patcher):
+        manager = self._manager_factory(max_size=2)
+        now = fastapi_mongodb.helpers.utc_now()
+        short_code = manager.create_code(exp=now + datetime.timedelta(seconds=5))
+        codes = [manager.create_code(data={"number": number}) for number in range(2)]
+
+        manager.read_code(code=short_code)
+        manager.read_code(code=codes[0])
+        patcher.patch_obj(target="fastapi_mongodb.managers.time.time", return_value=now.timestamp() + 10)
+        manager.read_code(code=codes[1])
+
+        assert 2 == len(manager.token_cache)
+        assert 1 == manager.token_cache.evictions
+
+    def test_converted_payload(self):
+        manager = self._manager_factory()
+        code = manager.create_code(data={"iss": ""})
+
+        as_dict = manager.read_code(code=code)
+        first = manager.read_code(code=code, convert_to=TestTokensManager.MockPayloadIssuer)
+        second = manager.read_code(code=code, convert_to=TestTokensManager.MockPayloadIssuer)
+
+        assert isinstance(as_dict, dict)
+        assert first == second and first is not second
+        assert 1 == manager.token_cache.hits
+        assert 2 == len(manager.token_cache)
+
+
+@pytest.fixture(scope="module")
+def private_keys():
+    return {
+        "RSA": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "EC": ec.generate_private_key(curve=ec.SECP256R1()),
+        "Ed25519": ed25519.Ed25519PrivateKey.generate(),
+    }
+
+
+@requires_cryptography
+class TestAsymmetricTokens:
+    @pytest.mark.parametrize(
+        argnames=["algorithm", "key_type"],
+        argvalues=[
+            (fastapi_mongodb.managers.TOKEN_ALGORITHMS.RS256, "RSA"),
+            (fastapi_mongodb.managers.TOKEN_ALGORITHMS.PS384, "RSA"),
+            (fastapi_mongodb.managers.TOKEN_ALGORITHMS.ES256, "EC"),
+            (fastapi_mongodb.managers.TOKEN_ALGORITHMS.EdDSA, "Ed25519"),
+        ],
+    )
+    def test_create_read_code_pem(self, private_keys, algorithm, key_type):
+        pem = private_keys[key_type].private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        manager = fastapi_mongodb.managers.TokensManager(secret_key=pem.decode(), algorithm=algorithm)
+
+        code = manager.create_code(data={"user": "test"})
+
+        assert "test" == manager.read_code(code=code)["user"]
+        assert algorithm == jwt.get_unverified_header(code)["alg"]
+
+    def test_secret_or_key_set(self):
+        with pytest.raises(expected_exception=ValueError):
+            fastapi_mongodb.managers.TokensManager()
+
+
+@requires_cryptography
+class TestTokenKeySet:
+    def _jwk_factory(self, *, key, kid: str, public: bool = False, **members) -> dict:
+        if public:
+            key = key.public_key()
+        algorithm = jwt.algorithms.RSAAlgorithm if hasattr(key, "key_size") else jwt.algorithms.OKPAlgorithm
+        return json.loads(algorithm.to_jwk(key)) | {"kid": kid} | members
+
+    @pytest.fixture()
+    def jwks_path(self, tmp_path, private_keys):
+        path = tmp_path / "jwks.json"
+        path.write_text(json.dumps({"keys": [self._jwk_factory(key=private_keys["RSA"], kid="rsa-1", alg="RS512")]}))
+        return path
+
+    def test_sign_and_verify_with_public_keys(self, jwks_path, private_keys):
+        signing_manager = fastapi_mongodb.managers.TokensManager(
+            key_set=fastapi_mongodb.managers.TokenKeySet(paths=[jwks_path])
+        )
+        public_jwk = self._jwk_factory(key=private_keys["RSA"], kid="rsa-1", public=True, alg="RS512")
+        verifying_key_set = fastapi_mongodb.managers.TokenKeySet(keys=[public_jwk])
+        verifying_manager = fastapi_mongodb.managers.TokensManager(key_set=verifying_key_set)
+
+        code = signing_manager.create_code(data={"user": "test"})
+
+        assert {"typ": "JWT", "alg": "RS512", "kid": "rsa-1"} == jwt.get_unverified_header(code)
+        assert "test" == verifying_manager.read_code(code=code)["user"]
+        assert verifying_key_set.get(kid="rsa-1").can_sign is False
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            verifying_manager.create_code()
+        assert "Key set has no key to sign tokens." == str(exception_context.value)
+
+    def test_parsed_once(self, jwks_path, patcher):
+        key_set = fastapi_mongodb.managers.TokenKeySet(paths=[jwks_path])
+        manager = fastapi_mongodb.managers.TokensManager(key_set=key_set)
+        from_jwk = patcher.patch_attr(target=jwt.algorithms.RSAAlgorithm, attribute="from_jwk")
+
+        manager.read_code(code=manager.create_code())
+
+        from_jwk.assert_not_called()
+
+    def test_rotation(self, jwks_path, private_keys):
+        key_set = fastapi_mongodb.managers.TokenKeySet(paths=[jwks_path], reload_interval=0)
+        manager = fastapi_mongodb.managers.TokensManager(
+            key_set=key_set, token_cache=fastapi_mongodb.managers.TokenCache()
+        )
+        old_code = manager.create_code()
+        manager.read_code(code=old_code)
+
+        jwks_path.write_text(json.dumps({"keys": [self._jwk_factory(key=private_keys["Ed25519"], kid="ed-1")]}))
+        os.utime(jwks_path, ns=(time.time_ns() + 10**9,) * 2)
+        new_code = manager.create_code()
+
+        assert ["ed-1"] == key_set.kids
+        assert 2 == key_set.version
+        assert "EdDSA" == jwt.get_unverified_header(new_code)["alg"]
+        assert isinstance(manager.read_code(code=new_code), dict)
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            manager.read_code(code=old_code)
+        assert "Unknown JWT key id." == str(exception_context.value)
+
+    def test_invalid_reload_keeps_keys(self, jwks_path):
+        key_set = fastapi_mongodb.managers.TokenKeySet(paths=[jwks_path])
+
+        jwks_path.write_text(json.dumps({"keys": [{"kty": "RSA"}]}))
+        with pytest.raises(expected_exception=ValueError):
+            key_set.reload()
+
+        assert ["rsa-1"] == key_set.kids
+        assert 1 == key_set.version
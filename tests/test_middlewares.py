@@ -0,0 +1,323 @@
+import unittest.mock
+
+import fastapi
+import pytest
+from fastapi.testclient import TestClient
+
+import fastapi_mongodb.db
+import fastapi_mongodb.helpers
+import fastapi_mongodb.logging
+import fastapi_mongodb.managers
+import fastapi_mongodb.profiling
+import fastapi_mongodb.tracing
+from fastapi_mongodb.middlewares import DBSessionMiddleware, DBStatsMiddleware, ProfilerMiddleware, TracingMiddleware
+
+
+@pytest.fixture()
+def fake_db_manager():
+    session = unittest.mock.MagicMock()
+    session.__aenter__ = unittest.mock.AsyncMock(return_value=session)
+    session.__aexit__ = unittest.mock.AsyncMock(return_value=None)
+    db_manager = unittest.mock.MagicMock()
+    db_manager.retrieve_client.return_value.start_session = unittest.mock.AsyncMock(return_value=session)
+    return db_manager
+
+
+@pytest.fixture()
+def app(fake_db_manager) -> fastapi.FastAPI:
+    application = fastapi.FastAPI()
+    application.add_middleware(DBSessionMiddleware, db_manager=fake_db_manager, causal_consistency=True)
+
+    @application.get("/health")
+    async def health(request: fastapi.Request):
+        return {"started": request.state.db_session.started}
+
+    @application.get("/db")
+    async def db(request: fastapi.Request):
+        session = await request.state.db_session
+        assert session is await request.state.db_session
+        return {"started": request.state.db_session.started}
+
+    return application
+
+
+class TestDBSessionMiddleware:
+    def test_session_not_started_without_usage(self, app, fake_db_manager):
+        with TestClient(app=app) as client:
+            response = client.get("/health")
+
+        assert {"started": False} == response.json()
+        fake_db_manager.retrieve_client.assert_not_called()
+
+    def test_session_started_on_usage(self, app, fake_db_manager):
+        start_session = fake_db_manager.retrieve_client.return_value.start_session
+
+        with TestClient(app=app) as client:
+            response = client.get("/db")
+
+        assert {"started": True} == response.json()
+        start_session.assert_awaited_once_with(causal_consistency=True)
+        start_session.return_value.__aexit__.assert_awaited_once()
+
+    def test_session_ended_after_response(self, app):
+        state = {}
+
+        @app.get("/state")
+        async def state_endpoint(request: fastapi.Request):
+            state["db_session"] = request.state.db_session
+            return {}
+
+        with TestClient(app=app) as client:
+            client.get("/state")
+
+        assert isinstance(state["db_session"], fastapi_mongodb.db.LazyDBSession)
+        assert state["db_session"].ended is True
+
+    def test_not_lazy_session(self, fake_db_manager):
+        session = fake_db_manager.retrieve_client.return_value.start_session.return_value
+        application = fastapi.FastAPI()
+        application.add_middleware(DBSessionMiddleware, db_manager=fake_db_manager, lazy=False)
+
+        @application.get("/session")
+        async def session_endpoint(request: fastapi.Request):
+            return {"session": request.state.db_session is session}
+
+        with TestClient(app=application) as client:
+            response = client.get("/session")
+
+        assert {"session": True} == response.json()
+        session.__aexit__.assert_awaited_once()
+
+    def test_deprecated_dispatch(self, fake_db_manager):
+        async def dispatch(request, call_next):
+            return await call_next(request)
+
+        with pytest.warns(DeprecationWarning):
+            middleware = DBSessionMiddleware(fastapi.FastAPI(), fake_db_manager, dispatch)
+
+        assert {} == middleware.session_options
+
+    def test_read_routing(self, fake_db_manager):
+        read_router = fastapi_mongodb.db.ReadRouter()
+        application = fastapi.FastAPI()
+        application.add_middleware(
+            DBSessionMiddleware, db_manager=fake_db_manager, read_router=read_router, client_key_header="X-Client-Id"
+        )
+
+        @application.get("/read")
+        async def read():
+            return {"pinned": read_router.is_pinned(), "primary": read_router.read_preference().mode == 0}
+
+        @application.post("/write")
+        async def write():
+            read_router.record_write()
+            return {}
+
+        with TestClient(app=application) as client:
+            before_write = client.get("/read", headers={"X-Client-Id": "client"}).json()
+            client.post("/write", headers={"X-Client-Id": "client"})
+            after_write = client.get("/read", headers={"X-Client-Id": "client"}).json()
+            other_client = client.get("/read", headers={"X-Client-Id": "other"}).json()
+
+        assert {"pinned": False, "primary": False} == before_write
+        assert {"pinned": True, "primary": True} == after_write
+        assert {"pinned": False, "primary": False} == other_client
+        assert read_router.read_preference() is None
+
+
+class TestDBStatsMiddleware:
+    @pytest.fixture()
+    def stats_app(self) -> fastapi.FastAPI:
+        application = fastapi.FastAPI()
+        application.add_middleware(DBStatsMiddleware, max_commands=5, n_plus_one_threshold=3, server_timing=True)
+        listener = fastapi_mongodb.db.RequestStatsListener()
+
+        @application.get("/items/{count}")
+        async def items(count: int):
+            for number in range(count):
+                event = unittest.mock.MagicMock(
+                    command_name="find", database_name="test_db", command={"find": "items", "filter": {"n": number}}
+                )
+                listener.started(event=event)
+                listener.succeeded(event=unittest.mock.MagicMock(duration_micros=1000, reply={"ok": 1}))
+            return {"commands": fastapi_mongodb.db.get_request_db_stats().commands}
+
+        return application
+
+    def test_server_timing(self, stats_app, patcher):
+        warning = patcher.patch_attr(target=fastapi_mongodb.logging.simple_logger, attribute="warning")
+
+        with TestClient(app=stats_app) as client:
+            response = client.get("/items/2")
+
+        assert {"commands": 2} == response.json()
+        assert response.headers["server-timing"].startswith('db;dur=2.000;desc="2 commands, ')
+        warning.assert_not_called()
+
+    def test_budget_and_n_plus_one(self, stats_app, patcher):
+        warning = patcher.patch_attr(target=fastapi_mongodb.logging.simple_logger, attribute="warning")
+
+        with TestClient(app=stats_app) as client:
+            client.get("/items/6")
+
+        budget_message, n_plus_one_message = [call.kwargs["msg"] for call in warning.call_args_list]
+        assert budget_message.startswith("Request 'GET /items/6' exceeded database budget: 6 commands, 6.0 ms")
+        assert "repeated 'find' on 'test_db.items' 6 times" in n_plus_one_message
+        assert "shape: {n: ?}" in n_plus_one_message
+
+
+class TestProfilerMiddleware:
+    @staticmethod
+    def _app_factory(**kwargs) -> tuple[fastapi.FastAPI, fastapi_mongodb.helpers.BaseProfiler]:
+        profiler = fastapi_mongodb.helpers.BaseProfiler(show_memory=False)
+        application = fastapi.FastAPI()
+        application.add_middleware(ProfilerMiddleware, profiler=profiler, **kwargs)
+        listener = fastapi_mongodb.db.RequestStatsListener(measure_bytes=False)
+
+        @application.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        @application.get("/items/{item_id}")
+        async def item(item_id: int):
+            for _ in range(item_id):
+                listener.started(event=unittest.mock.MagicMock(command_name="find", database_name="test_db"))
+                listener.succeeded(event=unittest.mock.MagicMock(duration_micros=1000))
+            return {"item_id": item_id}
+
+        return application, profiler
+
+    def test_profile_requests(self):
+        app, profiler = self._app_factory()
+
+        with TestClient(app=app) as client:
+            client.get("/health")
+            client.get("/health")
+
+        assert 2 == profiler.stats["GET /health"]["count"]
+
+    @pytest.mark.parametrize(argnames=["random_value", "expected"], argvalues=[(0.05, {"GET /health"}), (0.5, set())])
+    def test_sample_rate(self, patcher, random_value, expected):
+        patcher.patch_obj(target="fastapi_mongodb.middlewares.random.random", return_value=random_value)
+        app, profiler = self._app_factory(sample_rate=0.1)
+
+        with TestClient(app=app) as client:
+            client.get("/health")
+
+        assert expected == set(profiler.stats)
+
+    def test_route_templates(self):
+        store = fastapi_mongodb.profiling.MemoryProfileStore()
+        app, profiler = self._app_factory(store=store)
+        app.include_router(fastapi_mongodb.profiling.create_profiling_router(store=store, prefix="/profiling"))
+
+        with TestClient(app=app) as client:
+            client.get("/items/1")
+            client.get("/items/3")
+            client.get("/missing")
+            items = client.get("/profiling/worst", params={"route": "GET /items/{item_id}"}).json()
+            unmatched = client.get("/profiling/worst", params={"route": "GET <unmatched>"}).json()
+            routes = client.get("/profiling/routes").json()
+
+        assert {"GET /items/{item_id}", "GET <unmatched>", "GET /profiling/worst", "GET /profiling/routes"} == set(
+            profiler.stats
+        )
+        assert [("/items/1", 1), ("/items/3", 3)] == sorted((record["path"], record["db_commands"]) for record in items)
+        assert 2.0 == routes["GET /items/{item_id}"]["mean_db_commands"]
+        assert [404] == [record["status"] for record in unmatched]
+
+    def test_debug_header(self, patcher):
+        warning = patcher.patch_attr(target=fastapi_mongodb.logging.simple_logger, attribute="warning")
+        tokens_manager = fastapi_mongodb.managers.TokensManager(secret_key="secret")
+        store = fastapi_mongodb.profiling.MemoryProfileStore()
+        app, profiler = self._app_factory(sample_rate=0, store=store, tokens_manager=tokens_manager)
+        app.include_router(fastapi_mongodb.profiling.create_profiling_router(store=store, prefix="/profiling"))
+
+        with TestClient(app=app) as client:
+            client.get("/health")
+            client.get("/health", headers={"X-Profile": tokens_manager.create_code(aud="profiler")})
+            client.get("/health", headers={"X-Profile": tokens_manager.create_code(aud="access")})
+            worst = client.get("/profiling/worst").json()
+
+        assert {"GET /health": 1} == {name: stats["count"] for name, stats in profiler.stats.items()}
+        assert [True] == [record["forced"] for record in worst]
+        assert "Invalid profiling header of '/health' request: Invalid JWT audience." == warning.call_args.kwargs["msg"]
+
+    def test_admin_router(self):
+        store = fastapi_mongodb.profiling.MemoryProfileStore()
+        app, _ = self._app_factory(store=store)
+        app.include_router(fastapi_mongodb.profiling.create_profiling_router(store=store, prefix="/profiling"))
+
+        with TestClient(app=app) as client:
+            client.get("/items/2")
+            worst = client.get("/profiling/worst", params={"limit": 5}).json()
+            routes = client.get("/profiling/routes").json()
+
+        assert ["GET /items/{item_id}"] == [record["route"] for record in worst]
+        assert 1 == routes["GET /items/{item_id}"]["count"]
+
+
+class TestTracingMiddleware:
+    @pytest.fixture()
+    def exporter(self) -> fastapi_mongodb.tracing.InMemorySpanExporter:
+        return fastapi_mongodb.tracing.InMemorySpanExporter()
+
+    @pytest.fixture()
+    def tracing_app(self, exporter) -> fastapi.FastAPI:
+        tracer = fastapi_mongodb.tracing.Tracer(exporter=exporter)
+        application = fastapi.FastAPI()
+        application.add_middleware(TracingMiddleware, tracer=tracer)
+        listener = fastapi_mongodb.tracing.TracingListener(tracer=tracer)
+
+        @application.get("/items/{item_id}")
+        async def item(item_id: int):
+            event = unittest.mock.MagicMock(
+                command_name="find", command={"find": "items"}, request_id=item_id, connection_id=("localhost", 27017)
+            )
+            listener.started(event=event)
+            listener.succeeded(
+                event=unittest.mock.MagicMock(
+                    duration_micros=1000, request_id=item_id, connection_id=("localhost", 27017)
+                )
+            )
+            return {"item_id": item_id}
+
+        @application.get("/error")
+        async def error():
+            raise ValueError
+
+        return application
+
+    def test_request_with_command_spans(self, tracing_app, exporter):
+        with TestClient(app=tracing_app) as client:
+            client.get("/items/1")
+
+        request, command = exporter.spans
+        assert "GET /items/{item_id}" == request.name
+        assert fastapi_mongodb.tracing.SPAN_KINDS.SERVER == request.kind
+        assert {
+            "http.method": "GET",
+            "http.target": "/items/1",
+            "http.route": "/items/{item_id}",
+            "http.status_code": 200,
+        } == request.attributes
+        assert ("find items", request.span_id) == (command.name, command.parent_span_id)
+
+    def test_traceparent(self, tracing_app, exporter):
+        trace_id, parent_id = "0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"
+
+        with TestClient(app=tracing_app) as client:
+            client.get("/items/1", headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+            client.get("/items/2", headers={"traceparent": "invalid"})
+
+        first, _, second, _ = exporter.spans
+        assert (trace_id, parent_id) == (first.trace_id, first.parent_span_id)
+        assert second.trace_id != trace_id and second.parent_span_id is None
+
+    def test_error(self, tracing_app, exporter):
+        with TestClient(app=tracing_app) as client:
+            with pytest.raises(ValueError):
+                client.get("/error")
+
+        (request,) = exporter.spans
+        assert fastapi_mongodb.tracing.SPAN_STATUSES.ERROR == request.status
@@ -80,6 +80,56 @@ class TestBaseDBModel:
         assert oid == to_db_result["_id"]
 
 
+class TestSchemaProjection:
+    class MyModel(fastapi_mongodb.models.BaseCreatedUpdatedModel):
+        test: str
+        secret: str
+
+    class MySchema(fastapi_mongodb.schemas.BaseCreatedUpdatedSchema):
+        test: str
+        tags: list[str] = []
+
+    def test_projection_equals_models_round_trip(self, faker):
+        document = self.MyModel(test=faker.pystr(), secret=faker.pystr()).to_db()
+        projection = fastapi_mongodb.models.SchemaProjection(model=self.MyModel, schema=self.MySchema)
+
+        result = projection(fastapi_mongodb.db.BaseDocument(data=document))
+
+        assert self.MySchema(**self.MyModel.from_db(data=document).dict()).dict(by_alias=True) == result
+        assert {"oid", "created_at", "updated_at", "test", "tags"} == set(result)
+        assert document["_id"] == result["oid"]
+        assert {
+            "_id": True,
+            "created_at": True,
+            "updated_at": True,
+            "test": True,
+            "tags": True,
+        } == projection.projection
+
+    def test_missing_keys_defaults(self, faker):
+        projection = fastapi_mongodb.models.SchemaProjection(model=self.MyModel, schema=self.MySchema)
+
+        first, second = projection({"test": "first"}), projection({"test": "second"})
+
+        assert {"oid": None, "created_at": None, "updated_at": None, "test": "first", "tags": []} == first
+        assert first["tags"] is not second["tags"]
+
+    def test_required_field_missing_in_model(self):
+        class OtherSchema(fastapi_mongodb.schemas.BaseSchema):
+            other: str
+
+        with pytest.raises(ValueError) as exception_context:
+            fastapi_mongodb.models.SchemaProjection(model=self.MyModel, schema=OtherSchema)
+
+        assert "Required field 'other' of OtherSchema is missing in MyModel." == str(exception_context.value)
+
+    def test_get_schema_projection_cached(self):
+        projection = self.MyModel.get_schema_projection(self.MySchema)
+
+        assert projection is self.MyModel.get_schema_projection(self.MySchema)
+        assert (self.MyModel, self.MySchema) == (projection.model, projection.schema)
+
+
 # TODO: Refactor this test class
 class TestBaseActiveRecord:
     WARNING_MSG = "Document already deleted or has not been created yet!"
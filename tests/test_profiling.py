@@ -0,0 +1,83 @@
+import unittest.mock
+
+import pytest
+
+import fastapi_mongodb.db
+import fastapi_mongodb.helpers
+import fastapi_mongodb.repositories
+from fastapi_mongodb.profiling import MemoryProfileStore, RepositoryProfileStore
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest.fixture()
+def record() -> dict:
+    return {
+        "route": "GET /items/{item_id}",
+        "path": "/items/1",
+        "status": 200,
+        "duration": 0.1,
+        "memory": 0,
+        "db_commands": 1,
+        "db_time": 0.001,
+        "time": fastapi_mongodb.helpers.utc_now(),
+        "forced": False,
+    }
+
+
+class TestMemoryProfileStore:
+    async def test_worst(self, record):
+        store = MemoryProfileStore(worst_count=3)
+
+        for duration in (0.3, 0.1, 0.5, 0.2, 0.4):
+            await store.add(record=record | {"duration": duration})
+        await store.add(record=record | {"route": "GET /health", "duration": 0.45})
+
+        assert [0.5, 0.45, 0.4] == [record["duration"] for record in await store.worst()]
+        assert [0.5] == [record["duration"] for record in await store.worst(limit=1)]
+        assert [0.5, 0.4] == [record["duration"] for record in await store.worst(route="GET /items/{item_id}")]
+
+    async def test_routes(self, record):
+        store = MemoryProfileStore(worst_count=1)
+
+        await store.add(record=record)
+        await store.add(record=record | {"duration": 0.3, "db_commands": 5})
+
+        stats = (await store.routes())["GET /items/{item_id}"]
+        assert 2 == stats["count"]
+        assert 0.2 == pytest.approx(stats["mean"])
+        assert 0.3 == pytest.approx(stats["max"])
+        assert 3.0 == stats["mean_db_commands"]
+        assert 5 == stats["max_db_commands"]
+
+
+class TestRepositoryProfileStore:
+    async def test_plain_dicts(self, record):
+        async def cursor(documents: list[dict]):
+            for document in documents:
+                yield fastapi_mongodb.db.BaseDocument(document)
+
+        repository = unittest.mock.MagicMock()
+        repository.find = unittest.mock.AsyncMock(return_value=cursor(documents=[record]))
+        repository.aggregate = unittest.mock.AsyncMock(
+            return_value=cursor(documents=[{"_id": record["route"], "count": 1}])
+        )
+        store = RepositoryProfileStore(repository=repository)
+
+        worst, routes = await store.worst(), await store.routes()
+
+        assert [record] == worst and dict is type(worst[0])
+        assert {record["route"]: {"count": 1}} == routes and dict is type(routes[record["route"]])
+
+    async def test_worst_and_routes(self, db_manager, record):
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=db_manager, db_name="test_db", col_name="test_profiled_requests"
+        )
+        await repository.delete_many(query={})
+        store = RepositoryProfileStore(repository=repository)
+
+        for duration in (0.1, 0.3, 0.2):
+            await store.add(record=record | {"duration": duration})
+
+        assert [0.3, 0.2] == [record["duration"] for record in await store.worst(limit=2)]
+        assert 3 == (await store.routes())["GET /items/{item_id}"]["count"]
@@ -1,8 +1,16 @@
+import asyncio
+import unittest.mock
+
 import bson
+import bson.codec_options
 import motor.motor_asyncio
+import pymongo
 import pymongo.results
 import pytest
 
+import fastapi_mongodb.repositories
+from fastapi_mongodb.repositories import CountCache
+
 pytestmark = [pytest.mark.asyncio]
 
 
@@ -249,3 +257,131 @@ class TestBaseRepository:
         streamed_document = await change_stream_2.try_next()
 
         assert document == streamed_document["fullDocument"]
+
+    async def test_count_documents_cached(self, db_manager, documents, mongodb_session):
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=db_manager, db_name="test_db", col_name="test_col", count_cache=CountCache(ttl=60)
+        )
+        ids_list = [document["_id"] for document in documents]
+        query = {"_id": {"$in": ids_list}}
+        await repository.insert_many(documents=documents[:-1], session=mongodb_session)
+
+        assert len(documents) - 1 == await repository.count_documents(query=query, session=mongodb_session)
+        assert 1 == len(repository.count_cache)
+
+        await repository.insert_one(document=documents[-1], session=mongodb_session)
+
+        assert 0 == len(repository.count_cache)
+        assert len(documents) == await repository.count_documents(query=query, session=mongodb_session)
+
+
+class TestCountCache:
+    @staticmethod
+    def _counter(values: list[int]) -> unittest.mock.AsyncMock:
+        return unittest.mock.AsyncMock(side_effect=values)
+
+    def test_make_key_normalization(self):
+        oid = bson.ObjectId()
+
+        key_1 = CountCache.make_key(query={"a": 1, "b": {"$gt": 1, "$lt": 5}, "$or": [{"c": 1, "d": oid}]})
+        key_2 = CountCache.make_key(query={"$or": [{"d": oid, "c": 1}], "b": {"$lt": 5, "$gt": 1}, "a": 1})
+        key_3 = CountCache.make_key(query={"a": {"x": 1, "y": 2}})
+        key_4 = CountCache.make_key(query={"a": {"y": 2, "x": 1}})
+
+        assert key_1 == key_2
+        assert key_3 != key_4  # embedded documents equality depends on fields order
+        assert CountCache.make_key(query={"a": 1}) != CountCache.make_key(query={"a": 1}, limit=1)
+        assert CountCache.make_key(
+            query={"a": 1}, read_preference=pymongo.ReadPreference.PRIMARY
+        ) != CountCache.make_key(query={"a": 1}, read_preference=pymongo.ReadPreference.SECONDARY_PREFERRED)
+
+    async def test_repository_key_of_read_preference(self, patcher):
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=unittest.mock.MagicMock(), db_name="test_db", col_name="test_col", count_cache=CountCache(ttl=60)
+        )
+        collections = [
+            unittest.mock.MagicMock(
+                read_preference=preference,
+                codec_options=bson.codec_options.DEFAULT_CODEC_OPTIONS,
+                count_documents=unittest.mock.AsyncMock(return_value=count),
+            )
+            for preference, count in (
+                (pymongo.ReadPreference.SECONDARY_PREFERRED, 4),
+                (pymongo.ReadPreference.PRIMARY, 5),
+            )
+        ]
+        read_col = patcher.patch_attr(target=repository, attribute="_read_col")
+
+        counts = []
+        for collection in collections:
+            read_col.return_value = collection
+            counts.append(await repository.count_documents(query={}))
+
+        assert [4, 5] == counts  # count from secondary isn't served to request pinned to primary
+        assert 2 == len(repository.count_cache)
+
+    def test_refresh_ahead_validation(self):
+        with pytest.raises(ValueError):
+            CountCache(ttl=1, refresh_ahead=1)
+
+    async def test_get_or_count_hit_miss(self):
+        cache, count = CountCache(ttl=60), self._counter(values=[5, 6])
+        key = CountCache.make_key(query={})
+
+        assert 5 == await cache.get_or_count(key=key, count=count)
+        assert 5 == await cache.get_or_count(key=key, count=count)
+        assert 1 == count.await_count
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    async def test_get_or_count_concurrent_misses(self):
+        cache, count = CountCache(ttl=60), self._counter(values=[5, 6])
+        key = CountCache.make_key(query={})
+
+        result = await asyncio.gather(*[cache.get_or_count(key=key, count=count) for _ in range(5)])
+
+        assert [5] * 5 == result
+        assert 1 == count.await_count
+
+    async def test_expired(self, patcher):
+        cache, count = CountCache(ttl=10), self._counter(values=[5, 6])
+        key = CountCache.make_key(query={})
+        monotonic = patcher.patch_obj(target="fastapi_mongodb.repositories.time.monotonic", return_value=100)
+        await cache.get_or_count(key=key, count=count)
+
+        monotonic.return_value = 111
+
+        assert cache.get(key=key) is None
+        assert 6 == await cache.get_or_count(key=key, count=count)
+
+    async def test_refresh_ahead(self, patcher):
+        cache, count = CountCache(ttl=10, refresh_ahead=3), self._counter(values=[5, 6])
+        key = CountCache.make_key(query={})
+        monotonic = patcher.patch_obj(target="fastapi_mongodb.repositories.time.monotonic", return_value=100)
+        await cache.get_or_count(key=key, count=count)
+        monotonic.return_value = 108
+
+        assert 5 == await cache.get_or_count(key=key, count=count)  # served from cache, refreshed in background
+        await asyncio.gather(*cache._tasks)
+
+        assert 1 == cache.refreshes
+        assert 6 == cache.get(key=key)
+
+    async def test_invalidate_discards_in_flight_count(self):
+        cache, key = CountCache(ttl=60), CountCache.make_key(query={})
+
+        async def count():
+            cache.invalidate()  # write happens while count is running
+            return 5
+
+        assert 5 == await cache.get_or_count(key=key, count=count)
+        assert cache.get(key=key) is None
+
+    def test_max_size(self):
+        cache = CountCache(ttl=60, max_size=2)
+        keys = [CountCache.make_key(query={"a": i}) for i in range(3)]
+
+        for i, key in enumerate(keys):
+            cache.set(key=key, count=i)
+
+        assert 2 == len(cache)
+        assert cache.get(key=keys[0]) is None
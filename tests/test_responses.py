@@ -0,0 +1,129 @@
+import datetime
+import decimal
+import json
+
+import bson
+import fastapi
+import pytest
+from fastapi.testclient import TestClient
+
+import fastapi_mongodb.helpers
+from fastapi_mongodb.models import BaseDBModel
+from fastapi_mongodb.responses import ORJSONResponse, ORJSONRoute
+from fastapi_mongodb.schemas import BaseSchema
+
+
+class ItemSchema(BaseSchema):
+    name: str
+    price: decimal.Decimal
+    created_at: datetime.datetime
+    ttl: datetime.timedelta
+
+
+class ItemModel(BaseDBModel):
+    name: str
+
+
+class UserModel(BaseDBModel):
+    name: str
+    password_hash: str
+
+
+class UserSchema(BaseSchema):
+    name: str
+
+
+class TestORJSONResponse:
+    def test_render(self):
+        oid = bson.ObjectId()
+        created_at = fastapi_mongodb.helpers.utc_now()
+        schema = ItemSchema(
+            oid=oid, name="item", price=decimal.Decimal("1.5"), created_at=created_at, ttl=datetime.timedelta(hours=1)
+        )
+
+        response = ORJSONResponse(
+            content={
+                "schema": schema,
+                "model": ItemModel(_id=oid, name="item"),
+                "raw": {"_id": oid, "total": bson.Decimal128("2.25"), "tags": {"a"}},
+            }
+        )
+
+        assert {
+            "schema": {
+                "oid": str(oid),
+                "name": "item",
+                "price": 1.5,
+                "created_at": created_at.isoformat(),
+                "ttl": "P0DT1H0M0.000000S",
+            },
+            "model": {"oid": str(oid), "name": "item"},
+            "raw": {"_id": str(oid), "total": 2.25, "tags": ["a"]},
+        } == json.loads(response.body)
+        assert fastapi.encoders.jsonable_encoder(schema) == json.loads(response.body)["schema"]
+
+    def test_render_unknown_type(self):
+        with pytest.raises(TypeError):
+            ORJSONResponse(content={"value": object()})
+
+
+class TestORJSONRoute:
+    @pytest.fixture()
+    def client(self) -> TestClient:
+        router = fastapi.APIRouter(route_class=ORJSONRoute)
+
+        @router.get("/items", response_model=list[ItemModel])
+        async def list_items():
+            return [{"_id": bson.ObjectId("5f5cf6f50cde9ec07786b294"), "name": "item"}]
+
+        @router.post("/items", status_code=201)
+        def create_item(name: str, response: fastapi.Response):
+            response.headers["x-created"] = name
+            return ItemModel(_id=bson.ObjectId("5f5cf6f50cde9ec07786b294"), name=name)
+
+        @router.get("/users/me", response_model=UserSchema)
+        async def get_user():
+            return UserModel(_id=bson.ObjectId("5f5cf6f50cde9ec07786b294"), name="user", password_hash="secret")
+
+        @router.get("/redirect")
+        async def redirect():
+            return fastapi.responses.RedirectResponse(url="/items")
+
+        application = fastapi.FastAPI()
+        application.include_router(router)
+        return TestClient(app=application)
+
+    def test_async_endpoint(self, client):
+        response = client.get("/items")
+
+        assert 200 == response.status_code
+        assert [{"oid": "5f5cf6f50cde9ec07786b294", "name": "item"}] == response.json()
+
+    def test_sync_endpoint_with_response(self, client):
+        response = client.post("/items", params={"name": "new"})
+
+        assert 201 == response.status_code
+        assert "new" == response.headers["x-created"]
+        assert {"oid": "5f5cf6f50cde9ec07786b294", "name": "new"} == response.json()
+
+    def test_response_model_fields(self, client):
+        response = client.get("/users/me")
+
+        assert {"oid": "5f5cf6f50cde9ec07786b294", "name": "user"} == response.json()  # no 'password_hash'
+
+    def test_encoder_options(self):
+        router = fastapi.APIRouter(route_class=ORJSONRoute)
+
+        with pytest.raises(ValueError):
+            router.add_api_route("/users/me", lambda: {}, response_model=UserSchema, response_model_exclude={"name"})
+
+    def test_response_returned_as_is(self, client):
+        response = client.get("/redirect", allow_redirects=False)
+
+        assert 307 == response.status_code
+
+    def test_openapi(self, client):
+        operation = client.get("/openapi.json").json()["paths"]["/items"]
+
+        assert ["name"] == [parameter["name"] for parameter in operation["post"]["parameters"]]
+        assert "application/json" in operation["get"]["responses"]["200"]["content"]
@@ -0,0 +1,279 @@
+import asyncio
+import datetime
+import unittest.mock
+
+import pymongo.errors
+import pytest
+
+import fastapi_mongodb.exceptions
+import fastapi_mongodb.helpers
+import fastapi_mongodb.repositories
+import fastapi_mongodb.schemas
+from fastapi_mongodb.managers import TokenCache, TokensManager
+from fastapi_mongodb.revocations import BloomFilter, TokenRevocationStore
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class FakeCursor:
+    def __init__(self, documents: list[dict]):
+        self._documents = list(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._documents:
+            raise StopAsyncIteration
+        return self._documents.pop(0)
+
+
+class FakeChangeStream:
+    def __init__(self, events: list[dict], error: Exception = None):
+        self._events = list(events)
+        self._error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def try_next(self):
+        await asyncio.sleep(0)
+        if self._events:
+            return self._events.pop(0)
+        if self._error is not None:
+            raise self._error
+        return None
+
+
+@pytest.fixture()
+def fake_repository():
+    """Repository with in-memory denylist."""
+    documents = {}
+    repository = unittest.mock.MagicMock()
+
+    async def update_one(*, query, update, upsert):
+        documents.setdefault(query["jti"], update["$setOnInsert"])
+
+    async def find_one(*, query, projection):
+        return {"_id": query["jti"]} if query["jti"] in documents else None
+
+    async def find(*, query, projection):
+        return FakeCursor(documents=[{"jti": jti} for jti in documents])
+
+    repository.update_one = unittest.mock.AsyncMock(side_effect=update_one)
+    repository.find_one = unittest.mock.AsyncMock(side_effect=find_one)
+    repository.find = unittest.mock.AsyncMock(side_effect=find)
+    repository.count_documents = unittest.mock.AsyncMock(side_effect=lambda **kwargs: len(documents))
+    repository.documents = documents
+    return repository
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self, faker):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [faker.pystr() for _ in range(1000)]
+
+        for item in items:
+            bloom_filter.add(item)
+
+        assert all(item in bloom_filter for item in items)
+        assert 1000 == len(bloom_filter)
+
+    def test_false_positive_rate(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        for number in range(1000):
+            bloom_filter.add(f"revoked-{number}")
+
+        false_positives = sum(f"valid-{number}" in bloom_filter for number in range(10000))
+
+        assert 9586 == bloom_filter.size
+        assert 7 == bloom_filter.hash_count
+        assert false_positives < 10000 * 0.01 * 2
+
+
+class TestTokenRevocationStore:
+    async def test_not_ready_checks_database(self, fake_repository, faker):
+        store = TokenRevocationStore(repository=fake_repository)
+        await store.revoke(jti="revoked", exp=fastapi_mongodb.helpers.utc_now())
+
+        assert await store.is_revoked(jti="revoked") is True
+        assert await store.is_revoked(jti=faker.pystr()) is False
+        assert {"checks": 2, "lookups": 2, "false_positives": 0} == store.stats
+
+    async def test_filter_skips_database(self, fake_repository, faker):
+        fake_repository.documents["revoked"] = {"jti": "revoked"}
+        store = TokenRevocationStore(repository=fake_repository)
+        await store.sync()
+
+        assert await store.is_revoked(jti=faker.pystr()) is False
+        assert await store.is_revoked(jti="revoked") is True
+        assert {"checks": 2, "lookups": 1, "false_positives": 0} == store.stats
+        assert store.ready
+
+    async def test_false_positive_confirmed(self, fake_repository):
+        store = TokenRevocationStore(repository=fake_repository)
+        await store.sync()
+        store._filter.add("valid")
+
+        assert await store.is_revoked(jti="valid") is False
+        assert 1 == store.false_positives
+
+    async def test_revoke(self, fake_repository):
+        store = TokenRevocationStore(repository=fake_repository)
+        await store.sync()
+
+        await store.revoke(jti="revoked", exp=0)
+
+        exp = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        assert await store.is_revoked(jti="revoked") is True
+        fake_repository.update_one.assert_awaited_once_with(
+            query={"jti": "revoked"}, update={"$setOnInsert": {"jti": "revoked", "exp": exp}}, upsert=True
+        )
+
+    async def test_revoke_during_sync(self, fake_repository):
+        store = TokenRevocationStore(repository=fake_repository)
+
+        async def find(**kwargs):
+            await store.revoke(jti="revoked", exp=0)  # revoked after cursor read its documents
+            return FakeCursor(documents=[])
+
+        fake_repository.find.side_effect = find
+        await store.sync()
+
+        assert "revoked" in store._filter
+
+    async def test_sync_grows_filter(self, fake_repository):
+        fake_repository.documents.update({str(number): {"jti": str(number)} for number in range(20)})
+        store = TokenRevocationStore(repository=fake_repository, capacity=10)
+
+        await store.sync()
+
+        assert 40 == store._filter.capacity
+        assert 20 == len(store._filter)
+
+    async def test_change_stream(self, fake_repository):
+        fake_repository.watch = unittest.mock.AsyncMock(
+            return_value=FakeChangeStream(events=[{"operationType": "insert", "fullDocument": {"jti": "remote"}}])
+        )
+        store = TokenRevocationStore(repository=fake_repository)
+
+        await store.start()
+        await asyncio.sleep(0.01)
+        await store.stop()
+
+        assert store.ready
+        assert "remote" in store._filter
+        assert [{"$match": {"operationType": "insert"}}] == fake_repository.watch.await_args.kwargs["pipeline"]
+
+    async def test_polling(self, fake_repository):
+        store = TokenRevocationStore(repository=fake_repository, change_stream=False, sync_interval=0)
+        await store.start()
+        await asyncio.sleep(0.01)
+
+        fake_repository.documents["remote"] = {"jti": "remote"}
+        await asyncio.sleep(0.01)
+        await store.stop()
+
+        assert "remote" in store._filter
+
+    async def test_sync_failure(self, fake_repository, faker):
+        fake_repository.watch = unittest.mock.AsyncMock(
+            return_value=FakeChangeStream(events=[], error=pymongo.errors.AutoReconnect())
+        )
+        store = TokenRevocationStore(repository=fake_repository, retry_delay=60)
+
+        await store.start()
+        await asyncio.sleep(0.01)
+
+        assert not store.ready  # stale filter can miss revocations, so every check goes to database
+        await store.is_revoked(jti=faker.pystr())
+        assert 1 == store.lookups
+        await store.stop()
+
+    async def test_unexpected_error(self, fake_repository, patcher):
+        store = TokenRevocationStore(repository=fake_repository, change_stream=False, retry_delay=0)
+        sync = patcher.patch_attr(target=store, attribute="sync", side_effect=[KeyError("jti"), None])
+
+        await store.start()
+        await asyncio.sleep(0.01)
+
+        assert 2 == sync.await_count  # the task is alive after unexpected error
+        assert not store._task.done()
+        await store.stop()
+
+    async def test_real_collection(self, db_manager, faker):
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=db_manager, db_name="test_db", col_name="test_revoked_tokens"
+        )
+        store, jti = TokenRevocationStore(repository=repository), faker.pystr()
+        await store.create_indexes()
+        await store.sync()
+
+        await store.revoke(jti=jti, exp=fastapi_mongodb.helpers.utc_now() + datetime.timedelta(minutes=1))
+
+        assert await store.is_revoked(jti=jti) is True
+        assert await store.is_revoked(jti=faker.pystr()) is False
+
+
+class TestTokensManagerRevocation:
+    @staticmethod
+    def _manager_factory(repository, **kwargs):
+        store = TokenRevocationStore(repository=repository)
+        return TokensManager(secret_key="secret", revocation_store=store, **kwargs)
+
+    async def test_jti(self, fake_repository):
+        manager = self._manager_factory(repository=fake_repository)
+
+        codes = [manager.create_code(), *manager.create_codes(data=[{}, {}])]
+
+        assert 3 == len({(await manager.read_code_async(code=code))["jti"] for code in codes})
+        assert "custom" == (await manager.read_code_async(code=manager.create_code(jti="custom")))["jti"]
+        assert "jti" not in TokensManager(secret_key="secret").read_code(
+            code=TokensManager(secret_key="secret").create_code()
+        )
+
+    async def test_revoke_code(self, fake_repository):
+        manager = self._manager_factory(repository=fake_repository, token_cache=TokenCache())
+        code, other_code = manager.create_code(), manager.create_code()
+        await manager.revocation_store.sync()
+        await manager.read_code_async(code=code)  # token is cached
+
+        await manager.revoke_code(code=code)
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            await manager.read_code_async(code=code)
+        assert "Revoked JWT token." == str(exception_context.value)
+        assert 2 == manager.token_cache.hits  # revoked token is rejected even from cache
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException):
+            manager.read_code(code=other_code)  # sync path can't check revocations, so it doesn't skip them
+        assert await manager.read_code_async(code=other_code)
+
+    async def test_revoke_converted_payload(self, fake_repository):
+        class Payload(fastapi_mongodb.schemas.BaseSchema):
+            user_id: int
+
+        manager = self._manager_factory(repository=fake_repository)
+        code = manager.create_code(data={"user_id": 1})
+        await manager.revoke_code(code=code)
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException):
+            await manager.read_code_async(code=code, convert_to=Payload)
+
+    async def test_revoke_without_store(self):
+        manager = TokensManager(secret_key="secret")
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException):
+            await manager.revoke_code(code=manager.create_code())
+
+    async def test_revoke_without_jti(self, fake_repository):
+        manager = self._manager_factory(repository=fake_repository)
+        code = TokensManager(secret_key="secret").create_code()
+
+        with pytest.raises(expected_exception=fastapi_mongodb.exceptions.ManagerException) as exception_context:
+            await manager.revoke_code(code=code)
+
+        assert "JWT token without 'jti' and 'exp' can't be revoked." == str(exception_context.value)
+        assert await manager.read_code_async(code=code)
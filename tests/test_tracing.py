@@ -0,0 +1,155 @@
+import json
+import threading
+import unittest.mock
+
+import pytest
+
+from fastapi_mongodb.tracing import (
+    SPAN_KINDS,
+    SPAN_STATUSES,
+    FileSpanExporter,
+    InMemorySpanExporter,
+    Span,
+    Tracer,
+    TracingListener,
+    get_current_span,
+)
+
+
+class TestSpan:
+    def test_as_otlp(self):
+        parent = Span(name="GET /items", kind=SPAN_KINDS.SERVER, trace_id="a" * 32, parent_span_id="b" * 16)
+        span = Span(name="find items", kind=SPAN_KINDS.CLIENT, parent=parent, attributes={"count": 1, "ok": True})
+        span.set_status(SPAN_STATUSES.ERROR, message="failed")
+
+        span.end(duration_ns=1500)
+
+        assert {
+            "traceId": "a" * 32,
+            "spanId": span.span_id,
+            "parentSpanId": parent.span_id,
+            "name": "find items",
+            "kind": 3,
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.start_time_ns + 1500),
+            "attributes": [
+                {"key": "count", "value": {"intValue": "1"}},
+                {"key": "ok", "value": {"boolValue": True}},
+            ],
+            "status": {"code": 2, "message": "failed"},
+        } == span.as_otlp()
+        assert "b" * 16 == parent.as_otlp()["parentSpanId"]
+        assert 16 == len(span.span_id)
+
+
+class TestTracer:
+    def test_trace_exported_after_root(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter=exporter)
+
+        with tracer.span(name="request") as root:
+            with tracer.span(name="child") as child:
+                assert child is get_current_span()
+            assert [] == list(exporter.spans)
+
+        assert get_current_span() is None
+        assert [root, child] == list(exporter.spans)
+        assert root.span_id == child.parent_span_id
+
+    def test_late_child(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter=exporter)
+
+        with tracer.span(name="request") as root:
+            late = tracer.start_span(name="background")
+        tracer.end_span(span=late)
+
+        assert [root, late] == exporter.get_trace(trace_id=root.trace_id)
+
+    def test_error_status(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter=exporter)
+
+        with pytest.raises(ValueError):
+            with tracer.span(name="request"):
+                raise ValueError("boom")
+
+        assert SPAN_STATUSES.ERROR == exporter.spans[0].status
+        assert "ValueError('boom')" == exporter.spans[0].status_message
+
+
+class TestFileSpanExporter:
+    def test_otlp_lines_with_rotation(self, tmp_path):
+        path = tmp_path / "spans.json"
+        exporter = FileSpanExporter(path=str(path), service_name="test", max_bytes=1000, backup_count=1)
+        tracer = Tracer(exporter=exporter)
+
+        for _ in range(5):
+            with tracer.span(name="request"):
+                tracer.end_span(span=tracer.start_span(name="child"))
+        exporter.close()
+
+        line = json.loads(path.read_text().splitlines()[-1])
+        (resource_spans,) = line["resourceSpans"]
+        assert [{"key": "service.name", "value": {"stringValue": "test"}}] == resource_spans["resource"]["attributes"]
+        assert ["request", "child"] == [span["name"] for span in resource_spans["scopeSpans"][0]["spans"]]
+        assert (tmp_path / "spans.json.1").exists()
+        assert not (tmp_path / "spans.json.2").exists()
+
+
+class TestTracingListener:
+    def _event_factory(self, *, request_id: int = 1, command: dict = None, **kwargs) -> unittest.mock.MagicMock:
+        command = command or {"find": "items", "filter": {"number": 1}}
+        return unittest.mock.MagicMock(
+            command_name=next(iter(command)),
+            command=command,
+            database_name="test_db",
+            request_id=request_id,
+            connection_id=("localhost", 27017),
+            **kwargs,
+        )
+
+    def test_command_spans(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter=exporter)
+        listener = TracingListener(tracer=tracer, statement=True)
+
+        with tracer.span(name="request") as root:
+            listener.started(event=self._event_factory(request_id=1))
+            listener.started(event=self._event_factory(request_id=2, command={"insert": "items"}))
+            # motor reports results from executor thread
+            thread = threading.Thread(
+                target=lambda: (
+                    listener.succeeded(event=self._event_factory(request_id=1, duration_micros=1500)),
+                    listener.failed(
+                        event=self._event_factory(request_id=2, duration_micros=500, failure={"errmsg": "dup"})
+                    ),
+                )
+            )
+            thread.start()
+            thread.join()
+
+        _, find, insert = exporter.spans
+        assert ("find items", "insert items") == (find.name, insert.name)
+        assert root.span_id == find.parent_span_id == insert.parent_span_id
+        assert 1_500_000 == find.end_time_ns - find.start_time_ns
+        assert {
+            "db.system": "mongodb",
+            "db.name": "test_db",
+            "db.operation": "find",
+            "db.mongodb.request_id": 1,
+            "db.mongodb.collection": "items",
+            "net.peer.name": "localhost",
+            "net.peer.port": 27017,
+            "db.statement": "{number: ?}",
+        } == find.attributes
+        assert (SPAN_STATUSES.ERROR, "dup") == (insert.status, insert.status_message)
+
+    def test_not_traced_context(self):
+        exporter = InMemorySpanExporter()
+        listener = TracingListener(tracer=Tracer(exporter=exporter))
+
+        listener.started(event=self._event_factory())
+        listener.succeeded(event=self._event_factory(duration_micros=1))
+
+        assert [] == list(exporter.spans)
@@ -0,0 +1,330 @@
+import asyncio
+import concurrent.futures
+import unittest.mock
+
+import bson
+import bson.json_util
+import bson.raw_bson
+import pymongo.errors
+import pytest
+
+import fastapi_mongodb.models
+import fastapi_mongodb.repositories
+from fastapi_mongodb.transfer import RAW_CODEC_OPTIONS, TRANSFER_FORMATS, CollectionExporter, CollectionImporter
+
+pytestmark = [pytest.mark.asyncio]
+
+
+def matches(value, condition: dict) -> bool:
+    return (
+        ("$gte" not in condition or value >= condition["$gte"])
+        and ("$gt" not in condition or value > condition["$gt"])
+        and ("$lt" not in condition or value < condition["$lt"])
+    )
+
+
+class ItemModel(fastapi_mongodb.models.BaseDBModel):
+    number: int
+
+
+def read_bson_files(report: dict) -> list[dict]:
+    documents = []
+    for path in report["files"]:
+        with open(path, "rb") as file:
+            documents.extend(bson.decode_all(file.read()))
+    return documents
+
+
+class TestCollectionExporter:
+    def _repository_factory(
+        self, *, documents: list[dict], buckets: int, fail_after: int = None
+    ) -> unittest.mock.MagicMock:
+        """Repository with collection, that finds documents by '_id' ranges (and fails once after 'fail_after')."""
+        raw_documents = [
+            bson.raw_bson.RawBSONDocument(bson.encode(doc), codec_options=RAW_CODEC_OPTIONS) for doc in documents
+        ]
+        failures = []
+
+        def find(*, filter: dict, sort: list, batch_size: int):
+            async def cursor():
+                found = [document for document in raw_documents if matches(document["_id"], filter.get("_id", {}))]
+                for number, document in enumerate(found):
+                    if number == fail_after and not failures:
+                        failures.append(number)
+                        raise pymongo.errors.AutoReconnect("primary stepped down")
+                    yield document
+
+            return cursor()
+
+        ids = [document["_id"] for document in documents]
+        size = len(ids) // buckets
+        aggregate_cursor = unittest.mock.MagicMock(
+            to_list=unittest.mock.AsyncMock(
+                return_value=[{"_id": {"min": ids[number * size]}} for number in range(buckets)]
+            )
+        )
+        repository = unittest.mock.MagicMock()
+        repository.col.name = "items"
+        repository.col.with_options.return_value.find = find
+        repository.aggregate = unittest.mock.AsyncMock(return_value=aggregate_cursor)
+        repository.find_one = unittest.mock.AsyncMock(side_effect=[{"_id": ids[0]}, None])
+        return repository
+
+    @pytest.fixture()
+    def documents(self) -> list[dict]:
+        return [{"_id": bson.ObjectId(), "number": number} for number in range(100)]
+
+    def test_partition_query(self):
+        exporter = CollectionExporter(
+            self._repository_factory(documents=[{"_id": 1}], buckets=1), directory=".", query={"active": True}
+        )
+        partition = {"lower": 10, "upper": 20, "last_id": None}
+
+        assert {"$and": [{"active": True}, {"_id": {"$gte": 10, "$lt": 20}}]} == exporter.get_partition_query(
+            partition=partition
+        )
+        assert {"$and": [{"active": True}, {"_id": {"$gt": 15, "$lt": 20}}]} == exporter.get_partition_query(
+            partition=partition | {"last_id": 15}
+        )
+        assert {"active": True} == exporter.get_partition_query(
+            partition={"lower": None, "upper": None, "last_id": None}
+        )
+
+    async def test_create_partitions(self, documents):
+        repository = self._repository_factory(documents=documents, buckets=4)
+        exporter = CollectionExporter(repository, directory=".", partitions=4)
+
+        partitions = await exporter.create_partitions()
+
+        assert [(None, documents[25]["_id"]), (documents[75]["_id"], None)] == [
+            (partition["lower"], partition["upper"]) for partition in (partitions[0], partitions[-1])
+        ]
+        assert all(partition["resumable"] for partition in partitions)
+        assert {"$and": [{}, {"_id": {"$not": {"$type": "objectId"}}}]} == repository.find_one.call_args.kwargs["query"]
+
+    async def test_create_partitions_mixed_types(self, documents):
+        repository = self._repository_factory(documents=documents, buckets=4)
+        repository.find_one.side_effect = [{"_id": documents[0]["_id"]}, {"_id": "string id"}]
+
+        partitions = await CollectionExporter(repository, directory=".", partitions=4).create_partitions()
+
+        assert [(None, None, False)] == [(p["lower"], p["upper"], p["resumable"]) for p in partitions]
+
+    async def test_sampled_boundaries_without_documents(self):
+        repository = self._repository_factory(documents=[{"_id": 1}], buckets=1)
+        repository.aggregate.return_value.to_list.return_value = []
+
+        exporter = CollectionExporter(repository, directory=".", partitions=4, sample_size=100)
+
+        assert [] == await exporter.get_boundaries()
+
+    async def test_failed_partition_cancels_others(self, tmp_path, documents):
+        repository = self._repository_factory(documents=documents, buckets=2)
+        cancelled = []
+
+        def find(*, filter: dict, sort: list, batch_size: int):
+            async def cursor():
+                if "$lt" in filter["_id"]:
+                    raise pymongo.errors.OperationFailure("not authorized")
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(filter)
+                    raise
+                yield documents[-1]
+
+            return cursor()
+
+        repository.col.with_options.return_value.find = find
+
+        with pytest.raises(pymongo.errors.OperationFailure):
+            await CollectionExporter(repository, directory=str(tmp_path), partitions=2).run()
+        await asyncio.sleep(0)
+
+        assert [{"_id": {"$gte": documents[50]["_id"]}}] == cancelled
+
+    async def test_export_bson_with_failover(self, tmp_path, documents):
+        repository = self._repository_factory(documents=documents, buckets=4, fail_after=10)
+        exporter = CollectionExporter(
+            repository, directory=str(tmp_path), format=TRANSFER_FORMATS.BSON, partitions=4, batch_size=7, retry_delay=0
+        )
+
+        report = await exporter.run()
+
+        assert documents == sorted(read_bson_files(report=report), key=lambda document: document["number"])
+        assert 100 == report["documents"]
+        assert sum((tmp_path / path).stat().st_size for path in report["files"]) == report["size"]
+        checkpoint = bson.json_util.loads((tmp_path / "items.checkpoint.json").read_text())
+        assert all(partition["done"] for partition in checkpoint["partitions"])
+
+    async def test_resume_ndjson(self, tmp_path, documents):
+        exporter = CollectionExporter(self._repository_factory(documents=documents, buckets=2), directory=str(tmp_path))
+        await exporter.run()
+        # interrupted export: the second partition has 10 documents checkpointed and not checkpointed tail
+        checkpoint_path = tmp_path / "items.checkpoint.json"
+        state = bson.json_util.loads(checkpoint_path.read_text())
+        second = state["partitions"][1]
+        lines = (tmp_path / "items.0001.ndjson").read_bytes().splitlines(keepends=True)
+        second |= {"done": False, "documents": 10, "size": len(b"".join(lines[:10])), "last_id": documents[59]["_id"]}
+        checkpoint_path.write_text(bson.json_util.dumps(state, json_options=bson.json_util.CANONICAL_JSON_OPTIONS))
+        (tmp_path / "items.0001.ndjson").write_bytes(b"".join(lines[:15]))
+
+        report = await CollectionExporter(
+            self._repository_factory(documents=documents, buckets=2), directory=str(tmp_path)
+        ).run()
+
+        exported = [bson.json_util.loads(line) for path in report["files"] for line in open(path, encoding="utf-8")]
+        assert documents == exported
+        assert 100 == report["documents"]
+
+    async def test_checkpoint_of_other_format(self, tmp_path, documents):
+        await CollectionExporter(
+            self._repository_factory(documents=documents, buckets=2), directory=str(tmp_path)
+        ).run()
+
+        with pytest.raises(ValueError):
+            await CollectionExporter(
+                self._repository_factory(documents=documents, buckets=2),
+                directory=str(tmp_path),
+                format=TRANSFER_FORMATS.BSON,
+            ).run()
+
+    async def test_repository_export(self, db_manager, tmp_path, documents):
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=db_manager, db_name="test_db", col_name="test_export"
+        )
+        await repository.delete_many(query={})
+        await repository.insert_many(documents=documents)
+
+        report = await repository.export(directory=str(tmp_path), format=TRANSFER_FORMATS.BSON, partitions=4)
+
+        assert documents == sorted(read_bson_files(report=report), key=lambda document: document["number"])
+
+
+class TestCollectionImporter:
+    def _repository_factory(self) -> unittest.mock.MagicMock:
+        """Repository with collection, that rejects documents with duplicate '_id' like unordered 'insert_many'."""
+        repository = unittest.mock.MagicMock()
+        repository.documents = {}
+
+        async def insert_many(*, documents: list[dict], ordered: bool):
+            errors = []
+            for index, document in enumerate(documents):
+                document.setdefault("_id", bson.ObjectId())
+                if document["_id"] in repository.documents:
+                    errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key", "op": document})
+                else:
+                    repository.documents[document["_id"]] = document
+            if errors:
+                raise pymongo.errors.BulkWriteError({"nInserted": len(documents) - len(errors), "writeErrors": errors})
+            return unittest.mock.MagicMock(inserted_ids=[document["_id"] for document in documents])
+
+        repository.insert_many = insert_many
+        return repository
+
+    def test_unknown_extension(self):
+        with pytest.raises(ValueError):
+            CollectionImporter(self._repository_factory(), path="items.txt")
+
+    async def test_ndjson_with_rejects(self, tmp_path):
+        path = tmp_path / "items.ndjson"
+        oid = bson.ObjectId()
+        lines = [
+            bson.json_util.dumps({"_id": oid, "number": 1}),
+            "{not json",
+            "",
+            bson.json_util.dumps({"_id": oid, "number": 2}),
+            *(bson.json_util.dumps({"number": number}) for number in range(3, 10)),
+        ]
+        path.write_text("\n".join(lines) + "\n")
+        repository = self._repository_factory()
+
+        report = await CollectionImporter(repository, path=str(path), batch_size=3, concurrency=2).run()
+
+        assert {"read": 10, "inserted": 8, "rejected": 2, "duplicates": 1} == {
+            key: report[key] for key in ("read", "inserted", "rejected", "duplicates")
+        }
+        assert [1] + list(range(3, 10)) == sorted(document["number"] for document in repository.documents.values())
+        rejects = [bson.json_util.loads(line) for line in open(report["reject_path"], encoding="utf-8")]
+        assert [(2, "{not json\n"), (4, {"_id": oid, "number": 2})] == sorted(
+            (reject["record"], reject["data"]) for reject in rejects
+        )
+
+    async def test_ndjson_not_documents(self, tmp_path):
+        path = tmp_path / "items.ndjson"
+        path.write_text('5\n[1]\n{"number": 1}\n')
+
+        report = await CollectionImporter(self._repository_factory(), path=str(path)).run()
+
+        assert (3, 1, 2) == (report["read"], report["inserted"], report["rejected"])
+        rejects = [bson.json_util.loads(line) for line in open(report["reject_path"], encoding="utf-8")]
+        assert ["Record must be a JSON object, not int.", "Record must be a JSON object, not list."] == [
+            reject["error"] for reject in rejects
+        ]
+
+    async def test_csv_with_model(self, tmp_path):
+        path = tmp_path / "items.csv"
+        path.write_text("number\n1\nnot a number\n3\n")
+        repository = self._repository_factory()
+
+        report = await CollectionImporter(
+            repository, path=str(path), model=ItemModel, executor=concurrent.futures.ThreadPoolExecutor()
+        ).run()
+
+        assert (3, 2, 1) == (report["read"], report["inserted"], report["rejected"])
+        assert [1, 3] == sorted(document["number"] for document in repository.documents.values())
+        assert all(isinstance(document_id, bson.ObjectId) for document_id in repository.documents)
+        assert report["reject_path"] == f"{path}.rejects.ndjson"
+
+    async def test_bson_upsert_with_truncated_document(self, tmp_path):
+        path = tmp_path / "items.bson"
+        documents = [{"_id": number, "number": number} for number in range(5)]
+        path.write_bytes(b"".join(bson.encode(document) for document in documents) + bson.encode({"a": 1})[:-3])
+        repository = unittest.mock.MagicMock()
+        repository.bulk_write = unittest.mock.AsyncMock(
+            return_value=unittest.mock.MagicMock(
+                bulk_api_result={"nInserted": 0, "nUpserted": 3, "nModified": 2, "writeErrors": []}
+            )
+        )
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            report = await CollectionImporter(repository, path=str(path), upsert=True, executor=executor).run()
+
+        operations = repository.bulk_write.call_args.kwargs["operations"]
+        assert [pymongo.operations.ReplaceOne({"_id": 0}, documents[0], upsert=True)] == operations[:1]
+        assert (6, 3, 2, 1) == (report["read"], report["upserted"], report["modified"], report["rejected"])
+
+    async def test_backpressure(self, tmp_path, patcher):
+        path = tmp_path / "items.ndjson"
+        path.write_text("".join(bson.json_util.dumps({"number": number}) + "\n" for number in range(100)))
+        repository = self._repository_factory()
+        importer = CollectionImporter(repository, path=str(path), batch_size=1, concurrency=1, max_pending_batches=2)
+        read_records = patcher.patch_attr(
+            target=importer, attribute="_read_records", side_effect=importer._read_records
+        )
+        insert_many, reads_on_write = repository.insert_many, []
+
+        async def slow_insert_many(**kwargs):
+            reads_on_write.append(read_records.call_count)
+            await asyncio.sleep(0.001)
+            return await insert_many(**kwargs)
+
+        repository.insert_many = slow_insert_many
+
+        await importer.run()
+
+        # 2 batches in queue, 1 batch written and 1 read batch waiting for free place in queue
+        assert max(reads - writes for writes, reads in enumerate(reads_on_write)) <= 4
+        assert 100 == len(repository.documents)
+
+    async def test_repository_import_file(self, db_manager, tmp_path):
+        path = tmp_path / "items.ndjson"
+        path.write_text("".join(bson.json_util.dumps({"_id": number}) + "\n" for number in (1, 2, 2, 3)))
+        repository = fastapi_mongodb.repositories.BaseRepository(
+            db_manager=db_manager, db_name="test_db", col_name="test_import"
+        )
+        await repository.delete_many(query={})
+
+        report = await repository.import_file(path=str(path))
+
+        assert (3, 1) == (report["inserted"], report["duplicates"])
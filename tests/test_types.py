@@ -1,9 +1,10 @@
 import unittest.mock
 
+import pydantic
 import pytest
 from bson import ObjectId
 
-from fastapi_mongodb.types import OID
+from fastapi_mongodb.types import OID, OIDs
 
 
 class TestOID:
@@ -39,3 +40,69 @@ class TestOID:
         result = self.type_class.validate(v=object_id)
 
         assert result == object_id
+
+    def test_validate_hex_and_binary(self):
+        object_id = ObjectId()
+
+        assert object_id == self.type_class.validate(v=str(object_id))
+        assert object_id == self.type_class.validate(v=str(object_id).upper())
+        assert object_id == self.type_class.validate(v=object_id.binary)
+
+    @pytest.mark.parametrize("value", [b"short", 12, "g" * 24, " " + "a" * 23])
+    def test_validate_invalid_types(self, value):
+        with pytest.raises(ValueError):
+            self.type_class.validate(v=value)
+
+
+class TestOIDs:
+    class Model(pydantic.BaseModel):
+        ids: OIDs
+
+    def test__modify_schema__(self):
+        field_schema = {}
+
+        OIDs.__modify_schema__(field_schema=field_schema)
+
+        assert {
+            "type": "array",
+            "items": {
+                "pattern": "^[a-f0-9]{24}$",
+                "example": "5f5cf6f50cde9ec07786b294",
+                "title": "ObjectId",
+                "type": "string",
+            },
+        } == field_schema
+
+    def test_validate_hex_batch(self):
+        object_ids = [ObjectId() for _ in range(5)]
+
+        assert object_ids == OIDs.validate(v=[str(object_id) for object_id in object_ids])
+        assert [] == OIDs.validate(v=[])
+
+    def test_validate_mixed(self):
+        object_ids = [ObjectId() for _ in range(3)]
+
+        result = OIDs.validate(v=[object_ids[0], str(object_ids[1]), object_ids[2].binary])
+
+        assert object_ids == result
+
+    def test_validate_reports_all_invalid_indexes(self, faker):
+        object_id = str(ObjectId())
+
+        with pytest.raises(pydantic.ValidationError) as exception_context:
+            self.Model(ids=[object_id, faker.pystr(), object_id, "z" * 24, 5])
+
+        assert [
+            {
+                "loc": ("ids",),
+                "msg": "invalid ObjectIds at indexes [1, 3, 4]",
+                "type": "value_error.object_ids",
+                "ctx": {"indexes": [1, 3, 4]},
+            }
+        ] == exception_context.value.errors()
+
+    def test_validate_not_list(self):
+        with pytest.raises(pydantic.ValidationError) as exception_context:
+            self.Model(ids=str(ObjectId()))
+
+        assert "type_error.list" == exception_context.value.errors()[0]["type"]